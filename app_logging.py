@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+结构化、非阻塞日志
+
+- 根日志器只挂一个QueueHandler，格式化和写终端/文件由后台线程（QueueListener）完成，
+  在事件循环中记日志只是一次入队，不会因为终端或磁盘慢而卡住检查
+- 记录可以携带结构化字段：logger.debug("...", extra=fields(url=url, verdict=verdict))，
+  text格式在消息后追加 key=value，json格式每条记录输出一行JSON
+- 单URL的明细记为DEBUG；INFO级别只输出ProgressReporter按时间间隔汇总的进度
+- 其他逐条落盘的输出（如指标日志）用BackgroundHandler同样经队列在后台线程写出
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# ===== 默认配置参数 =====
+DEFAULT_LOG_FORMAT = "text"  # text 或 json
+DEFAULT_PROGRESS_INTERVAL = 10  # INFO进度汇总的最小间隔（秒）
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_listener = None
+
+
+def fields(**kwargs):
+    """结构化字段，作为日志调用的extra参数"""
+    return {"fields": kwargs}
+
+
+class StructuredFormatter(logging.Formatter):
+    """在文本消息后追加结构化字段，或把整条记录输出为一行JSON"""
+
+    def __init__(self, log_format=DEFAULT_LOG_FORMAT):
+        super().__init__(TEXT_FORMAT)
+        self.log_format = log_format
+
+    def format(self, record):
+        extra = getattr(record, "fields", None) or {}
+        if self.log_format == "json":
+            entry = {
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+                **extra,
+            }
+            if record.exc_info:
+                entry["exc"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        text = super().format(record)
+        if extra:
+            text += " | " + " ".join(f"{key}={value}" for key, value in extra.items())
+        return text
+
+
+def install_queue_logging(log_format=DEFAULT_LOG_FORMAT):
+    """
+    把根日志器当前的处理器移到后台线程，根日志器改为只入队（重复调用时只安装一次）
+    :param log_format: text 或 json
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    root = logging.getLogger()
+    handlers = root.handlers[:] or [logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(StructuredFormatter(log_format))
+        root.removeHandler(handler)
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_queue_logging)
+    return _listener
+
+
+def stop_queue_logging():
+    """写完队列中剩余的日志并停止后台线程"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class BackgroundHandler:
+    """
+    在后台线程（QueueListener）中运行一组处理器，handle()只是一次入队
+    首次handle时启动后台线程，进程退出时写完队列中剩余的记录
+    """
+
+    def __init__(self, *handlers):
+        self._queue = queue.SimpleQueue()
+        self._queue_handler = QueueHandler(self._queue)
+        self._listener = QueueListener(self._queue, *handlers, respect_handler_level=True)
+        self._lock = threading.Lock()
+        self._running = False
+
+    def _start(self):
+        with self._lock:
+            if not self._running:
+                self._listener.start()
+                self._running = True
+                atexit.register(self.stop)
+
+    def handle(self, record):
+        if not self._running:
+            self._start()
+        self._queue_handler.handle(record)
+
+    def flush(self):
+        """等待队列中的记录全部写出"""
+        with self._lock:
+            if self._running:
+                self._listener.stop()
+                self._listener.start()
+
+    def stop(self):
+        with self._lock:
+            if self._running:
+                self._listener.stop()
+                self._running = False
+
+
+def setup_logging(level="INFO", log_file=None, log_format=DEFAULT_LOG_FORMAT):
+    """
+    配置根日志器：终端 + 可选的日志文件，经队列在后台线程写出
+    :param level: 日志级别，DEBUG时输出单URL明细
+    :param log_file: 日志文件路径，为None时只输出到终端（标准错误）
+    """
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, str(level).upper()))
+    if _listener is None and not root.handlers:
+        root.addHandler(logging.StreamHandler())
+        if log_file:
+            os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+            root.addHandler(logging.FileHandler(log_file, encoding="utf-8"))
+    return install_queue_logging(log_format)
+
+
+class ProgressReporter:
+    """按时间间隔限流的进度汇总：每个结论调用update，最多每interval秒输出一行INFO"""
+
+    def __init__(self, logger, label, interval=DEFAULT_PROGRESS_INTERVAL):
+        self.logger = logger
+        self.label = label
+        self.interval = interval
+        self.done = 0
+        self.counts = {}
+        self.started = time.monotonic()
+        self.last_emit = self.started
+
+    def update(self, verdict):
+        self.done += 1
+        self.counts[verdict] = self.counts.get(verdict, 0) + 1
+        now = time.monotonic()
+        if now - self.last_emit >= self.interval:
+            self.emit(now)
+
+    def emit(self, now=None, final=False):
+        now = time.monotonic() if now is None else now
+        self.last_emit = now
+        elapsed = max(now - self.started, 1e-9)
+        rate = self.done / elapsed
+        self.logger.info(
+            "%s%s: 已完成 %d 个URL（%s），%.1f URL/s",
+            self.label,
+            "完成" if final else "进度",
+            self.done,
+            ", ".join(f"{k} {v}" for k, v in sorted(self.counts.items())) or "-",
+            rate,
+            extra=fields(done=self.done, rate=round(rate, 2), **self.counts),
+        )
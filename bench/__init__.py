@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""离线性能基准测试（python -m bench.<模块名>）"""
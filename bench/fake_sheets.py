@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+本地伪 Google Sheets / Drive API：实现 gspread 用到的少量 REST 接口，
+作为 requests Session 挂在真实的 gspread.Client 之下，可配置延迟、配额错误和429
+
+支持的接口：Drive files.list（按名称打开）、spreadsheets.get、spreadsheets.batchUpdate
+（addSheet）、values.get / values.append / values.update / values.clear。
+values.get 按范围的行列返回（如 'A5:E'、'D2:E10'，省略的边界取到表格边缘），
+values.update 从范围起始行覆盖；写请求会更新 Drive 列表返回的 modifiedTime。
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from urllib.parse import unquote, urlparse
+
+import gspread
+
+# ===== 默认配置参数 =====
+DEFAULT_LATENCY = 0.0  # 每个请求的模拟延迟（秒）
+DEFAULT_ERROR_STATUS = 429  # 随机错误的HTTP状态码
+
+_sleep = time.sleep  # 基准测试可能替换time.sleep来跳过退避等待，延迟模拟不受影响
+
+
+class FakeResponse:
+    """requests.Response 的最小替身"""
+
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode("utf-8")
+        self.text = self.content.decode("utf-8")
+        self.headers = {"Content-Type": "application/json"}
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise gspread.exceptions.APIError(self)
+
+
+class FakeSession:
+    """挂在gspread.Client之下的伪Session，所有请求交给FakeSheetsBackend处理"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.headers = {}
+
+    def request(self, method, url, params=None, json=None, data=None, files=None, headers=None, timeout=None):
+        return self.backend.handle(method.upper(), url, params or {}, json)
+
+    # gspread 5.x 通过 session.get/post/... 调用
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        pass
+
+
+def _error(status, message, reason):
+    return FakeResponse(
+        status, {"error": {"code": status, "message": message, "status": reason}}
+    )
+
+
+def _sheet_name(range_name):
+    """从A1范围中取出工作表名：'00'!A1:E5 -> 00"""
+    name = unquote(range_name).split("!")[0]
+    if name.startswith("'") and name.endswith("'"):
+        name = name[1:-1].replace("''", "'")
+    return name
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def _bounds(range_name):
+    """A1范围的 (起始行, 结束行, 起始列, 结束列)，从0开始、含两端，省略的边界为None"""
+    parts = unquote(range_name).split("!")
+    match = re.match(r"([A-Za-z]*)(\d*)(?::([A-Za-z]*)(\d*))?$", parts[1]) if len(parts) > 1 else None
+    if not match:
+        return None, None, None, None
+    start_col, start_row, end_col, end_row = match.groups()
+    return (
+        int(start_row) - 1 if start_row else None,
+        int(end_row) - 1 if end_row else None,
+        _column_index(start_col) if start_col else None,
+        _column_index(end_col) if end_col else None,
+    )
+
+
+def _slice(rows, range_name):
+    """按范围取出单元格，与真实API一样去掉末尾的空单元格和空行"""
+    start_row, end_row, start_col, end_col = _bounds(range_name)
+    start_row = start_row or 0
+    end_row = len(rows) - 1 if end_row is None else end_row
+    start_col = start_col or 0
+    values = []
+    for row in rows[start_row : end_row + 1]:
+        cells = list(row[start_col : None if end_col is None else end_col + 1])
+        while cells and cells[-1] in ("", None):
+            cells.pop()
+        values.append(cells)
+    while values and not values[-1]:
+        values.pop()
+    return values
+
+
+def _start_row(range_name):
+    """A1范围的起始行（从0开始），没有行号时为0"""
+    parts = unquote(range_name).split("!")
+    match = re.match(r"[A-Za-z]*(\d+)", parts[1]) if len(parts) > 1 else None
+    return int(match.group(1)) - 1 if match else 0
+
+
+class FakeSheetsBackend:
+    """内存中的表格数据和API行为配置"""
+
+    def __init__(
+        self,
+        latency=DEFAULT_LATENCY,
+        error_rate=0.0,
+        error_status=DEFAULT_ERROR_STATUS,
+        read_quota_per_minute=None,
+        write_quota_per_minute=None,
+        seed=0,
+    ):
+        """
+        :param latency: 每个请求的模拟延迟（秒）
+        :param error_rate: 随机返回error_status错误的概率
+        :param read_quota_per_minute: 每分钟读请求配额，超出返回429 RESOURCE_EXHAUSTED
+        :param write_quota_per_minute: 每分钟写请求配额
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.read_quota_per_minute = read_quota_per_minute
+        self.write_quota_per_minute = write_quota_per_minute
+        self._random = random.Random(seed)
+        self._fail_next = 0
+        self._fail_kind = None
+        self._read_times = deque()
+        self._write_times = deque()
+        self._lock = threading.Lock()
+        self.spreadsheets = {}  # id -> {"title": ..., "sheets": {title: {...}}}
+        self.reset_stats()
+
+    # ----- 数据准备 -----
+    def create_spreadsheet(self, title):
+        spreadsheet_id = f"fake-{len(self.spreadsheets) + 1}"
+        self.spreadsheets[spreadsheet_id] = {"title": title, "sheets": {}, "modified": time.time()}
+        return spreadsheet_id
+
+    def touch(self, spreadsheet_id):
+        """更新表格的修改时间（直接修改rows模拟他人编辑后调用）"""
+        self.spreadsheets[spreadsheet_id]["modified"] = time.time()
+
+    def add_sheet(self, spreadsheet_id, title, rows=None):
+        sheets = self.spreadsheets[spreadsheet_id]["sheets"]
+        sheets[title] = {
+            "sheetId": len(sheets) + 1,
+            "index": len(sheets),
+            "rows": [list(row) for row in (rows or [])],
+        }
+        return sheets[title]
+
+    def rows(self, spreadsheet_id, title):
+        return self.spreadsheets[spreadsheet_id]["sheets"][title]["rows"]
+
+    def fail_next(self, count, status=DEFAULT_ERROR_STATUS, kind=None):
+        """
+        让接下来的count个请求返回status错误
+        :param kind: 只对该类请求生效，如 "values.append"，为None时对所有请求生效
+        """
+        self._fail_next = count
+        self._fail_kind = kind
+        self.error_status = status
+
+    def reset_stats(self):
+        self.stats = {"calls": {}, "errors": 0, "bytes_in": 0, "bytes_out": 0}
+
+    # ----- gspread接入 -----
+    def session(self):
+        return FakeSession(self)
+
+    def client(self):
+        """返回使用本伪后端的真实gspread.Client"""
+        return gspread.Client(auth=None, session=self.session())
+
+    # ----- 请求处理 -----
+    def _check_quota(self, times, limit):
+        if limit is None:
+            return True
+        now = time.monotonic()
+        while times and now - times[0] > 60:
+            times.popleft()
+        if len(times) >= limit:
+            return False
+        times.append(now)
+        return True
+
+    def handle(self, method, url, params, body):
+        if self.latency:
+            _sleep(self.latency)
+        if body is not None:
+            self.stats["bytes_in"] += len(json.dumps(body))
+
+        with self._lock:
+            path = urlparse(url).path
+            kind = self._kind(method, path)
+            self.stats["calls"][kind] = self.stats["calls"].get(kind, 0) + 1
+
+            if self._fail_next > 0 and self._fail_kind in (None, kind):
+                self._fail_next -= 1
+                response = _error(self.error_status, "Injected failure", "UNAVAILABLE")
+            elif self.error_rate and self._random.random() < self.error_rate:
+                response = _error(self.error_status, "Rate limit exceeded", "RESOURCE_EXHAUSTED")
+            elif not self._check_quota(
+                self._read_times if method == "GET" else self._write_times,
+                self.read_quota_per_minute if method == "GET" else self.write_quota_per_minute,
+            ):
+                response = _error(
+                    429,
+                    "Quota exceeded for quota metric 'Read requests' and limit 'per minute per user'",
+                    "RESOURCE_EXHAUSTED",
+                )
+            else:
+                response = self._dispatch(method, path, params, body)
+
+        if not response.ok:
+            self.stats["errors"] += 1
+        self.stats["bytes_out"] += len(response.content)
+        return response
+
+    @staticmethod
+    def _kind(method, path):
+        if path.startswith("/drive/"):
+            return "drive.files.get" if re.match(r"/drive/v3/files/.", path) else "drive.files.list"
+        if path.endswith(":batchUpdate"):
+            return "batchUpdate"
+        if path.endswith(":append"):
+            return "values.append"
+        if path.endswith(":clear"):
+            return "values.clear"
+        if "/values/" in path:
+            return "values.get" if method == "GET" else "values.update"
+        return "spreadsheets.get"
+
+    def _dispatch(self, method, path, params, body):
+        if path.startswith("/drive/"):
+            match = re.match(r"/drive/v3/files/([^/]+)$", path)
+            if match:
+                if match.group(1) not in self.spreadsheets:
+                    return _error(404, "File not found.", "NOT_FOUND")
+                return FakeResponse(200, self._drive_file(match.group(1)))
+            match = re.search(r"name = '((?:[^'\\]|\\.)*)'", params.get("q", ""))
+            name = match.group(1).replace("\\'", "'") if match else None
+            files = [
+                self._drive_file(sid)
+                for sid, s in self.spreadsheets.items()
+                if name is None or s["title"] == name
+            ]
+            return FakeResponse(200, {"files": files})
+
+        match = re.match(r"/v4/spreadsheets/([^/:]+)(.*)$", path)
+        if not match or match.group(1) not in self.spreadsheets:
+            return _error(404, "Requested entity was not found.", "NOT_FOUND")
+        spreadsheet_id, rest = match.groups()
+        spreadsheet = self.spreadsheets[spreadsheet_id]
+
+        if rest == "":
+            return FakeResponse(200, self._metadata(spreadsheet_id))
+
+        if method != "GET":
+            self.touch(spreadsheet_id)
+
+        if rest == ":batchUpdate":
+            replies = []
+            for request in (body or {}).get("requests", []):
+                if "addSheet" in request:
+                    properties = request["addSheet"].get("properties", {})
+                    sheet = self.add_sheet(spreadsheet_id, properties["title"])
+                    replies.append({"addSheet": {"properties": self._sheet_properties(properties["title"], sheet)}})
+                else:
+                    replies.append({})
+            return FakeResponse(200, {"spreadsheetId": spreadsheet_id, "replies": replies})
+
+        values_match = re.match(r"/values/(.+?)(:append|:clear)?$", rest)
+        if not values_match:
+            return _error(400, f"Unsupported request: {method} {path}", "INVALID_ARGUMENT")
+        range_name, action = values_match.groups()
+        title = _sheet_name(range_name)
+        if title not in spreadsheet["sheets"]:
+            return _error(400, f"Unable to parse range: {range_name}", "INVALID_ARGUMENT")
+        rows = spreadsheet["sheets"][title]["rows"]
+
+        if action == ":append":
+            new_rows = (body or {}).get("values", [])
+            start = len(rows)
+            rows.extend([list(row) for row in new_rows])
+            return FakeResponse(
+                200,
+                {
+                    "spreadsheetId": spreadsheet_id,
+                    "updates": {
+                        "updatedRange": f"'{title}'!A{start + 1}",
+                        "updatedRows": len(new_rows),
+                    },
+                },
+            )
+        if action == ":clear":
+            rows.clear()
+            return FakeResponse(200, {"spreadsheetId": spreadsheet_id, "clearedRange": f"'{title}'"})
+        if method == "GET":
+            return FakeResponse(
+                200,
+                {"range": f"'{title}'", "majorDimension": "ROWS", "values": _slice(rows, range_name)},
+            )
+
+        # values.update：从范围起始行开始覆盖
+        start = _start_row(range_name)
+        new_rows = (body or {}).get("values", [])
+        while len(rows) < start + len(new_rows):
+            rows.append([])
+        for offset, row in enumerate(new_rows):
+            rows[start + offset] = list(row)
+        return FakeResponse(200, {"spreadsheetId": spreadsheet_id, "updatedRows": len(new_rows)})
+
+    def _drive_file(self, spreadsheet_id):
+        """Drive文件元数据（files.list / files.get）"""
+        spreadsheet = self.spreadsheets[spreadsheet_id]
+        return {
+            "id": spreadsheet_id,
+            "name": spreadsheet["title"],
+            "createdTime": "2025-01-01T00:00:00.000Z",
+            "modifiedTime": datetime.fromtimestamp(spreadsheet["modified"], timezone.utc)
+            .isoformat(timespec="milliseconds")
+            .replace("+00:00", "Z"),
+        }
+
+    @staticmethod
+    def _sheet_properties(title, sheet):
+        return {
+            "sheetId": sheet["sheetId"],
+            "title": title,
+            "index": sheet["index"],
+            "sheetType": "GRID",
+            "gridProperties": {
+                "rowCount": max(1000, len(sheet["rows"])),
+                "columnCount": 26,
+            },
+        }
+
+    def _metadata(self, spreadsheet_id):
+        spreadsheet = self.spreadsheets[spreadsheet_id]
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "properties": {"title": spreadsheet["title"], "locale": "zh_CN", "timeZone": "Asia/Shanghai"},
+            "sheets": [
+                {"properties": self._sheet_properties(title, sheet)}
+                for title, sheet in spreadsheet["sheets"].items()
+            ],
+        }
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# ===== 默认配置参数 =====
+DEFAULT_HOST = "127.0.0.1"
+CROSS_ORIGIN_HOST = "localhost"  # 与DEFAULT_HOST端口相同但不同源，用于跨域iframe
+DEFAULT_SLOW_DELAY = 2  # 慢响应延迟（秒）
+DEFAULT_HANG_DELAY = 120  # 挂起响应延迟（秒），应大于检查时限
+DEFAULT_HEAVY_ASSETS = 40  # 重资源页面的图片/样式/脚本数量
+DEFAULT_ASSET_SIZE = 64 * 1024  # 每个静态资源的字节数
+
+FORM_HTML = '<form action="/submit"><input name="email"><button>提交</button></form>'
+
+
+def _page(body, head=""):
+    return f"<!DOCTYPE html><html><head><meta charset='utf-8'>{head}</head><body>{body}</body></html>"
+
+
+def _heavy_page():
+    assets = []
+    for i in range(DEFAULT_HEAVY_ASSETS):
+        assets.append(f'<img src="/asset/{i}.png">')
+        assets.append(f'<link rel="stylesheet" href="/asset/{i}.css">')
+        assets.append(f'<script src="/asset/{i}.js"></script>')
+    return _page("".join(assets) + FORM_HTML)
+
+
+# 路径 -> (期望结论, 描述)；结论与 form_checker 的 VERDICT_* 取值一致
+FIXTURES = {
+    "/server-form": ("form", "服务端渲染的表单"),
+    "/js-form": ("form", "脚本同步注入的表单"),
+    "/same-origin-iframe": ("form", "同源iframe中的表单"),
+    "/srcdoc-iframe": ("form", "srcdoc iframe中的表单"),
+    "/cross-origin-iframe": ("no_form", "跨域iframe中的表单（跳过）"),
+    "/contact-only": ("form", "只有contact二级页面有表单"),
+    "/no-form": ("no_form", "没有表单的页面"),
+    "/slow": ("form", "慢响应的表单页面"),
+    "/hang": ("timeout", "一直不返回的页面"),
+    "/redirect": ("form", "302重定向到表单页面"),
+    "/heavy": ("form", "大量静态资源的表单页面"),
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """合成站点请求处理"""
+
+    def log_message(self, format, *args):
+        pass  # 基准测试时不输出访问日志
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+        data = body if isinstance(body, bytes) else body.encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 浏览器已放弃该请求
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        port = self.server.server_address[1]
+
+        if path == "/server-form":
+            return self._send(200, _page(FORM_HTML))
+        if path == "/js-form":
+            script = (
+                "<script>document.body.insertAdjacentHTML('beforeend',"
+                f"'{FORM_HTML}');</script>"
+            )
+            return self._send(200, _page(script))
+        if path == "/same-origin-iframe":
+            return self._send(200, _page('<iframe src="/iframe-inner"></iframe>'))
+        if path == "/srcdoc-iframe":
+            srcdoc = FORM_HTML.replace('"', "&quot;")
+            return self._send(200, _page(f'<iframe srcdoc="{srcdoc}"></iframe>'))
+        if path == "/cross-origin-iframe":
+            src = f"http://{CROSS_ORIGIN_HOST}:{port}/iframe-inner"
+            return self._send(200, _page(f'<iframe src="{src}"></iframe>'))
+        if path == "/iframe-inner":
+            return self._send(200, _page(FORM_HTML))
+        if path == "/contact-only":
+            return self._send(200, _page('<a href="/contact-only/contact">联系我们</a>'))
+        if path == "/contact-only/contact":
+            return self._send(200, _page(FORM_HTML))
+        if path == "/no-form":
+            return self._send(200, _page("<p>nothing here</p><a href='/about'>about</a>"))
+        if path == "/slow":
+            time.sleep(DEFAULT_SLOW_DELAY)
+            return self._send(200, _page(FORM_HTML))
+        if path == "/hang":
+            time.sleep(DEFAULT_HANG_DELAY)
+            return self._send(200, _page(FORM_HTML))
+        if path == "/redirect":
+            return self._send(302, "", headers={"Location": "/server-form"})
+        if path == "/heavy":
+            return self._send(200, _heavy_page())
+        if path.startswith("/asset/"):
+            content_types = {
+                ".png": "image/png",
+                ".css": "text/css",
+                ".js": "application/javascript",
+            }
+            suffix = path[path.rfind(".") :]
+            body = b"/*" + b" " * DEFAULT_ASSET_SIZE + b"*/"
+            return self._send(200, body, content_types.get(suffix, "application/octet-stream"))
+        return self._send(404, _page("not found"))
+
+
+class FixtureServer:
+    """在后台线程中运行的本地合成站点服务器"""
+
+    def __init__(self, host=DEFAULT_HOST, port=0):
+        self.httpd = ThreadingHTTPServer((host, port), FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def url(self, path, host=DEFAULT_HOST):
+        return f"http://{host}:{self.port}{path}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    with FixtureServer(port=8765) as server:
+        print(f"🌐 合成站点已启动: http://{DEFAULT_HOST}:{server.port}")
+        for path, (expected, description) in FIXTURES.items():
+            print(f"   {server.url(path)}  [{expected}] {description}")
+        print("按 Ctrl+C 停止")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+form_checker 离线基准测试：启动本地合成站点，在不同并发配置下运行 load_url，
+报告吞吐量、延迟分位数、峰值RSS和结论正确率
+
+    python -m bench.form_checker_bench --repeat 5 --configs 1x1,2x3,3x4
+    python -m bench.form_checker_bench --repeat 20 --configs 2x3 --processes 1,2,4
+    python -m bench.form_checker_bench --output bench.json --baseline last.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import resource
+import sys
+import time
+
+import app_logging
+import form_checker
+from browser_profile import BrowserProfile
+from bench.fixture_server import FIXTURES, FixtureServer
+from memory_watchdog import get_process_tree_rss_mb
+from metrics import get_journal, percentile
+
+# ===== 默认配置参数 =====
+DEFAULT_REPEAT = 3  # 每个合成站点重复的次数
+DEFAULT_CONFIGS = "1x1,2x3,3x4"  # 并发配置：上下文数x每上下文页面数
+DEFAULT_PROCESSES = "1"  # 分片进程数，逗号分隔
+DEFAULT_DEADLINE = 6  # 单URL时限（秒），控制挂起页面的耗时
+DEFAULT_MAX_REGRESSION = 0.2  # 相对基线允许的最大吞吐量下降比例
+DEFAULT_RSS_SAMPLE_INTERVAL = 0.5  # RSS采样间隔（秒）
+DEFAULT_LOG_ITERATIONS = 20000  # 日志开销测量的记录条数
+DEFAULT_SLOW_SINK_DELAY = 0.0005  # 模拟阻塞终端/管道时每次写入的延迟（秒）
+
+
+def build_urls(server, repeat):
+    """生成 (url, 期望结论) 列表，通过查询参数避免命中结果缓存"""
+    cases = []
+    for i in range(repeat):
+        for path, (expected, _) in FIXTURES.items():
+            cases.append((server.url(f"{path}?n={i}"), expected))
+    return cases
+
+
+class _SlowSink:
+    """每次写入都延迟的输出流，模拟被阻塞的终端或管道"""
+
+    def write(self, text):
+        time.sleep(DEFAULT_SLOW_SINK_DELAY)
+
+    def flush(self):
+        pass
+
+
+def measure_logging_overhead(iterations=DEFAULT_LOG_ITERATIONS):
+    """
+    在事件循环中测量每条单URL日志的开销（微秒）：DEBUG关闭、经队列写出、同步写出、直接print（旧实现），
+    写出目标为 /dev/null；另外用慢输出流比较输出被阻塞时事件循环的开销
+    """
+    devnull = open(os.devnull, "w", encoding="utf-8")
+    formatter = app_logging.StructuredFormatter()
+
+    def make_logger(name, level, handler):
+        logger = logging.getLogger(f"bench.{name}")
+        logger.propagate = False
+        logger.handlers = [handler]
+        logger.setLevel(level)
+        return logger
+
+    sync_handler = logging.StreamHandler(devnull)
+    sync_handler.setFormatter(formatter)
+    queue_target = logging.StreamHandler(devnull)
+    queue_target.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, queue_target)
+    slow_handler = logging.StreamHandler(_SlowSink())
+    slow_queue = queue.SimpleQueue()
+    slow_listener = logging.handlers.QueueListener(slow_queue, slow_handler)
+    loggers = {
+        "debug off": make_logger("off", logging.INFO, sync_handler),
+        "debug queued": make_logger(
+            "queued", logging.DEBUG, logging.handlers.QueueHandler(log_queue)
+        ),
+        "debug sync": make_logger("sync", logging.DEBUG, sync_handler),
+        "slow queued": make_logger(
+            "slow_queued", logging.DEBUG, logging.handlers.QueueHandler(slow_queue)
+        ),
+        "slow sync": make_logger("slow_sync", logging.DEBUG, slow_handler),
+    }
+
+    async def emit(name, logger):
+        count = iterations // 20 if name.startswith("slow") else iterations
+        started = time.perf_counter()
+        for i in range(count):
+            url = f"https://example{i}.com/"
+            logger.debug(
+                "页面%s: %s -> %s", 1, url, "no_form", extra=app_logging.fields(url=url, verdict="no_form")
+            )
+        return (time.perf_counter() - started) / count * 1e6
+
+    async def run_all():
+        return {name: await emit(name, logger) for name, logger in loggers.items()}
+
+    listener.start()
+    slow_listener.start()
+    try:
+        results = asyncio.run(run_all())
+    finally:
+        listener.stop()
+        # 慢输出流中积压的记录不必写完
+        while not slow_queue.empty():
+            slow_queue.get_nowait()
+        slow_listener.stop()
+        devnull.close()
+    # 旧实现：每条明细直接print
+    started = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as out:
+        for i in range(iterations):
+            print(f"❌ 页面1: https://example{i}.com/ 无表单", file=out)
+    results["print"] = (time.perf_counter() - started) / iterations * 1e6
+    return {name: round(us, 2) for name, us in results.items()}
+
+
+def parse_configs(text):
+    configs = []
+    for item in text.split(","):
+        contexts, pages = item.lower().split("x")
+        configs.append((int(contexts), int(pages)))
+    return configs
+
+
+async def _sample_rss(stop, peak):
+    while not stop.is_set():
+        rss = get_process_tree_rss_mb()
+        if rss is not None:
+            peak["browser"] = max(peak["browser"], rss)
+        try:
+            await asyncio.wait_for(stop.wait(), DEFAULT_RSS_SAMPLE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_config(
+    cases,
+    max_concurrent,
+    pages_per_context,
+    deadline,
+    archive=None,
+    processes=1,
+    profile=None,
+):
+    """
+    运行一组并发配置，返回测量结果
+    :param cases: (url, 期望结论) 列表
+    :param archive: 网络回放归档，为None时访问真实网络（本地合成站点）
+    :param processes: 分片进程数
+    :param profile: 持久化浏览器配置（browser_profile.BrowserProfile）
+    """
+    form_checker._form_cache.clear()
+    form_checker._latency_tracker.samples.clear()
+    journal = get_journal()
+    journal.reset()
+
+    urls = [url for url, _ in cases]
+    tail_queue = []
+    stop = asyncio.Event()
+    peak = {"browser": 0}
+    sampler = asyncio.create_task(_sample_rss(stop, peak))
+
+    started = time.monotonic()
+    found = await form_checker.load_url_sharded(
+        urls,
+        processes,
+        max_concurrent,
+        pages_per_context,
+        deadline=deadline,
+        tail_queue=tail_queue,
+        archive=archive,
+        profile=profile,
+    )
+    elapsed = time.monotonic() - started
+    stop.set()
+    await sampler
+
+    found, timed_out = set(found), set(tail_queue)
+    wrong = []
+    for url, expected in cases:
+        if url in found:
+            actual = form_checker.VERDICT_FORM
+        elif url in timed_out:
+            actual = form_checker.VERDICT_TIMEOUT
+        else:
+            actual = form_checker.VERDICT_NO_FORM
+        if actual != expected:
+            wrong.append({"url": url, "expected": expected, "actual": actual})
+
+    totals = [
+        r["total"] for r in journal.run_records if r.get("total") is not None
+    ]
+    blocked = sum(r.get("blocked_requests") or 0 for r in journal.run_records)
+    allowed = sum(r.get("allowed_requests") or 0 for r in journal.run_records)
+    network_bytes = sum(r.get("network_bytes") or 0 for r in journal.run_records)
+    return {
+        "config": (
+            f"{max_concurrent}x{pages_per_context}"
+            if processes <= 1
+            else f"{processes}p{max_concurrent}x{pages_per_context}"
+        ),
+        "urls": len(urls),
+        "seconds": round(elapsed, 2),
+        "urls_per_sec": round(len(urls) / elapsed, 2) if elapsed > 0 else None,
+        "p50": percentile(totals, 50),
+        "p95": percentile(totals, 95),
+        "p99": percentile(totals, 99),
+        "blocked_requests": blocked,
+        "allowed_requests": allowed,
+        "network_kb_per_url": round(network_bytes / len(urls) / 1024, 1) if urls else None,
+        "peak_browser_rss_mb": round(peak["browser"], 1),
+        "peak_python_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "correct": len(urls) - len(wrong),
+        "wrong": wrong,
+    }
+
+
+def print_results(results):
+    header = (
+        f"{'config':<10}{'urls':>6}{'sec':>8}{'url/s':>8}{'p50':>8}{'p95':>8}"
+        f"{'p99':>8}{'rssMB':>8}{'blocked':>9}{'allowed':>9}{'netKB/u':>9}{'correct':>10}"
+    )
+    print("\n" + header)
+    for r in results:
+        fmt = lambda v: "-" if v is None else f"{v:.2f}"
+        print(
+            f"{r['config']:<10}{r['urls']:>6}{r['seconds']:>8}{fmt(r['urls_per_sec']):>8}"
+            f"{fmt(r['p50']):>8}{fmt(r['p95']):>8}{fmt(r['p99']):>8}"
+            f"{r['peak_browser_rss_mb']:>8}{r['blocked_requests']:>9}{r['allowed_requests']:>9}"
+            f"{fmt(r['network_kb_per_url']):>9}"
+            f"{r['correct']:>5}/{r['urls']:<4}"
+        )
+    for r in results:
+        for item in r["wrong"]:
+            print(
+                f"❌ [{r['config']}] {item['url']} 期望 {item['expected']}，实际 {item['actual']}"
+            )
+
+
+def compare_with_baseline(results, baseline_path, max_regression):
+    """与基线比较，返回发现的回归列表"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["config"]: r for r in json.load(f)}
+    regressions = []
+    for r in results:
+        base = baseline.get(r["config"])
+        if not base or not base.get("urls_per_sec") or not r["urls_per_sec"]:
+            continue
+        drop = 1 - r["urls_per_sec"] / base["urls_per_sec"]
+        if drop > max_regression:
+            regressions.append(
+                f"{r['config']}: 吞吐量 {base['urls_per_sec']} -> {r['urls_per_sec']} URL/s（下降 {drop:.0%}）"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="form_checker 离线基准测试")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每个合成站点重复次数")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS, help="并发配置，如 1x1,2x3,3x4")
+    parser.add_argument("--processes", default=DEFAULT_PROCESSES, help="分片进程数，如 1,2,4")
+    parser.add_argument(
+        "--blocking",
+        choices=["browser", "route"],
+        default=form_checker.REQUEST_BLOCKING,
+        help="请求拦截方式：browser（浏览器内）或 route（Python路由），用于对比",
+    )
+    parser.add_argument(
+        "--browser-profile",
+        help="使用该目录下的持久化浏览器配置（连续运行两次可比较冷/热缓存）",
+    )
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE, help="单URL时限（秒）")
+    parser.add_argument("--output", help="将结果写入JSON文件（可作为后续的基线）")
+    parser.add_argument("--baseline", help="基线JSON文件，吞吐量下降超过阈值时返回非0")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=DEFAULT_MAX_REGRESSION,
+        help=f"允许的最大吞吐量下降比例（默认: {DEFAULT_MAX_REGRESSION}）",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING"],
+        default="INFO",
+        help="运行时的日志级别（DEBUG输出单URL明细，可对比日志对吞吐量的影响）",
+    )
+    args = parser.parse_args()
+    app_logging.setup_logging(args.log_level)
+
+    # 基准测试不写入指标日志文件
+    get_journal().enabled = False
+    form_checker.REQUEST_BLOCKING = args.blocking
+
+    profile = BrowserProfile(args.browser_profile) if args.browser_profile else None
+    results = []
+    with FixtureServer() as server:
+        cases = build_urls(server, args.repeat)
+        print(f"🌐 合成站点: http://127.0.0.1:{server.port}，共 {len(cases)} 个URL")
+        for processes in [int(p) for p in args.processes.split(",")]:
+            for max_concurrent, pages_per_context in parse_configs(args.configs):
+                print(
+                    f"\n🏁 运行配置 {processes} 进程 × {max_concurrent}x{pages_per_context} ..."
+                )
+                results.append(
+                    asyncio.run(
+                        run_config(
+                            cases,
+                            max_concurrent,
+                            pages_per_context,
+                            args.deadline,
+                            processes=processes,
+                            profile=profile,
+                        )
+                    )
+                )
+
+    print_results(results)
+
+    overhead = measure_logging_overhead()
+    print("\n📝 单条URL日志在事件循环中的开销（微秒/条；slow为每次写入阻塞0.5ms的输出流）:")
+    for name, us in overhead.items():
+        print(f"   {name:<14}{us:>8.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.output}")
+
+    failed = any(r["wrong"] for r in results)
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.max_regression)
+        for line in regressions:
+            print(f"📉 性能回归: {line}")
+        failed = failed or bool(regressions)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
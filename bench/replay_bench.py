@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+真实页面录制与回放基准测试
+
+录制（访问真实网络，把每个URL的全部响应和结论保存到归档目录）：
+    python -m bench.replay_bench capture --urls-file urls.txt
+    python -m bench.replay_bench capture --url-groups 00,p0
+
+回放（无网络，从归档返回响应，校验结论并测量吞吐量）：
+    python -m bench.replay_bench replay --configs 1x1,3x4 --output replay.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+import form_checker
+from bench.form_checker_bench import (
+    DEFAULT_MAX_REGRESSION,
+    compare_with_baseline,
+    parse_configs,
+    print_results,
+    run_config,
+)
+from config import URL_GROUPS
+from metrics import get_journal
+from network_archive import DEFAULT_ARCHIVE_DIR, CaptureArchive, ReplayArchive
+
+# ===== 默认配置参数 =====
+DEFAULT_REPLAY_CONFIGS = "1x1,3x4"
+DEFAULT_CAPTURE_DEADLINE = 40  # 录制时的单URL时限（秒），尽量让每个URL完整检查
+DEFAULT_REPLAY_DEADLINE = 20  # 回放时的单URL时限（秒）
+
+
+def read_urls(args):
+    """从文件或URL_GROUPS读取要录制的URL"""
+    urls = []
+    if args.urls_file:
+        with open(args.urls_file, "r", encoding="utf-8") as f:
+            urls.extend(line.strip() for line in f if line.strip())
+    if args.url_groups:
+        for name in args.url_groups.split(","):
+            group_urls = URL_GROUPS.get(name, {}).get("urls", "")
+            urls.extend(u.strip() for u in group_urls.split(",") if u.strip())
+    # 去重并标准化，回放时以标准化URL为键
+    return list(dict.fromkeys(form_checker.normalize_url(u) for u in urls))
+
+
+def capture(args):
+    urls = read_urls(args)
+    if not urls:
+        print("⚠️ 没有要录制的URL，请指定 --urls-file 或 --url-groups")
+        return 1
+    archive = CaptureArchive(args.archive_dir)
+    print(f"🎙 录制 {len(urls)} 个URL到 {args.archive_dir} ...")
+    asyncio.run(
+        form_checker.load_url(
+            urls, 2, 3, deadline=DEFAULT_CAPTURE_DEADLINE, tail_queue=[], archive=archive
+        )
+    )
+    print(f"✅ 录制完成，保存 {archive.saved} 个归档")
+    return 0
+
+
+def replay(args):
+    archive = ReplayArchive(args.archive_dir)
+    cases = [(url, verdict) for url, verdict in archive.expected.items()]
+    if not cases:
+        print(f"⚠️ {args.archive_dir} 中没有归档，请先运行 capture")
+        return 1
+    print(f"▶️ 回放 {len(cases)} 个URL（{args.archive_dir}）")
+
+    results = []
+    for max_concurrent, pages_per_context in parse_configs(args.configs):
+        print(f"\n🏁 运行配置 {max_concurrent}x{pages_per_context} ...")
+        results.append(
+            asyncio.run(
+                run_config(
+                    cases, max_concurrent, pages_per_context, args.deadline, archive
+                )
+            )
+        )
+    print_results(results)
+    print(f"\n📼 归档命中 {archive.hits} 次，未命中（已中止）{archive.misses} 次")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入 {args.output}")
+
+    failed = any(r["wrong"] for r in results)
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.max_regression)
+        for line in regressions:
+            print(f"📉 性能回归: {line}")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="真实页面录制与回放基准测试")
+    parser.add_argument(
+        "--archive-dir",
+        default=DEFAULT_ARCHIVE_DIR,
+        help=f"归档目录（默认: {DEFAULT_ARCHIVE_DIR}）",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    capture_parser = subparsers.add_parser("capture", help="录制真实页面")
+    capture_parser.add_argument("--urls-file", help="URL列表文件，每行一个")
+    capture_parser.add_argument("--url-groups", help="从URL_GROUPS录制，如 00,p0")
+
+    replay_parser = subparsers.add_parser("replay", help="离线回放并测量")
+    replay_parser.add_argument("--configs", default=DEFAULT_REPLAY_CONFIGS, help="并发配置，如 1x1,3x4")
+    replay_parser.add_argument("--deadline", type=float, default=DEFAULT_REPLAY_DEADLINE, help="单URL时限（秒）")
+    replay_parser.add_argument("--output", help="将结果写入JSON文件")
+    replay_parser.add_argument("--baseline", help="基线JSON文件，吞吐量下降超过阈值时返回非0")
+    replay_parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION)
+    args = parser.parse_args()
+
+    # 基准测试不写入指标日志文件
+    get_journal().enabled = False
+    sys.exit(capture(args) if args.command == "capture" else replay(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Google Sheets 层基准测试：在本地伪 Sheets 后端上测量不同表格规模下
+append_data 去重、写入重试和 write_batch_to_sheets_with_retry 端到端的耗时
+
+    python -m bench.sheets_bench --sizes 1000,10000,100000 --latency 0.05
+    python -m bench.sheets_bench --no-mirror   # 去重和读回直接读取远端（不使用本地镜像）
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import google_sheets
+from bench.fake_sheets import FakeSheetsBackend
+from sheet_mirror import SheetMirror
+from get_url import write_batch_to_sheets_with_retry
+
+# ===== 默认配置参数 =====
+DEFAULT_SIZES = "1000,10000,100000"  # 预置的表格行数
+DEFAULT_BATCH_ROWS = 50  # 每次写入的行数（一半与已有数据重复）
+DEFAULT_LATENCY = 0.0  # 每个API请求的模拟延迟（秒）
+DEFAULT_RETRY_FAILURES = 1  # 重试测试中注入的连续失败次数
+SHEET_NAME = "TSTASK"
+WORKSHEET_NAME = "00"
+HEADER = ["href", "param", "日期", "负责人", "状态"]
+
+
+class BenchConfig:
+    """write_batch_to_sheets_with_retry 需要的最小配置"""
+
+    def get_sheets_config(self):
+        return {
+            "credentials_path": "fake-credentials.json",
+            "sheet_name": SHEET_NAME,
+            "worksheet_name": WORKSHEET_NAME,
+        }
+
+
+def make_backend(size, latency):
+    backend = FakeSheetsBackend(latency=latency)
+    spreadsheet_id = backend.create_spreadsheet(SHEET_NAME)
+    rows = [HEADER] + [
+        [f"https://site{i}.example.com/landing", f"p{i}", "2025-09-26", "", ""]
+        for i in range(size)
+    ]
+    backend.add_sheet(spreadsheet_id, WORKSHEET_NAME, rows)
+    google_sheets.set_client_factory(lambda _: backend.client())
+    return backend
+
+
+def make_batch(size, batch_rows, offset):
+    """一半已存在、一半新增的数据"""
+    half = batch_rows // 2
+    existing = [
+        {"href": f"https://site{i}.example.com/landing", "param": f"p{i}"}
+        for i in range(min(half, size))
+    ]
+    new = [
+        {"href": f"https://new{offset}-{i}.example.com/", "param": "new"}
+        for i in range(batch_rows - len(existing))
+    ]
+    return existing + new
+
+
+@contextlib.contextmanager
+def fake_backoff(record):
+    """跳过重试退避等待，只记录等待时长"""
+    original = time.sleep
+    time.sleep = lambda seconds: record.append(seconds)
+    try:
+        yield
+    finally:
+        time.sleep = original
+
+
+def measure(backend, func):
+    backend.reset_stats()
+    started = time.perf_counter()
+    # 写入流程会逐行打印读回的记录，测量时丢弃终端输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func()
+    elapsed = time.perf_counter() - started
+    stats = backend.stats
+    return {
+        "seconds": round(elapsed, 4),
+        "calls": sum(stats["calls"].values()),
+        "errors": stats["errors"],
+        "mb_out": round(stats["bytes_out"] / 1024 / 1024, 2),
+        "result": result,
+    }
+
+
+def run_size(size, batch_rows, latency, retry_failures, mirror_dir=None):
+    backend = make_backend(size, latency)
+    # 每个规模使用全新的临时镜像，第一次写入时整表同步
+    mirror = SheetMirror(os.path.join(mirror_dir, f"mirror_{size}.db")) if mirror_dir else False
+    google_sheets.set_mirror(mirror)
+    config = BenchConfig()
+    manager = google_sheets.GoogleSheetsManager("fake-credentials.json", SHEET_NAME)
+    worksheet = manager.get_or_create_worksheet(WORKSHEET_NAME)
+
+    from get_url import parse_data
+
+    rows = parse_data(make_batch(size, batch_rows, 0))
+    dedup = measure(backend, lambda: manager.append_data(worksheet, rows))
+
+    e2e = measure(
+        backend,
+        lambda: write_batch_to_sheets_with_retry(
+            make_batch(size, batch_rows, 1), 1, config, max_retries=3
+        ),
+    )
+
+    backoff = []
+    rows_before = len(backend.rows("fake-1", WORKSHEET_NAME))
+    backend.fail_next(retry_failures, kind="values.append")
+    with fake_backoff(backoff):
+        retry = measure(
+            backend,
+            lambda: write_batch_to_sheets_with_retry(
+                make_batch(size, batch_rows, 2), 2, config, max_retries=3
+            ),
+        )
+    retry["backoff_seconds"] = sum(backoff)
+    retry["retries"] = len(backoff)
+    # 一半是新数据，写入成功时应全部追加
+    expected_new = batch_rows - min(batch_rows // 2, size)
+    retry["lost_rows"] = expected_new - (
+        len(backend.rows("fake-1", WORKSHEET_NAME)) - rows_before
+    )
+
+    if mirror:
+        mirror.close()
+    return {
+        "size": size,
+        "append_dedup": dedup,
+        "end_to_end": e2e,
+        "retry": retry,
+        "final_rows": len(backend.rows("fake-1", WORKSHEET_NAME)),
+    }
+
+
+def print_results(results):
+    print(
+        f"\n{'rows':>8}{'dedup_s':>10}{'e2e_s':>10}{'e2e_calls':>11}{'e2e_MB':>9}"
+        f"{'retry_s':>10}{'retries':>9}{'lost':>6}{'us/row':>9}"
+    )
+    for r in results:
+        e2e = r["end_to_end"]
+        per_row = e2e["seconds"] / max(1, r["size"]) * 1e6
+        print(
+            f"{r['size']:>8}{r['append_dedup']['seconds']:>10}{e2e['seconds']:>10}"
+            f"{e2e['calls']:>11}{e2e['mb_out']:>9}{r['retry']['seconds']:>10}"
+            f"{r['retry']['retries']:>9}{r['retry']['lost_rows']:>6}{per_row:>9.1f}"
+        )
+    # 相邻规模的增长倍数，明显超过行数倍数即存在超线性开销
+    for prev, cur in zip(results, results[1:]):
+        rows_ratio = cur["size"] / max(1, prev["size"])
+        time_ratio = cur["end_to_end"]["seconds"] / max(1e-9, prev["end_to_end"]["seconds"])
+        flag = "⚠️ 超线性" if time_ratio > rows_ratio * 1.5 else "✓"
+        print(
+            f"   {prev['size']} -> {cur['size']}: 行数 x{rows_ratio:.0f}，端到端耗时 x{time_ratio:.1f} {flag}"
+        )
+    if any(r["retry"]["lost_rows"] for r in results):
+        print("   ⚠️ 注入的写入失败没有触发重试，部分数据丢失")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Google Sheets 层基准测试（本地伪后端）")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="预置表格行数，逗号分隔")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help="每次写入的行数")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY, help="每个API请求的模拟延迟（秒）")
+    parser.add_argument(
+        "--retry-failures",
+        type=int,
+        default=DEFAULT_RETRY_FAILURES,
+        help="重试测试中注入的连续失败次数",
+    )
+    parser.add_argument("--no-mirror", action="store_true", help="不使用工作表本地镜像")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    # 伪后端注入的错误会被记录为带堆栈的ERROR日志，测量时关闭日志输出
+    logging.disable(logging.CRITICAL)
+
+    results = []
+    with tempfile.TemporaryDirectory() as mirror_dir:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            print(f"🏁 表格规模 {size} 行 ...")
+            results.append(
+                run_size(
+                    size,
+                    args.batch_rows,
+                    args.latency,
+                    args.retry_failures,
+                    None if args.no_mirror else mirror_dir,
+                )
+            )
+    google_sheets.set_client_factory(None)
+    google_sheets.set_mirror(None)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+        print(f"\n💾 结果已写入 {args.output}")
+    if any(r["retry"]["lost_rows"] for r in results):
+        sys.exit(1)  # 写入失败没有重试成功，作为基准测试失败
+
+
+if __name__ == "__main__":
+    main()
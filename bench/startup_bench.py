@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准测试：在全新的子进程中测量各模块的导入耗时，检查导入时是否加载了重依赖
+（playwright/gspread/requests），并测量批量检查CLI从启动到写出第一条结论的延迟
+
+    python -m bench.startup_bench
+    python -m bench.startup_bench --repeat 10 --output startup.json --baseline last.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.fixture_server import FixtureServer
+
+# ===== 默认配置参数 =====
+DEFAULT_REPEAT = 5  # 每个模块测量的子进程次数（取中位数）
+DEFAULT_MAX_REGRESSION = 0.3  # 相对基线允许的最大耗时增长比例
+DEFAULT_FIRST_URL_TIMEOUT = 120  # 首个结论的最长等待时间（秒）
+
+# 入口会导入的模块
+MODULES = [
+    "config",
+    "robot",
+    "google_sheets",
+    "form_checker",
+    "bulk_check",
+    "coordinator",
+    "get_url",
+    "scheduler",
+]
+
+# 只应在第一次使用时导入的重依赖
+HEAVY_MODULES = ["playwright", "gspread", "requests"]
+
+# 子进程中执行的测量代码：输出导入耗时和已加载的重依赖
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def measure_import(module, repeat):
+    """在repeat个全新子进程中导入模块，返回导入耗时中位数（毫秒）和加载的重依赖"""
+    samples = []
+    heavy = set()
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result["seconds"] * 1000)
+        heavy.update(result["heavy"])
+    return {
+        "name": f"import {module}",
+        "ms": round(median(samples), 1),
+        "heavy": sorted(heavy),
+    }
+
+
+def measure_first_url(name, urls):
+    """运行批量检查CLI，返回从启动进程到写出第一条结论和全部完成的耗时（毫秒）"""
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        f.write("\n".join(urls) + "\n")
+        input_path = f.name
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "bulk_check.py", input_path],
+        cwd=REPO_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    first = None
+    verdict = None
+    try:
+        line = process.stdout.readline()
+        if line:
+            first = (time.perf_counter() - started) * 1000
+            verdict = json.loads(line).get("verdict")
+        process.stdout.read()
+        process.wait(DEFAULT_FIRST_URL_TIMEOUT)
+    finally:
+        if process.poll() is None:
+            process.kill()
+        os.unlink(input_path)
+    return {
+        "name": name,
+        "ms": None if first is None else round(first, 1),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "verdict": verdict,
+        "heavy": [],
+    }
+
+
+def _interpreter_startup(repeat):
+    """空解释器启动耗时（毫秒），作为导入耗时的参照"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"ms": round(median(samples), 1), "heavy": []}
+
+
+def print_results(results):
+    print(f"\n{'case':<28}{'ms':>10}{'total_ms':>10}  {'heavy imports / verdict'}")
+    for r in results:
+        ms = "-" if r["ms"] is None else f"{r['ms']:.1f}"
+        total = f"{r['total_ms']:.1f}" if "total_ms" in r else ""
+        extra = ",".join(r["heavy"]) or r.get("verdict") or ""
+        print(f"{r['name']:<28}{ms:>10}{total:>10}  {extra}")
+
+
+def compare_with_baseline(results, baseline_path, max_regression):
+    """与基线比较，返回发现的回归列表"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)}
+    regressions = []
+    for r in results:
+        base = baseline.get(r["name"])
+        if not base or not base.get("ms") or not r["ms"]:
+            continue
+        growth = r["ms"] / base["ms"] - 1
+        if growth > max_regression:
+            regressions.append(
+                f"{r['name']}: {base['ms']} -> {r['ms']} ms（增加 {growth:.0%}）"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每个模块测量次数")
+    parser.add_argument(
+        "--skip-browser",
+        action="store_true",
+        help="不测量需要启动浏览器的首个URL延迟",
+    )
+    parser.add_argument("--output", help="将结果写入JSON文件（可作为后续的基线）")
+    parser.add_argument("--baseline", help="基线JSON文件，耗时增长超过阈值时返回非0")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=DEFAULT_MAX_REGRESSION,
+        help=f"允许的最大耗时增长比例（默认: {DEFAULT_MAX_REGRESSION}）",
+    )
+    args = parser.parse_args()
+
+    results = [{"name": "python (baseline)", **_interpreter_startup(args.repeat)}]
+    for module in MODULES:
+        results.append(measure_import(module, args.repeat))
+
+    # 域名不存在的URL由DNS预解析直接判定，不启动浏览器
+    results.append(measure_first_url("first url (dns dead)", ["https://startup-bench.invalid/"]))
+    if not args.skip_browser:
+        with FixtureServer() as server:
+            results.append(
+                measure_first_url(
+                    "first url (browser)", [server.url(f"/server-form?t={time.time()}")]
+                )
+            )
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.output}")
+
+    # 导入时加载了重依赖视为回归
+    failed = False
+    for r in results:
+        if r["heavy"]:
+            print(f"📉 {r['name']} 在导入时加载了 {', '.join(r['heavy'])}")
+            failed = True
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.max_regression)
+        for line in regressions:
+            print(f"📉 性能回归: {line}")
+        failed = failed or bool(regressions)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+持久化浏览器配置目录：在持久化上下文中检查URL，保留有上限的磁盘HTTP缓存，
+同一落地页家族的脚本和公共框架在后续访问和后续运行中从缓存加载
+
+- 配置目录下按槽位（slot-0, slot-1, ...）划分，每个同时存在的持久化上下文独占一个槽位，
+  通过文件锁保证多进程/多批次不会同时使用同一目录
+- Chromium以 --disk-cache-size 限制HTTP缓存大小；启动前检查槽位缓存总大小，
+  超过上限或距上次清理超过 DEFAULT_PRUNE_INTERVAL_HOURS 时清空缓存目录
+- 每个上下文启动时清除cookie，只复用缓存，保持各次检查相互独立
+"""
+
+import fcntl
+import os
+import shutil
+import time
+import weakref
+
+# ===== 默认配置参数 =====
+DEFAULT_PROFILE_DIR = "browser_profile"  # 持久化配置根目录
+DEFAULT_DISK_CACHE_MB = 512  # 每个槽位的HTTP磁盘缓存上限（MB）
+DEFAULT_PRUNE_INTERVAL_HOURS = 72  # 定期清空缓存的间隔（小时）
+DEFAULT_MAX_SLOTS = 64  # 最多槽位数
+
+# 槽位中的缓存目录（相对槽位目录）
+CACHE_SUBDIRS = [
+    os.path.join("Default", "Cache"),
+    os.path.join("Default", "Code Cache"),
+    os.path.join("Default", "GPUCache"),
+    "GrShaderCache",
+    "ShaderCache",
+]
+
+PRUNE_MARKER = ".last_prune"
+
+# 本进程持有的槽位锁：槽位目录 -> 锁文件
+_slot_locks = {}
+
+# 每个页面经网络传输的字节数和缓存命中数（来自CDP Network事件）
+_page_network = weakref.WeakKeyDictionary()
+
+
+def get_dir_size_mb(path):
+    """目录总大小（MB），目录不存在时为0"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total / 1024 / 1024
+
+
+class BrowserProfile:
+    """持久化配置目录的槽位分配、缓存清理和启动参数（可在进程间传递）"""
+
+    def __init__(
+        self,
+        directory=DEFAULT_PROFILE_DIR,
+        cache_mb=DEFAULT_DISK_CACHE_MB,
+        prune_interval_hours=DEFAULT_PRUNE_INTERVAL_HOURS,
+    ):
+        self.directory = directory
+        self.cache_mb = cache_mb
+        self.prune_interval_hours = prune_interval_hours
+
+    def launch_args(self):
+        """Chromium启动参数：限制磁盘缓存大小"""
+        return [f"--disk-cache-size={int(self.cache_mb * 1024 * 1024)}"]
+
+    def acquire_slot(self):
+        """分配一个空闲槽位，返回槽位目录"""
+        os.makedirs(self.directory, exist_ok=True)
+        for index in range(DEFAULT_MAX_SLOTS):
+            slot_dir = os.path.join(self.directory, f"slot-{index}")
+            if slot_dir in _slot_locks:
+                continue
+            lock_file = open(slot_dir + ".lock", "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            _slot_locks[slot_dir] = lock_file
+            os.makedirs(slot_dir, exist_ok=True)
+            self.prune(slot_dir)
+            return slot_dir
+        raise RuntimeError(f"没有空闲的浏览器配置槽位（上限 {DEFAULT_MAX_SLOTS}）")
+
+    def release_slot(self, slot_dir):
+        lock_file = _slot_locks.pop(slot_dir, None)
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def prune(self, slot_dir):
+        """缓存超过上限或到了定期清理时间时清空槽位的缓存目录，返回是否清理"""
+        marker = os.path.join(slot_dir, PRUNE_MARKER)
+        try:
+            last_prune = os.path.getmtime(marker)
+        except OSError:
+            last_prune = None
+            with open(marker, "w"):
+                pass
+        cache_dirs = [os.path.join(slot_dir, sub) for sub in CACHE_SUBDIRS]
+        size_mb = sum(get_dir_size_mb(path) for path in cache_dirs)
+        expired = (
+            last_prune is not None
+            and time.time() - last_prune > self.prune_interval_hours * 3600
+        )
+        # 磁盘缓存由Chromium按上限淘汰，这里为代码缓存等其他目录留出余量
+        if size_mb <= self.cache_mb * 1.5 and not expired:
+            return False
+        for path in cache_dirs:
+            shutil.rmtree(path, ignore_errors=True)
+        os.utime(marker, None)
+        print(f"🧹 已清空浏览器缓存 {slot_dir}（{size_mb:.0f}MB）")
+        return True
+
+    def cache_size_mb(self):
+        """所有槽位的缓存总大小（MB）"""
+        if not os.path.isdir(self.directory):
+            return 0
+        return sum(
+            get_dir_size_mb(os.path.join(self.directory, slot, sub))
+            for slot in os.listdir(self.directory)
+            for sub in CACHE_SUBDIRS
+        )
+
+
+def track_network_bytes(page, session):
+    """通过CDP Network事件统计页面经网络传输的字节数和缓存命中数"""
+    _page_network[page] = {"network_bytes": 0, "cache_hits": 0}
+    if session is None:
+        return
+    session.on(
+        "Network.loadingFinished",
+        lambda event: _add_network(page, "network_bytes", event.get("encodedDataLength") or 0),
+    )
+    session.on(
+        "Network.requestServedFromCache",
+        lambda event: _add_network(page, "cache_hits", 1),
+    )
+
+
+def _add_network(page, key, value):
+    counters = _page_network.get(page)
+    if counters is not None:
+        counters[key] += int(value)
+
+
+def get_page_network(page):
+    """返回页面当前的网络字节数/缓存命中数副本"""
+    return dict(_page_network.get(page) or {"network_bytes": 0, "cache_hits": 0})
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+批量检查任意URL列表：从文件或标准输入流式读取URL，每得出一个结论就写出一行JSONL
+
+    python bulk_check.py urls.txt -o verdicts.jsonl
+    cat urls.jsonl | python bulk_check.py - -o verdicts.jsonl --resume
+    python form_checker.py urls.txt -o verdicts.jsonl
+
+输入每行一个URL，或一个包含 "url" 字段的JSON对象；
+输出每行 {"url": ..., "verdict": "form|no_form|timeout|crashed", "checked_at": ...}。
+输入由load_url的有界队列惰性读取，内存中的URL数不随输入规模增长；--resume 时跳过输出文件中
+已有最终结论（form/no_form）的URL，timeout/crashed 的URL重新检查并追加新的一行（以最后一行为准）。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import sys
+from datetime import datetime
+
+from app_logging import setup_logging
+from form_checker import (
+    DEFAULT_MAX_CONCURRENT,
+    DEFAULT_PAGES_PER_CONTEXT,
+    VERDICT_FORM,
+    VERDICT_NO_FORM,
+    load_url,
+)
+
+# 续跑时视为已完成的结论，超时和崩溃的URL会重新检查
+FINAL_VERDICTS = {VERDICT_FORM, VERDICT_NO_FORM}
+
+
+def url_digest(url):
+    """URL的8字节摘要，用于在内存中记录已完成的URL"""
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+
+
+def parse_line(line):
+    """解析一行输入，返回URL或None"""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("{"):
+        try:
+            return (json.loads(line).get("url") or "").strip() or None
+        except (json.JSONDecodeError, AttributeError):
+            return None
+    return line
+
+
+def load_done(path):
+    """读取已有输出文件中已得出最终结论（form/no_form）的URL摘要"""
+    done = set()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                    url, verdict = item.get("url"), item.get("verdict")
+                except (json.JSONDecodeError, AttributeError):
+                    continue  # 中断时写了一半的行
+                if url and verdict in FINAL_VERDICTS:
+                    done.add(url_digest(url))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def iter_urls(lines, done):
+    """把输入行流转换为URL流，跳过已完成和重复的URL"""
+    for line in lines:
+        url = parse_line(line)
+        if url is None:
+            continue
+        digest = url_digest(url)
+        if digest in done:
+            continue
+        done.add(digest)
+        yield url
+
+
+async def run_bulk(
+    lines,
+    out,
+    max_concurrent=DEFAULT_MAX_CONCURRENT,
+    pages_per_context=DEFAULT_PAGES_PER_CONTEXT,
+    done=None,
+):
+    """
+    流式检查，结论即时写入out，返回各结论的数量
+    :param lines: 输入行的可迭代对象
+    :param out: 输出文件对象（文本模式）
+    :param done: 跳过的URL摘要集合（续跑时为已完成的URL）
+    """
+    counts = {}
+
+    def write_verdict(url, verdict):
+        counts[verdict] = counts.get(verdict, 0) + 1
+        out.write(
+            json.dumps(
+                {
+                    "url": url,
+                    "verdict": verdict,
+                    "checked_at": datetime.now().isoformat(timespec="seconds"),
+                },
+                ensure_ascii=False,
+            )
+            + "\n"
+        )
+        out.flush()
+
+    await load_url(
+        iter_urls(lines, done if done is not None else set()),
+        max_concurrent,
+        pages_per_context,
+        on_result=write_verdict,
+    )
+    print(
+        f"📤 结论: {counts}（含表单 {counts.get(VERDICT_FORM, 0)}）", file=sys.stderr
+    )
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量检查URL是否包含表单（JSONL输出）")
+    parser.add_argument("input", help="URL列表文件（每行一个URL或JSON对象），- 表示标准输入")
+    parser.add_argument("-o", "--output", help="输出JSONL文件（默认: 标准输出）")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="跳过输出文件中已有最终结论（form/no_form）的URL并追加写入，超时/崩溃的URL重新检查",
+    )
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENT,
+        help=f"并发上下文数（默认: {DEFAULT_MAX_CONCURRENT}）",
+    )
+    parser.add_argument(
+        "--pages-per-context",
+        type=int,
+        default=DEFAULT_PAGES_PER_CONTEXT,
+        help=f"每上下文页面数（默认: {DEFAULT_PAGES_PER_CONTEXT}）",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default="INFO",
+        help="日志级别，DEBUG时输出单URL明细（默认: INFO，日志写到标准错误）",
+    )
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    if args.resume and not args.output:
+        parser.error("--resume 需要指定 --output")
+
+    done = load_done(args.output) if args.resume else set()
+    if done:
+        print(f"⏩ 续跑: 跳过 {len(done)} 个已完成的URL", file=sys.stderr)
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    out = (
+        open(args.output, "a" if args.resume else "w", encoding="utf-8")
+        if args.output
+        else sys.stdout
+    )
+    try:
+        # 检查过程的进度输出转到标准错误，标准输出只保留JSONL结论
+        with contextlib.redirect_stdout(sys.stderr):
+            counts = asyncio.run(
+                run_bulk(
+                    source,
+                    out,
+                    args.max_concurrent,
+                    args.pages_per_context,
+                    done,
+                )
+            )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"✅ 完成: {counts}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
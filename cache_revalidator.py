@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+空闲时段后台重新验证缓存结论（可选）
+
+    python scheduler.py --revalidate --revalidate-window 01:00-06:00 --revalidate-pages 2
+
+调度器进程大部分时间在等待下一次运行，重新验证器在空闲窗口内用少量页面重新检查
+下次运行前后会过期的缓存结论，使早上的运行尽量直接命中新鲜缓存：
+- 候选：过期时间早于「下次运行 + DEFAULT_HORIZON_HOURS」、且重新检查后的TTL能覆盖到那时的
+  form/no_form 缓存条目；错误类别的条目保留其退避，由正常运行在过期后重新检查
+- 重新检查期间原条目留在缓存中，只有新的 form/no_form 结论才覆盖；超时或出错时保留原结论
+- 优先级：按域名在最近几天接口返回数据（log/res_data_*.json）中出现的次数排序，同一域名先检查快过期的
+- 低优先级：只在时间窗口内、且没有任务运行时工作；每次最多检查 DEFAULT_CHUNK_SIZE 个URL后重新判断，
+  Linux上线程（及其启动的浏览器进程）的nice值调为 DEFAULT_NICE
+- 重新验证的检查照常写入指标日志和结论库，但不计入下一次运行的汇总报告
+- 缓存只在本进程内存中，--processes 大于1时分片子进程的缓存不受益
+"""
+
+import asyncio
+import datetime
+import glob
+import json
+import os
+import re
+import threading
+from urllib.parse import urlparse
+
+# ===== 默认配置参数 =====
+DEFAULT_REVALIDATE_WINDOW = "01:00-06:00"  # 允许后台重新验证的时间窗口
+DEFAULT_REVALIDATE_PAGES = 2  # 后台重新验证的并行页面数
+DEFAULT_HORIZON_HOURS = 3  # 重新验证在下次运行后多长时间内会过期的缓存
+DEFAULT_HISTORY_DAYS = 3  # 统计域名出现次数的接口数据天数
+DEFAULT_CHUNK_SIZE = 50  # 每轮检查的URL数，每轮之间检查窗口和任务状态
+DEFAULT_IDLE_POLL = 60  # 窗口外或任务运行中时的等待间隔（秒）
+DEFAULT_NICE = 10  # 重新验证线程的nice增量
+DEFAULT_RES_DATA_DIR = "log"
+
+
+def parse_window(text):
+    """解析时间窗口 "HH:MM-HH:MM"，返回 (开始time, 结束time)，可跨午夜"""
+    start, _, end = text.partition("-")
+    return (
+        datetime.datetime.strptime(start.strip(), "%H:%M").time(),
+        datetime.datetime.strptime(end.strip(), "%H:%M").time(),
+    )
+
+
+def window_end(window, now):
+    """now在窗口内时返回窗口结束时间，否则返回None"""
+    start, end = window
+    today_start = datetime.datetime.combine(now.date(), start)
+    today_end = datetime.datetime.combine(now.date(), end)
+    if start <= end:
+        return today_end if today_start <= now < today_end else None
+    # 跨午夜的窗口，如 22:00-05:00
+    if now >= today_start:
+        return today_end + datetime.timedelta(days=1)
+    return today_end if now < today_end else None
+
+
+def host_frequencies(directory=DEFAULT_RES_DATA_DIR, days=DEFAULT_HISTORY_DAYS, today=None):
+    """最近days天接口返回数据中各域名出现的次数"""
+    today = today or datetime.date.today()
+    dates = {(today - datetime.timedelta(days=n)).strftime("%Y%m%d") for n in range(days)}
+    counts = {}
+    for path in glob.glob(os.path.join(directory, "res_data_*.json")):
+        match = re.search(r"_(\d{8})\.json$", path)
+        if not match or match.group(1) not in dates:
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        for item in items if isinstance(items, list) else []:
+            href = isinstance(item, dict) and item.get("href")
+            if href:
+                host = _host_of(href)
+                counts[host] = counts.get(host, 0) + 1
+    return counts
+
+
+def _host_of(url):
+    if not url.startswith(("http://", "https://")):
+        url = f"https://{url}"
+    return urlparse(url).netloc
+
+
+def select_candidates(entries, horizon, host_counts, now=None):
+    """
+    选出需要重新验证的缓存条目，按域名热度降序、过期时间升序排列
+    :param entries: [(url, 结果类别, 过期时间)]（form_checker.list_cached_results）
+    :param horizon: 需要保持新鲜的时间点（下次运行 + DEFAULT_HORIZON_HOURS）
+    """
+    from form_checker import VERDICT_FORM, VERDICT_NO_FORM, get_cache_ttl_hours
+
+    now = now or datetime.datetime.now()
+    candidates = []
+    for url, outcome, expires in entries:
+        if outcome not in (VERDICT_FORM, VERDICT_NO_FORM) or expires >= horizon:
+            continue
+        # 重新检查后的结论到horizon之前又会过期（如超时只缓存1小时），检查了也用不上
+        if now + datetime.timedelta(hours=get_cache_ttl_hours(outcome)) < horizon:
+            continue
+        candidates.append((url, expires))
+    candidates.sort(key=lambda item: (-host_counts.get(_host_of(item[0]), 0), item[1]))
+    return [url for url, _ in candidates]
+
+
+class CacheRevalidator:
+    """调度器空闲时在后台线程中重新验证快过期的缓存结论"""
+
+    def __init__(
+        self,
+        scheduler,
+        window=DEFAULT_REVALIDATE_WINDOW,
+        pages=DEFAULT_REVALIDATE_PAGES,
+        res_data_dir=DEFAULT_RES_DATA_DIR,
+    ):
+        self.scheduler = scheduler
+        self.window = parse_window(window)
+        self.pages = max(1, pages)
+        self.res_data_dir = res_data_dir
+        self.stop_event = threading.Event()
+        self.stats = {"passes": 0, "checked": 0, "refreshed": 0}
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.run_forever, name="cache-revalidator", daemon=True
+        )
+        self._thread.start()
+        print(
+            f"♻️ 后台重新验证已启用：窗口 {self.window[0]:%H:%M}-{self.window[1]:%H:%M}，"
+            f"{self.pages} 个页面"
+        )
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _lower_priority(self):
+        """降低本线程的调度优先级，之后启动的浏览器进程继承该nice值（仅Linux）"""
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), DEFAULT_NICE)
+        except (AttributeError, OSError):
+            pass
+
+    def _stop_at(self, now):
+        """当前可以工作时返回本轮的截止时间，否则返回None"""
+        end = window_end(self.window, now)
+        if end is None or self.scheduler.is_busy():
+            return None
+        next_run = self.scheduler.next_run_time(now)
+        if next_run is not None:
+            end = min(end, next_run)
+        return end if end > now else None
+
+    def run_forever(self):
+        self._lower_priority()
+        while not self.stop_event.is_set():
+            try:
+                worked = self.run_pass()
+            except Exception as e:
+                print(f"⚠️ 后台重新验证出错: {e}")
+                worked = False
+            if not worked:
+                self.stop_event.wait(DEFAULT_IDLE_POLL)
+
+    def run_pass(self):
+        """重新验证一轮（最多DEFAULT_CHUNK_SIZE个URL），没有可做的工作时返回False"""
+        from form_checker import begin_revalidation, end_revalidation, list_cached_results, load_url
+        from metrics import get_journal
+
+        now = datetime.datetime.now()
+        stop_at = self._stop_at(now)
+        if stop_at is None:
+            return False
+        next_run = self.scheduler.next_run_time(now) or now
+        horizon = next_run + datetime.timedelta(hours=DEFAULT_HORIZON_HOURS)
+        urls = select_candidates(
+            list_cached_results(), horizon, host_frequencies(self.res_data_dir), now
+        )[:DEFAULT_CHUNK_SIZE]
+        if not urls:
+            return False
+
+        keys = begin_revalidation(urls)
+        try:
+            with get_journal().background():
+                asyncio.run(
+                    load_url(
+                        urls,
+                        max_concurrent=1,
+                        pages_per_context=self.pages,
+                        stop_at=stop_at.timestamp(),
+                    )
+                )
+        finally:
+            # 没有来得及检查或检查失败（如页面崩溃）的URL仍是原缓存
+            end_revalidation(keys)
+        checked = set(urls)
+        refreshed = sum(
+            1 for url, _, expires in list_cached_results() if url in checked and expires >= horizon
+        )
+        self.stats["passes"] += 1
+        self.stats["checked"] += len(urls)
+        self.stats["refreshed"] += refreshed
+        print(f"♻️ 后台重新验证 {len(urls)} 个缓存结论，{refreshed} 个已刷新")
+        # 一个都没有刷新（如浏览器无法启动）时等待一段时间再试，避免空转
+        return refreshed > 0
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-import logging
+
+import app_logging
+from browser_profile import DEFAULT_DISK_CACHE_MB
+from run_planner import DEFAULT_PLANNER_PAGES
 
 # ===== 默认配置参数 =====
 # 接口地址
@@ -9,6 +12,14 @@ API_URL = "http://testing-novabid-dsp.testing.svc.gzk8s.zhizh.com/api/admin/scri
 
 # 调度器默认配置
 DEFAULT_SCHEDULE_TIME = "08:00"
+DEFAULT_SCHEDULE = None  # 按工作表分别设置执行时间，如 "00=07:00,p0=07:30,p1=08:00"
+DEFAULT_CATCH_UP = "once"  # 错过运行的补跑策略：skip / once / all
+DEFAULT_SCHEDULER_WORKERS = 2  # 同时运行的任务数
+DEFAULT_METRICS_PORT = None  # Prometheus指标端点端口，为None时不启动
+DEFAULT_DEADLINE = None  # 每天的运行截止时间 "HH:MM"，为None时不限时
+DEFAULT_TIME_BUDGET = None  # 每次运行的时间预算（分钟），为None时不限时
+DEFAULT_REVALIDATE_WINDOW = "01:00-06:00"  # 后台重新验证缓存结论的时间窗口
+DEFAULT_REVALIDATE_PAGES = 2  # 后台重新验证的并行页面数
 # 查询n天前至今的数据（默认2天）
 DEFAULT_CACHE_DATE_LEN = 2
 
@@ -27,10 +38,17 @@ DEFAULT_MAX_BATCHES = 10
 DEFAULT_TIMEOUT = 15000
 DEFAULT_HEADLESS = True
 DEFAULT_WRITE_RETRY = 2
+DEFAULT_CAPTURE_DIR = None  # 网络录制归档目录，为None时不录制
+DEFAULT_BROWSER_PROFILE = None  # 持久化浏览器配置目录，为None时使用隐身上下文
+DEFAULT_PROCESSES = 1  # 分片检查的进程数
+DEFAULT_COORDINATOR_PORT = None  # 协调器端口，设置后由工作节点检查URL
+DEFAULT_COORDINATOR_HOST = "127.0.0.1"  # 协调器监听地址，其他主机上的工作节点需要 0.0.0.0
 
 # 日志默认配置
 DEFAULT_LOG_LEVEL = "INFO"
 DEFAULT_LOG_FILE = "log/app.log"
+DEFAULT_LOG_FORMAT = "text"  # text 或 json（每条记录一行JSON）
+DEFAULT_PROFILE_OUTPUT_DIR = "log/profile"  # --profile 的输出目录
 
 # URL映射表
 URL_GROUPS = {
@@ -64,6 +82,65 @@ def create_common_parser():
     scheduler_group.add_argument(
         "--run-now", action="store_true", help="立即执行一次任务（测试用）"
     )
+    scheduler_group.add_argument(
+        "--schedule",
+        type=str,
+        default=DEFAULT_SCHEDULE,
+        help="按工作表设置执行时间，如 \"00=07:00,p0=07:30,p1=08:00\"，工作表组用+连接（默认: 所有工作表在 --time 依次执行）",
+    )
+    scheduler_group.add_argument(
+        "--catch-up",
+        choices=["skip", "once", "all"],
+        default=DEFAULT_CATCH_UP,
+        help=f"调度器停止期间错过的运行的补跑策略（默认: {DEFAULT_CATCH_UP}）",
+    )
+    scheduler_group.add_argument(
+        "--scheduler-workers",
+        type=int,
+        default=DEFAULT_SCHEDULER_WORKERS,
+        help=f"同时运行的任务数（默认: {DEFAULT_SCHEDULER_WORKERS}）",
+    )
+    scheduler_group.add_argument(
+        "--metrics-port",
+        type=int,
+        default=DEFAULT_METRICS_PORT,
+        help="在该端口（127.0.0.1）提供Prometheus格式的 /metrics 端点（默认: 不启动）",
+    )
+    scheduler_group.add_argument(
+        "--deadline",
+        type=str,
+        default=DEFAULT_DEADLINE,
+        help="运行截止时间 HH:MM：按进度在工作表之间分配并行页面，到点停止并写出已有结果（默认: 不限时）",
+    )
+    scheduler_group.add_argument(
+        "--time-budget",
+        type=float,
+        default=DEFAULT_TIME_BUDGET,
+        help="每次运行的时间预算（分钟），与 --deadline 同时设置时取较早者（默认: 不限时）",
+    )
+    scheduler_group.add_argument(
+        "--planner-pages",
+        type=int,
+        default=DEFAULT_PLANNER_PAGES,
+        help=f"限时运行时所有工作表共享的并行页面数（默认: {DEFAULT_PLANNER_PAGES}）",
+    )
+    scheduler_group.add_argument(
+        "--revalidate",
+        action="store_true",
+        help="调度器空闲时在后台重新验证即将过期的缓存结论，使下次运行直接命中缓存",
+    )
+    scheduler_group.add_argument(
+        "--revalidate-window",
+        type=str,
+        default=DEFAULT_REVALIDATE_WINDOW,
+        help=f"后台重新验证的时间窗口 HH:MM-HH:MM（默认: {DEFAULT_REVALIDATE_WINDOW}）",
+    )
+    scheduler_group.add_argument(
+        "--revalidate-pages",
+        type=int,
+        default=DEFAULT_REVALIDATE_PAGES,
+        help=f"后台重新验证的并行页面数（默认: {DEFAULT_REVALIDATE_PAGES}）",
+    )
 
     # Google Sheets相关参数
     sheets_group = parser.add_argument_group("Google Sheets参数")
@@ -137,6 +214,42 @@ def create_common_parser():
         default=DEFAULT_WRITE_RETRY,
         help=f"Google Sheets写入失败重试次数（默认: {DEFAULT_WRITE_RETRY}）",
     )
+    checker_group.add_argument(
+        "--processes",
+        type=int,
+        default=DEFAULT_PROCESSES,
+        help=f"分片检查的进程数，每个进程独立运行浏览器（默认: {DEFAULT_PROCESSES}）",
+    )
+    checker_group.add_argument(
+        "--coordinator-port",
+        type=int,
+        default=DEFAULT_COORDINATOR_PORT,
+        help="作为协调器在该端口分发URL租约，由工作节点（coordinator.py worker）检查",
+    )
+    checker_group.add_argument(
+        "--coordinator-host",
+        type=str,
+        default=DEFAULT_COORDINATOR_HOST,
+        help=f"协调器监听地址，接口没有认证，仅在可信网络中开放（默认: {DEFAULT_COORDINATOR_HOST}）",
+    )
+    checker_group.add_argument(
+        "--capture-dir",
+        type=str,
+        default=DEFAULT_CAPTURE_DIR,
+        help="录制被检查页面的网络响应到该目录（用于离线回放基准测试）",
+    )
+    checker_group.add_argument(
+        "--browser-profile",
+        type=str,
+        default=DEFAULT_BROWSER_PROFILE,
+        help="在该目录下使用持久化浏览器配置，跨运行保留HTTP磁盘缓存",
+    )
+    checker_group.add_argument(
+        "--disk-cache-mb",
+        type=int,
+        default=DEFAULT_DISK_CACHE_MB,
+        help=f"持久化配置每个槽位的磁盘缓存上限MB（默认: {DEFAULT_DISK_CACHE_MB}）",
+    )
 
     # 日志相关参数
     log_group = parser.add_argument_group("日志参数")
@@ -152,37 +265,58 @@ def create_common_parser():
         default=DEFAULT_LOG_FILE,
         help=f"日志文件路径（默认: {DEFAULT_LOG_FILE}）",
     )
+    log_group.add_argument(
+        "--log-format",
+        choices=["text", "json"],
+        default=DEFAULT_LOG_FORMAT,
+        help=f"日志格式，DEBUG级别包含单URL明细（默认: {DEFAULT_LOG_FORMAT}）",
+    )
+    log_group.add_argument(
+        "--profile",
+        action="store_true",
+        help="剖析每次运行：CPU采样火焰图、事件循环延迟和协程运行/等待时间（与 --browser-profile 无关）",
+    )
+    log_group.add_argument(
+        "--profile-dir",
+        type=str,
+        default=DEFAULT_PROFILE_OUTPUT_DIR,
+        help=f"剖析结果目录（默认: {DEFAULT_PROFILE_OUTPUT_DIR}）",
+    )
 
     return parser
 
 
 def setup_logging(args):
-    """根据参数设置日志"""
-    log_level = getattr(logging, args.log_level.upper())
-
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(args.log_file, encoding="utf-8"),
-            logging.StreamHandler(),
-        ],
-    )
+    """根据参数设置日志（经队列在后台线程写出，见app_logging）"""
+    app_logging.setup_logging(args.log_level, args.log_file, args.log_format)
 
 
 class Config:
-    """配置管理类"""
+    """
+    配置管理类
+    构造时不读取命令行：入口脚本解析参数后传入，
+    Config(create_common_parser().parse_args())；args为None时使用全部默认值
+    """
 
     def __init__(self, args=None):
         if args is None:
-            parser = create_common_parser()
-            args = parser.parse_args()
+            args = create_common_parser().parse_args([])
 
         self.args = args
 
         # 调度器配置
         self.schedule_time = args.time
         self.run_now = args.run_now
+        self.schedule = args.schedule
+        self.catch_up = args.catch_up
+        self.scheduler_workers = args.scheduler_workers
+        self.metrics_port = args.metrics_port
+        self.deadline = args.deadline
+        self.time_budget = args.time_budget
+        self.planner_pages = args.planner_pages
+        self.revalidate = args.revalidate
+        self.revalidate_window = args.revalidate_window
+        self.revalidate_pages = args.revalidate_pages
         self.cache_date_len = args.cache_date_len
 
         # Google Sheets配置
@@ -205,13 +339,23 @@ class Config:
         self.timeout = args.timeout
         self.headless = args.headless
         self.write_retry = args.write_retry
+        self.capture_dir = args.capture_dir
+        self.processes = args.processes
+        self.coordinator_port = args.coordinator_port
+        self.coordinator_host = args.coordinator_host
+        self.browser_profile = args.browser_profile
+        self.disk_cache_mb = args.disk_cache_mb
 
         # 日志配置
         self.log_level = args.log_level
         self.log_file = args.log_file
+        self.log_format = args.log_format
+        self.profile = args.profile
+        self.profile_dir = args.profile_dir
 
-        # 设置日志
-        setup_logging(args)
+    def setup_logging(self):
+        """按配置设置日志（由入口脚本调用，构造Config不打开日志文件）"""
+        setup_logging(self.args)
 
     def get_sheets_config(self):
         """获取Google Sheets配置"""
@@ -231,12 +375,18 @@ class Config:
             "timeout": self.timeout,
             "headless": self.headless,
             "write_retry": self.write_retry,
+            "capture_dir": self.capture_dir,
+            "processes": self.processes,
+            "coordinator_port": self.coordinator_port,
+            "coordinator_host": self.coordinator_host,
+            "browser_profile": self.browser_profile,
+            "disk_cache_mb": self.disk_cache_mb,
         }
 
 
 if __name__ == "__main__":
     # 测试配置模块
-    config = Config()
+    config = Config(create_common_parser().parse_args())
     print("调度时间:", config.schedule_time)
     print("Google Sheets配置:", config.get_sheets_config())
     print("表单检查配置:", config.get_checker_config())
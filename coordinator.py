@@ -0,0 +1,628 @@
+# -*- coding: utf-8 -*-
+"""
+多节点检查：协调器通过HTTP把URL按租约分发给任意数量的工作节点，
+工作节点用 form_checker.load_url 检查后回报结论；租约超时未回报的URL重新入队
+
+工作节点在一个浏览器会话中连续领取租约，租约的URL流式送入同一个 load_url，
+不为每个租约重新启动浏览器；一轮提交的URL共用同一个单URL时限（尾部队列重试时放宽），
+时限变化时工作节点以新时限开始新的会话
+
+    # 单机测试：启动协调器和3个本地工作进程
+    python coordinator.py local --urls-file urls.txt --workers 3
+    # 工作节点（连接到运行 get_url --coordinator-port 8790 --coordinator-host 0.0.0.0 的主机）
+    python coordinator.py worker --coordinator http://10.0.0.5:8790
+
+协调器默认只监听本机（127.0.0.1）；接口没有认证，对其他主机开放时只应在可信网络中使用。
+回报的结论只对该租约（或刚超时的租约）中的URL生效。
+
+协议（JSON over HTTP）：
+    POST /lease     {"worker": id}                     -> {"lease_id", "urls", "ttl", "deadline"} / {"urls": [], "retry_after"}
+    POST /heartbeat {"lease_id"}                       -> {"ok": bool}
+    POST /report    {"lease_id", "verdicts": {url: v}} -> {"accepted": n}
+    GET  /status                                       -> 进度
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from browser_profile import BrowserProfile
+from form_checker import (
+    DEFAULT_MAX_CONCURRENT,
+    DEFAULT_PAGES_PER_CONTEXT,
+    VERDICT_CRASHED,
+    VERDICT_FORM,
+    VERDICT_TIMEOUT,
+    load_url,
+)
+
+# ===== 默认配置参数 =====
+DEFAULT_COORDINATOR_HOST = "127.0.0.1"  # 只监听本机，多节点时显式指定 0.0.0.0
+DEFAULT_COORDINATOR_PORT = 8790
+DEFAULT_LEASE_SIZE = 20  # 每个租约的URL数
+DEFAULT_LEASE_TTL = 300  # 租约有效期（秒），工作节点通过心跳续期
+DEFAULT_MAX_LEASE_ATTEMPTS = 3  # 单个URL的租约超时次数上限，超过后记为超时
+DEFAULT_WORKER_IDLE_SLEEP = 5  # 工作节点无任务或协调器不可达时的等待时间（秒）
+DEFAULT_REQUEST_TIMEOUT = 30  # 工作节点HTTP请求超时（秒）
+DEFAULT_STALL_TIMEOUT = 600  # 等待结论时持续这么久（秒）没有任何进展则放弃等待（如没有工作节点连接）
+
+
+class LeaseCoordinator:
+    """租约状态：待分发队列、进行中的租约和已回报的结论（线程安全）"""
+
+    def __init__(
+        self,
+        lease_size=DEFAULT_LEASE_SIZE,
+        lease_ttl=DEFAULT_LEASE_TTL,
+        max_attempts=DEFAULT_MAX_LEASE_ATTEMPTS,
+    ):
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max_attempts
+        self._cond = threading.Condition()
+        self.pending = deque()
+        self.leases = {}  # lease_id -> {"urls", "worker", "expires"}
+        self.expired = {}  # 最近超时的租约 lease_id -> {"urls", "expired_at"}，接受迟到的回报
+        self.verdicts = {}
+        self.attempts = {}
+        self.expected = set()
+        self.deadline = None  # 本轮的单URL时限（秒），为None时工作节点使用自适应时限
+        self.workers = {}  # worker -> 最后一次请求时间
+        self.expired_leases = 0
+
+    def submit(self, urls, deadline=None):
+        """
+        提交一批待检查的URL
+        :param deadline: 单URL时限（秒），随租约下发给工作节点
+        """
+        with self._cond:
+            self.deadline = deadline
+            for url in urls:
+                if url in self.expected:
+                    continue
+                self.expected.add(url)
+                self.pending.append(url)
+            self._cond.notify_all()
+
+    def lease(self, worker):
+        """为工作节点分配一个租约，没有待分发URL时返回空列表"""
+        with self._cond:
+            self._expire()
+            self.workers[worker] = time.time()
+            urls = []
+            while self.pending and len(urls) < self.lease_size:
+                url = self.pending.popleft()
+                if url not in self.verdicts:
+                    urls.append(url)
+            if not urls:
+                return {"urls": [], "retry_after": DEFAULT_WORKER_IDLE_SLEEP}
+            lease_id = uuid.uuid4().hex
+            self.leases[lease_id] = {
+                "urls": urls,
+                "worker": worker,
+                "expires": time.monotonic() + self.lease_ttl,
+            }
+            return {
+                "lease_id": lease_id,
+                "urls": urls,
+                "ttl": self.lease_ttl,
+                "deadline": self.deadline,
+            }
+
+    def heartbeat(self, lease_id):
+        """续期租约，租约已过期时返回False"""
+        with self._cond:
+            lease = self.leases.get(lease_id)
+            if lease is None:
+                return False
+            lease["expires"] = time.monotonic() + self.lease_ttl
+            self.workers[lease["worker"]] = time.time()
+            return True
+
+    def report(self, lease_id, verdicts):
+        """
+        记录结论：只接受该租约中的URL；租约刚超时（一个有效期内）时迟到的结论仍然接受
+        （URL尚无结论时），未知租约的回报全部忽略
+        """
+        with self._cond:
+            self._expire()
+            lease = self.leases.pop(lease_id, None)
+            if lease is not None:
+                allowed = set(lease["urls"])
+            elif lease_id in self.expired:
+                allowed = set(self.expired.pop(lease_id)["urls"])
+            else:
+                allowed = set()
+            accepted = 0
+            for url, verdict in verdicts.items():
+                if url in allowed and url in self.expected and url not in self.verdicts:
+                    self.verdicts[url] = verdict
+                    accepted += 1
+            # 租约中未回报的URL重新入队
+            if lease is not None:
+                for url in lease["urls"]:
+                    if url not in self.verdicts:
+                        self._requeue(url)
+            self._cond.notify_all()
+            return accepted
+
+    def _requeue(self, url):
+        self.attempts[url] = self.attempts.get(url, 0) + 1
+        if self.attempts[url] >= self.max_attempts:
+            print(f"⚠️ URL租约超时次数达到上限，记为超时: {url}")
+            self.verdicts[url] = VERDICT_TIMEOUT
+        else:
+            self.pending.append(url)
+
+    def _expire(self):
+        now = time.monotonic()
+        for lease_id, lease in list(self.expired.items()):
+            if lease["expired_at"] + self.lease_ttl < now:
+                del self.expired[lease_id]
+        for lease_id, lease in list(self.leases.items()):
+            if lease["expires"] < now:
+                del self.leases[lease_id]
+                self.expired[lease_id] = {"urls": lease["urls"], "expired_at": now}
+                self.expired_leases += 1
+                print(
+                    f"⏱ 工作节点 {lease['worker']} 的租约超时，{len(lease['urls'])} 个URL重新入队"
+                )
+                for url in lease["urls"]:
+                    if url not in self.verdicts:
+                        self._requeue(url)
+
+    def is_done(self):
+        with self._cond:
+            return len(self.verdicts) >= len(self.expected)
+
+    def wait(self, poll=1.0, stop=None):
+        """
+        阻塞直到所有已提交的URL都有结论
+        :param stop: 每次轮询时调用，返回True时放弃等待
+        :return: 是否全部完成
+        """
+        with self._cond:
+            while len(self.verdicts) < len(self.expected):
+                if stop is not None and stop():
+                    return False
+                self._expire()
+                self._cond.wait(poll)
+            return True
+
+    def take_verdicts(self):
+        """取出全部结论并清空本轮状态"""
+        with self._cond:
+            verdicts = self.verdicts
+            self.verdicts = {}
+            self.expected = set()
+            self.attempts = {}
+            self.deadline = None
+            self.pending.clear()
+            self.leases = {}
+            self.expired = {}
+            return verdicts
+
+    def status(self):
+        with self._cond:
+            return {
+                "expected": len(self.expected),
+                "done": len(self.verdicts),
+                "pending": len(self.pending),
+                "leases": len(self.leases),
+                "expired_leases": self.expired_leases,
+                "workers": {w: round(time.time() - t, 1) for w, t in self.workers.items()},
+            }
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    """协调器HTTP接口"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/status":
+            return self._reply(200, self.server.coordinator.status())
+        return self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        coordinator = self.server.coordinator
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            return self._reply(400, {"error": "invalid json"})
+
+        if self.path == "/lease":
+            return self._reply(200, coordinator.lease(body.get("worker", "unknown")))
+        if self.path == "/heartbeat":
+            return self._reply(200, {"ok": coordinator.heartbeat(body.get("lease_id"))})
+        if self.path == "/report":
+            accepted = coordinator.report(body.get("lease_id"), body.get("verdicts", {}))
+            return self._reply(200, {"accepted": accepted})
+        return self._reply(404, {"error": "not found"})
+
+
+class CoordinatorServer:
+    """在后台线程中运行的协调器HTTP服务"""
+
+    def __init__(
+        self,
+        coordinator=None,
+        host=DEFAULT_COORDINATOR_HOST,
+        port=DEFAULT_COORDINATOR_PORT,
+    ):
+        self.coordinator = coordinator or LeaseCoordinator()
+        self.httpd = ThreadingHTTPServer((host, port), CoordinatorHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.coordinator = self.coordinator
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"🛰 协调器已启动，端口 {self.port}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+_server = None
+
+
+def get_coordinator_server(port=DEFAULT_COORDINATOR_PORT, host=None):
+    """获取进程内的协调器服务（首次调用时启动，之后各批次复用）"""
+    global _server
+    if _server is None:
+        _server = CoordinatorServer(host=host or DEFAULT_COORDINATOR_HOST, port=port).start()
+    return _server
+
+
+def _stall_check(coordinator, stop_at=None, stall_timeout=DEFAULT_STALL_TIMEOUT):
+    """wait()的stop回调：到达截止时间，或持续stall_timeout秒没有新结论时返回True"""
+    progress = {"done": -1, "since": time.monotonic()}
+
+    def stop():
+        if stop_at is not None and time.time() >= stop_at:
+            return True
+        done = len(coordinator.verdicts)
+        if done != progress["done"]:
+            progress["done"], progress["since"] = done, time.monotonic()
+        return time.monotonic() - progress["since"] >= stall_timeout
+
+    return stop
+
+
+def check_urls_distributed(
+    urls,
+    server,
+    tail_queue=None,
+    stop_at=None,
+    stall_timeout=DEFAULT_STALL_TIMEOUT,
+    deadline=None,
+):
+    """
+    把URL分发给工作节点检查，阻塞直到全部有结论，返回包含表单的URL（保持输入顺序）
+    :param tail_queue: 超时URL的收集列表；放弃等待时没有结论的URL也放入其中
+    :param deadline: 单URL时限（秒），为None时工作节点使用自适应时限
+    :param stop_at: 运行截止时间（time.time()时间戳），到达后不再等待
+    :param stall_timeout: 持续这么久（秒）没有新结论（如没有工作节点连接）时不再等待
+    """
+    coordinator = server.coordinator
+    coordinator.submit(urls, deadline)
+    print(f"🛰 已提交 {len(urls)} 个URL，等待工作节点领取...")
+    done = coordinator.wait(stop=_stall_check(coordinator, stop_at, stall_timeout))
+    verdicts = coordinator.take_verdicts()
+    unfinished = [u for u in urls if u not in verdicts]
+    if not done:
+        reason = "已到运行截止时间" if stop_at and time.time() >= stop_at else "工作节点长时间没有进展"
+        print(f"⚠️ {reason}，{len(unfinished)} 个URL没有结论，移入尾部队列")
+    if tail_queue is not None:
+        tail_queue.extend(
+            u for u in urls if verdicts.get(u) == VERDICT_TIMEOUT or u not in verdicts
+        )
+    return [u for u in urls if verdicts.get(u) == VERDICT_FORM]
+
+
+# ===== 工作节点 =====
+
+
+def _post(url, payload, timeout=DEFAULT_REQUEST_TIMEOUT):
+    data = json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+async def _heartbeat_loop(coordinator_url, lease_id, interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            ok = await asyncio.to_thread(
+                _post, f"{coordinator_url}/heartbeat", {"lease_id": lease_id}
+            )
+            if not ok.get("ok"):
+                print(f"⚠️ 租约 {lease_id[:8]} 已失效")
+        except (urllib.error.URLError, OSError) as e:
+            print(f"⚠️ 心跳失败: {e}")
+
+
+class _LeaseStream:
+    """
+    工作节点的租约流：领取租约并把URL逐个交给同一个load_url会话，
+    某个租约的URL全部得出结论后立即回报，会话结束时回报未完成的租约（未回报的URL由协调器重新分发）
+    """
+
+    def __init__(self, coordinator_url, worker_id, exit_when_idle):
+        self.coordinator_url = coordinator_url
+        self.worker_id = worker_id
+        self.exit_when_idle = exit_when_idle
+        self.deadline = None  # 当前会话的单URL时限
+        self.next_lease = None  # 已领取、留给下一个会话的租约
+        self.finished = False  # 没有待分发URL且exit_when_idle
+        self.switched = False  # 本会话因时限变化而结束
+        self.checked = 0
+        self._open = {}  # lease_id -> {"urls", "pending", "verdicts", "heartbeat"}
+        self._url_leases = {}  # url -> lease_id
+        self._reports = set()
+
+    async def lease(self):
+        """领取一个非空租约；exit_when_idle时没有待分发URL或协调器不可达则返回None"""
+        while True:
+            try:
+                lease = await asyncio.to_thread(
+                    _post, f"{self.coordinator_url}/lease", {"worker": self.worker_id}
+                )
+            except (urllib.error.URLError, OSError) as e:
+                if self.exit_when_idle:
+                    return None
+                print(f"⚠️ 协调器不可达，{DEFAULT_WORKER_IDLE_SLEEP}秒后重试: {e}")
+                await asyncio.sleep(DEFAULT_WORKER_IDLE_SLEEP)
+                continue
+            if lease.get("urls"):
+                return lease
+            if self.exit_when_idle:
+                return None
+            await asyncio.sleep(lease.get("retry_after", DEFAULT_WORKER_IDLE_SLEEP))
+
+    async def urls(self):
+        """load_url的输入：按需领取租约，时限与本会话不同的租约留给下一个会话"""
+        while True:
+            lease, self.next_lease = self.next_lease, None
+            if lease is None:
+                lease = await self.lease()
+                if lease is None:
+                    self.finished = True
+                    return
+            if lease.get("deadline") != self.deadline:
+                self.next_lease = lease
+                self.switched = True
+                return
+            self._start(lease)
+            for url in lease["urls"]:
+                yield url
+
+    def _start(self, lease):
+        lease_id = lease["lease_id"]
+        self._open[lease_id] = {
+            "urls": lease["urls"],
+            "pending": set(lease["urls"]),
+            "verdicts": {},
+            "heartbeat": asyncio.create_task(
+                _heartbeat_loop(self.coordinator_url, lease_id, max(1, lease["ttl"] / 3))
+            ),
+        }
+        for url in lease["urls"]:
+            self._url_leases[url] = lease_id
+
+    def collect(self, url, verdict):
+        """load_url的on_result回调；崩溃重试耗尽的URL不回报，由协调器重新分发"""
+        lease_id = self._url_leases.pop(url, None)
+        lease = self._open.get(lease_id)
+        if lease is None:
+            return
+        lease["pending"].discard(url)
+        if verdict != VERDICT_CRASHED:
+            lease["verdicts"][url] = verdict
+        if not lease["pending"]:
+            self._report(lease_id)
+
+    def _report(self, lease_id):
+        lease = self._open.pop(lease_id)
+        lease["heartbeat"].cancel()
+        task = asyncio.create_task(self._send_report(lease_id, lease))
+        self._reports.add(task)
+        task.add_done_callback(self._reports.discard)
+
+    async def _send_report(self, lease_id, lease):
+        verdicts = lease["verdicts"]
+        if len(verdicts) < len(lease["urls"]):
+            print(
+                f"⚠️ 租约 {lease_id[:8]} 中 {len(lease['urls']) - len(verdicts)} 个URL没有结论，交还协调器"
+            )
+        try:
+            await asyncio.to_thread(
+                _post,
+                f"{self.coordinator_url}/report",
+                {"lease_id": lease_id, "verdicts": verdicts},
+            )
+            self.checked += len(verdicts)
+        except (urllib.error.URLError, OSError) as e:
+            # 协调器会在租约超时后重新分发这些URL
+            print(f"⚠️ 回报结论失败: {e}")
+
+    async def close_session(self):
+        """会话结束：回报未完成的租约并等待所有回报发出"""
+        for lease_id in list(self._open):
+            self._report(lease_id)
+        self._url_leases.clear()
+        if self._reports:
+            await asyncio.gather(*list(self._reports))
+
+
+async def run_worker(
+    coordinator_url,
+    worker_id=None,
+    max_concurrent=None,
+    pages_per_context=None,
+    exit_when_idle=False,
+    profile=None,
+):
+    """
+    工作节点主循环：在一个浏览器会话中连续 领取租约 -> 检查 -> 回报结论，
+    只在时限变化或会话出错（如浏览器无法启动）时重新开始会话
+    :param exit_when_idle: 协调器没有待分发URL时退出（单机测试用）
+    :param profile: 持久化浏览器配置（browser_profile.BrowserProfile）
+    """
+    coordinator_url = coordinator_url.rstrip("/")
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    max_concurrent = max_concurrent or DEFAULT_MAX_CONCURRENT
+    pages_per_context = pages_per_context or DEFAULT_PAGES_PER_CONTEXT
+    print(f"👷 工作节点 {worker_id} 连接协调器 {coordinator_url}")
+
+    stream = _LeaseStream(coordinator_url, worker_id, exit_when_idle)
+    while not stream.finished:
+        # 先领取第一个租约，按其时限开始会话
+        lease = stream.next_lease or await stream.lease()
+        if lease is None:
+            break
+        stream.next_lease = lease
+        stream.deadline = lease.get("deadline")
+        stream.switched = False
+        checked = stream.checked
+        try:
+            await load_url(
+                stream.urls(),
+                max_concurrent,
+                pages_per_context,
+                deadline=stream.deadline,
+                profile=profile,
+                on_result=stream.collect,
+            )
+        except Exception as e:
+            print(f"⚠️ 检查会话出错: {e}")
+        finally:
+            await stream.close_session()
+        if stream.checked == checked and not stream.switched and not stream.finished:
+            # 本节点无法检查（如浏览器无法启动），稍后再领取
+            await asyncio.sleep(DEFAULT_WORKER_IDLE_SLEEP)
+
+    print(f"👷 工作节点 {worker_id} 退出，共检查 {stream.checked} 个URL")
+
+
+def run_local(urls, workers, port, max_concurrent, pages_per_context):
+    """单机测试：启动协调器和若干本地工作进程，返回结论"""
+    server = CoordinatorServer(host="127.0.0.1", port=port).start()
+    server.coordinator.submit(urls)
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "worker",
+        "--coordinator",
+        f"http://127.0.0.1:{server.port}",
+        "--exit-when-idle",
+    ]
+    if max_concurrent:
+        command += ["--max-concurrent", str(max_concurrent)]
+    if pages_per_context:
+        command += ["--pages-per-context", str(pages_per_context)]
+
+    started = time.monotonic()
+    processes = [subprocess.Popen(command) for _ in range(workers)]
+    try:
+        # 工作进程全部退出后仍未完成（如某节点崩溃且租约尚未超时）时停止等待
+        done = server.coordinator.wait(
+            stop=lambda: all(p.poll() is not None for p in processes)
+        )
+        if not done:
+            print(f"⚠️ 工作进程已全部退出，部分URL没有结论: {server.coordinator.status()}")
+    finally:
+        for process in processes:
+            process.wait()
+        server.stop()
+    elapsed = time.monotonic() - started
+    verdicts = server.coordinator.take_verdicts()
+    print(
+        f"🎯 {workers} 个工作进程检查 {len(urls)} 个URL，用时 {elapsed:.1f}s，"
+        f"{len(urls) / elapsed:.2f} URL/s"
+    )
+    return verdicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多节点表单检查：协调器与工作节点")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    worker_parser = subparsers.add_parser("worker", help="运行工作节点")
+    worker_parser.add_argument("--coordinator", required=True, help="协调器地址，如 http://10.0.0.5:8790")
+    worker_parser.add_argument("--worker-id", help="工作节点ID（默认: 主机名-进程号）")
+    worker_parser.add_argument("--max-concurrent", type=int, help="并发上下文数")
+    worker_parser.add_argument("--pages-per-context", type=int, help="每上下文页面数")
+    worker_parser.add_argument("--exit-when-idle", action="store_true", help="没有待分发URL时退出")
+    worker_parser.add_argument("--browser-profile", help="持久化浏览器配置目录（跨租约保留HTTP缓存）")
+
+    local_parser = subparsers.add_parser("local", help="单机测试：协调器 + 本地工作进程")
+    local_parser.add_argument("--urls-file", required=True, help="URL列表文件，每行一个")
+    local_parser.add_argument("--workers", type=int, default=2, help="本地工作进程数")
+    local_parser.add_argument("--port", type=int, default=0, help="协调器端口（默认随机）")
+    local_parser.add_argument("--max-concurrent", type=int, help="每个工作进程的并发上下文数")
+    local_parser.add_argument("--pages-per-context", type=int, help="每上下文页面数")
+    local_parser.add_argument("--output", help="将结论写入JSON文件")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        asyncio.run(
+            run_worker(
+                args.coordinator,
+                args.worker_id,
+                args.max_concurrent,
+                args.pages_per_context,
+                args.exit_when_idle,
+                BrowserProfile(args.browser_profile) if args.browser_profile else None,
+            )
+        )
+        return
+
+    with open(args.urls_file, "r", encoding="utf-8") as f:
+        urls = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+    verdicts = run_local(
+        urls, args.workers, args.port, args.max_concurrent, args.pages_per_context
+    )
+    counts = {}
+    for verdict in verdicts.values():
+        counts[verdict] = counts.get(verdict, 0) + 1
+    print(f"🏷 结论: {counts}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(verdicts, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
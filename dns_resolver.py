@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+异步DNS预解析：在启动浏览器检查前并发解析一批URL的域名，
+NXDOMAIN（域名不存在）或只解析到无法连接的地址（0.0.0.0、127.0.0.0/8、169.254.0.0/16等，
+常见于停放域名）的URL直接判定为无法访问，不再等待Playwright导航超时；
+RFC 1918等内网地址可能是内网DNS的分区解析（split-horizon），照常交给浏览器检查
+
+- 直接向 /etc/resolv.conf 中的DNS服务器发送UDP查询（A记录），按应答中的TTL缓存结果，
+  NXDOMAIN按SOA记录的否定缓存TTL（RFC 2308）缓存
+- /etc/hosts 中的域名和IP地址不查询；查询超时、SERVFAIL或没有A记录时退回系统解析器
+  （getaddrinfo），系统解析器也报告域名不存在时才判定为失效
+- 存活域名的查询同时预热了上游DNS服务器的缓存，浏览器随后导航时解析更快
+"""
+
+import asyncio
+import ipaddress
+import random
+import socket
+import struct
+import time
+from urllib.parse import urlparse
+
+# ===== 默认配置参数 =====
+DEFAULT_DNS_TIMEOUT = 2  # 单次UDP查询超时（秒）
+DEFAULT_DNS_ATTEMPTS = 2  # UDP查询次数
+DEFAULT_DNS_CONCURRENCY = 100  # 同时进行的查询数
+DEFAULT_DNS_MIN_TTL = 60  # 缓存TTL下限（秒）
+DEFAULT_DNS_MAX_TTL = 3600  # 存活结果缓存TTL上限（秒）
+DEFAULT_DNS_NEGATIVE_TTL = 3600  # 没有SOA时的否定缓存TTL（秒）
+DEFAULT_DNS_MAX_NEGATIVE_TTL = 86400  # 否定缓存TTL上限（秒）
+DEFAULT_SYSTEM_RESOLVER_TTL = 300  # 系统解析器结果的缓存TTL（秒，系统解析器不返回TTL）
+DEFAULT_DNS_CACHE_SIZE = 100000  # 缓存的域名数上限，超出时淘汰最早写入的
+
+# 解析结论
+HOST_ALIVE = "alive"
+HOST_DEAD = "dead"
+HOST_UNKNOWN = "unknown"  # 查询失败，交给浏览器导航判断
+
+_RCODE_NOERROR = 0
+_RCODE_NXDOMAIN = 3
+_TYPE_A = 1
+_TYPE_CNAME = 5
+_TYPE_SOA = 6
+
+
+def read_nameservers(path="/etc/resolv.conf"):
+    """读取系统DNS服务器列表"""
+    nameservers = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == "nameserver":
+                    nameservers.append(parts[1])
+    except OSError:
+        pass
+    return nameservers
+
+
+def read_hosts_file(path="/etc/hosts"):
+    """读取 /etc/hosts 中的域名"""
+    hosts = set()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split("#", 1)[0].split()
+                hosts.update(name.lower() for name in parts[1:])
+    except OSError:
+        pass
+    return hosts
+
+
+def url_host(url):
+    """URL的域名（小写），无法解析时返回None"""
+    if not url.startswith(("http://", "https://")):
+        url = f"https://{url}"
+    try:
+        return (urlparse(url).hostname or "").lower() or None
+    except ValueError:
+        return None
+
+
+def _build_query(query_id, host):
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    labels = b"".join(
+        bytes([len(label)]) + label for label in host.encode("idna").split(b".") if label
+    )
+    return header + labels + b"\x00" + struct.pack("!HH", _TYPE_A, 1)
+
+
+def _skip_name(data, offset):
+    while True:
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        offset += length + 1
+
+
+def parse_response(data):
+    """
+    解析DNS应答，返回 (rcode, A记录地址列表, 最小TTL)
+    NXDOMAIN时TTL为SOA的否定缓存TTL（没有SOA时为None）
+    """
+    query_id, flags, qdcount, ancount, nscount, _ = struct.unpack("!HHHHHH", data[:12])
+    rcode = flags & 0x000F
+    offset = 12
+    for _ in range(qdcount):
+        offset = _skip_name(data, offset) + 4
+
+    addresses = []
+    ttl = None
+    for index in range(ancount + nscount):
+        offset = _skip_name(data, offset)
+        rtype, _, record_ttl, rdlength = struct.unpack("!HHIH", data[offset : offset + 10])
+        offset += 10
+        rdata_offset = offset
+        offset += rdlength
+        if index < ancount:
+            if rtype == _TYPE_A and rdlength == 4:
+                addresses.append(str(ipaddress.IPv4Address(data[rdata_offset:offset])))
+            if rtype in (_TYPE_A, _TYPE_CNAME):
+                ttl = record_ttl if ttl is None else min(ttl, record_ttl)
+        elif rtype == _TYPE_SOA and rcode == _RCODE_NXDOMAIN:
+            # SOA的minimum字段在mname和rname之后的第5个32位整数
+            soa_offset = _skip_name(data, _skip_name(data, rdata_offset))
+            minimum = struct.unpack("!I", data[soa_offset + 16 : soa_offset + 20])[0]
+            ttl = min(record_ttl, minimum)
+    return rcode, addresses, ttl
+
+
+def is_routable(addresses):
+    """地址中是否至少有一个可能连得上的地址（未指定、回环、链路本地地址都连不上）"""
+    for address in addresses:
+        ip = ipaddress.ip_address(address)
+        if not (ip.is_unspecified or ip.is_loopback or ip.is_link_local):
+            return True
+    return False
+
+
+class _DnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, query_id, future):
+        self.query_id = query_id
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if len(data) >= 12 and struct.unpack("!H", data[:2])[0] == self.query_id:
+            if not self.future.done():
+                self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+class DnsResolver:
+    """带TTL缓存的异步域名存活检查"""
+
+    def __init__(
+        self,
+        nameservers=None,
+        timeout=DEFAULT_DNS_TIMEOUT,
+        concurrency=DEFAULT_DNS_CONCURRENCY,
+    ):
+        self.nameservers = read_nameservers() if nameservers is None else nameservers
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.hosts_file = read_hosts_file()
+        self._cache = {}  # 域名 -> (结论, 过期时间)
+        self.stats = {
+            "queries": 0,
+            "cache_hits": 0,
+            HOST_ALIVE: 0,
+            HOST_DEAD: 0,
+            HOST_UNKNOWN: 0,
+        }
+
+    def _cached(self, host):
+        entry = self._cache.get(host)
+        if entry is None:
+            return None
+        status, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._cache[host]
+            return None
+        return status
+
+    def _store(self, host, status, ttl):
+        if status != HOST_UNKNOWN:
+            self._cache[host] = (status, time.monotonic() + ttl)
+            if len(self._cache) > DEFAULT_DNS_CACHE_SIZE:
+                del self._cache[next(iter(self._cache))]
+        self.stats[status] += 1
+        return status
+
+    async def _query(self, host, nameserver):
+        loop = asyncio.get_running_loop()
+        query_id = random.randint(0, 0xFFFF)
+        future = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DnsProtocol(query_id, future), remote_addr=(nameserver, 53)
+        )
+        try:
+            transport.sendto(_build_query(query_id, host))
+            data = await asyncio.wait_for(future, self.timeout)
+        finally:
+            transport.close()
+        return parse_response(data)
+
+    async def _system_resolve(self, host):
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            if e.errno == socket.EAI_NONAME:
+                return self._store(host, HOST_DEAD, DEFAULT_DNS_NEGATIVE_TTL)
+            return self._store(host, HOST_UNKNOWN, 0)
+        addresses = [info[4][0].split("%")[0] for info in infos]
+        status = HOST_ALIVE if is_routable(addresses) else HOST_DEAD
+        return self._store(host, status, DEFAULT_SYSTEM_RESOLVER_TTL)
+
+    async def resolve(self, host):
+        """返回域名的解析结论：HOST_ALIVE / HOST_DEAD / HOST_UNKNOWN"""
+        if not host:
+            return HOST_UNKNOWN
+        try:
+            ipaddress.ip_address(host.strip("[]"))
+            return HOST_ALIVE
+        except ValueError:
+            pass
+        if host in self.hosts_file:
+            return HOST_ALIVE
+        cached = self._cached(host)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+
+        self.stats["queries"] += 1
+        for attempt in range(DEFAULT_DNS_ATTEMPTS if self.nameservers else 0):
+            nameserver = self.nameservers[attempt % len(self.nameservers)]
+            try:
+                rcode, addresses, ttl = await self._query(host, nameserver)
+            except (asyncio.TimeoutError, OSError, UnicodeError, struct.error, IndexError):
+                continue
+            if rcode == _RCODE_NOERROR and addresses:
+                # 只解析到连不上的地址（停放域名常见）时同样判定为失效
+                ttl = min(DEFAULT_DNS_MAX_TTL, max(DEFAULT_DNS_MIN_TTL, ttl or 0))
+                status = HOST_ALIVE if is_routable(addresses) else HOST_DEAD
+                return self._store(host, status, ttl)
+            if rcode == _RCODE_NXDOMAIN:
+                ttl = DEFAULT_DNS_NEGATIVE_TTL if ttl is None else ttl
+                ttl = min(DEFAULT_DNS_MAX_NEGATIVE_TTL, max(DEFAULT_DNS_MIN_TTL, ttl))
+                return self._store(host, HOST_DEAD, ttl)
+            break  # SERVFAIL、只有AAAA记录等情况交给系统解析器
+        return await self._system_resolve(host)
+
+    async def resolve_all(self, hosts):
+        """并发解析多个域名，返回 {域名: 结论}"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def resolve_one(host):
+            async with semaphore:
+                return host, await self.resolve(host)
+
+        unique = list(dict.fromkeys(host for host in hosts if host))
+        return dict(await asyncio.gather(*[resolve_one(host) for host in unique]))
+
+    async def find_dead_urls(self, urls):
+        """返回域名不存在或不可路由的URL集合"""
+        statuses = await self.resolve_all(url_host(url) for url in urls)
+        return {url for url in urls if statuses.get(url_host(url)) == HOST_DEAD}
+
+
+_resolver = None
+
+
+def get_resolver():
+    """进程内共享的解析器（缓存跨批次复用）"""
+    global _resolver
+    if _resolver is None:
+        _resolver = DnsResolver()
+    return _resolver
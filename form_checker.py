@@ -3,10 +3,29 @@ import asyncio
 import time
 import hashlib
 import os
+import multiprocessing
+import threading
+import zlib
+from collections import deque
 from datetime import datetime, timedelta
-from playwright.async_api import async_playwright
-from concurrent.futures import ThreadPoolExecutor
+from memory_watchdog import MemoryWatchdog
+from metrics import get_journal, new_record, percentile, phase_timer
+from request_blocker import (
+    DEFAULT_REQUEST_BLOCKING,
+    count_request,
+    get_page_counters,
+    install_browser_blocking,
+    open_cdp_session,
+    track_page_requests,
+)
+from browser_profile import get_page_network, track_network_bytes
+from dns_resolver import get_resolver
+from app_logging import ProgressReporter, fields, setup_logging
+from metrics_exporter import registry
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlparse
 import logging
+import weakref
 
 # ===== 默认配置参数 =====
 
@@ -21,25 +40,278 @@ DEFAULT_NAVIGATION_TIMEOUT = 8000  # 页面导航超时（毫秒）
 DEFAULT_SECONDARY_PAGE_TIMEOUT = 6000  # 二级页面检查超时（毫秒）
 DEFAULT_MAX_SECONDARY_LINKS = 2  # 最多检查的二级链接数
 
+# 单URL时限配置
+DEFAULT_URL_DEADLINE = 20000  # 单个URL总检查时限（毫秒，含二级页面）
+DEFAULT_TAIL_URL_DEADLINE = 40000  # 尾部队列重试时的时限（毫秒）
+DEFAULT_TAIL_PERCENTILE = 95  # 超过该滚动分位数耗时的URL移入尾部队列
+DEFAULT_TAIL_MIN_SAMPLES = 20  # 计算滚动分位数所需的最少样本数
+DEFAULT_TAIL_MIN_DEADLINE = 8000  # 自适应时限下限（毫秒）
+DEFAULT_LATENCY_WINDOW = 500  # 滚动耗时窗口大小
+
+# DNS预解析配置
+DEFAULT_DNS_PREFLIGHT = True  # 检查前并发解析域名，域名不存在的URL直接判定为无法访问
+
+# 崩溃恢复配置
+DEFAULT_MAX_URL_RETRIES = 2  # 因浏览器/页面崩溃或挂起导致的单URL重试上限
+DEFAULT_HEARTBEAT_TIMEOUT = 3000  # 页面心跳检测超时（毫秒）
+DEFAULT_MAX_BATCH_RETRIES = 2  # 页面工作协程全部异常退出（如浏览器无法创建上下文）时的重启上限
+
+# 页面/上下文回收配置
+DEFAULT_PAGE_RECYCLE_NAVIGATIONS = 30  # 单个页面检查多少个URL后重建
+DEFAULT_CONTEXT_RECYCLE_NAVIGATIONS = 120  # 单个上下文检查多少个URL后重建
+DEFAULT_PARKED_WORKER_SLEEP = 1  # 降低并发时被暂停的页面的轮询间隔（秒）
+
+# 浏览器启动参数
+BROWSER_LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-gpu",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-features=TranslateUI",
+    "--disable-ipc-flooding-protection",
+    "--memory-pressure-off",
+    "--disable-web-security",  # 允许跨域，提高兼容性
+]
+
 # 并行处理配置
 DEFAULT_MAX_CONCURRENT = 3  # 默认并发上下文数
 DEFAULT_PAGES_PER_CONTEXT = 4  # 默认每上下文页面数
-
-# 简单的内存缓存
+DEFAULT_PROCESSES = 1  # 分片检查的进程数（1表示不分片，在当前进程中检查）
+DEFAULT_FEED_SIZE_FACTOR = 2  # URL队列容量 = 并行页面数 × 该系数
+DEFAULT_PREFLIGHT_CHUNK = 200  # 每次DNS预解析的URL数
+
+# 检查结论
+VERDICT_FORM = "form"  # 包含表单
+VERDICT_NO_FORM = "no_form"  # 不包含表单（或无法访问）
+VERDICT_TIMEOUT = "timeout"  # 超出单URL时限
+VERDICT_CRASHED = "crashed"  # 页面/浏览器崩溃（会重新入队，仅出现在指标日志中）
+
+# 错误类型（按Playwright/Chromium错误信息归类）
+ERROR_CLASS_DNS = "dns"
+ERROR_CLASS_TIMEOUT = "timeout"
+ERROR_CLASS_TLS = "tls"
+ERROR_CLASS_CONNECTION = "connection"
+ERROR_CLASS_CRASH = "crash"
+ERROR_CLASS_OTHER = "other"
+ERROR_CLASSES = {
+    ERROR_CLASS_DNS,
+    ERROR_CLASS_TIMEOUT,
+    ERROR_CLASS_TLS,
+    ERROR_CLASS_CONNECTION,
+    ERROR_CLASS_CRASH,
+    ERROR_CLASS_OTHER,
+}
+
+# 单URL明细记为DEBUG，INFO只输出限流的进度汇总（见app_logging）
+logger = logging.getLogger("form_checker")
+
+# 简单的内存缓存，每条记录保存检查结果类别（form/no_form 或错误类型）
+# 调度器并发运行多个工作表时各线程共用缓存，读写缓存和命中统计都持有_cache_lock
 _form_cache = {}
+_cache_lock = threading.Lock()
+# 后台重新验证中的缓存键：查询时视为未命中，原条目保留到新的form/no_form结论覆盖为止
+_revalidating = set()
 CACHE_EXPIRE_HOURS = DEFAULT_CACHE_EXPIRE_HOURS
 
+# 按结果类别的缓存策略：ttl_hours为首次缓存时长，同一类别连续失败时TTL翻倍，最多放大max_backoff倍
+CACHE_POLICIES = {
+    VERDICT_FORM: {"ttl_hours": CACHE_EXPIRE_HOURS, "max_backoff": 1},
+    VERDICT_NO_FORM: {"ttl_hours": CACHE_EXPIRE_HOURS, "max_backoff": 1},
+    ERROR_CLASS_DNS: {"ttl_hours": 24, "max_backoff": 7},  # 域名不存在：最长一周
+    ERROR_CLASS_TLS: {"ttl_hours": 12, "max_backoff": 8},
+    ERROR_CLASS_CONNECTION: {"ttl_hours": 2, "max_backoff": 12},
+    ERROR_CLASS_TIMEOUT: {"ttl_hours": 1, "max_backoff": 1},  # 超时多为偶发，1小时后重试
+    ERROR_CLASS_OTHER: {"ttl_hours": 6, "max_backoff": 4},
+}
+
+# 缓存命中统计（按结果类别）
+_cache_stats = {"hits": {}, "expired": {}, "misses": 0}
+
+
+class LatencyTracker:
+    """
+    记录最近的URL检查耗时，用于计算自适应的单URL时限
+    超时的检查也要记入：只记完成的检查时样本里只剩较快的检查，时限会逐批下降到下限
+    """
+
+    def __init__(self, window=DEFAULT_LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()  # 并发的工作表线程共用同一个实例
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def add_timeout(self, seconds, hard_deadline=DEFAULT_URL_DEADLINE):
+        """
+        记入一次超时的检查：实际耗时未知，至少按硬时限记入，
+        超时比例超过分位数的余量时时限回升，而不是只能下降
+        :param hard_deadline: 硬时限（毫秒）
+        """
+        self.add(max(seconds, hard_deadline / 1000))
+
+    def percentile(self, pct=DEFAULT_TAIL_PERCENTILE):
+        """样本不足时返回None"""
+        with self._lock:
+            samples = list(self.samples)
+        if len(samples) < DEFAULT_TAIL_MIN_SAMPLES:
+            return None
+        return percentile(samples, pct)
+
+    def deadline(self, hard_deadline=DEFAULT_URL_DEADLINE):
+        """
+        返回当前单URL时限（秒）：滚动p95，夹在下限与硬时限之间
+        :param hard_deadline: 硬时限（毫秒）
+        """
+        hard = hard_deadline / 1000
+        tail = self.percentile()
+        if tail is None:
+            return hard
+        return max(DEFAULT_TAIL_MIN_DEADLINE / 1000, min(hard, tail))
+
+
+_latency_tracker = LatencyTracker()
+
+# 发生过crash事件的页面
+_crashed_pages = weakref.WeakSet()
+
+# 每个页面累计接收的字节数（按响应头content-length估算）
+_page_bytes = weakref.WeakKeyDictionary()
+
+# 每个页面当前正在检查的URL
+_page_current_url = weakref.WeakKeyDictionary()
 
-async def check_forms_on_page(page, url, level=1):
-    """检查页面是否包含有效表单（包含input元素的表单）"""
+# 检查用上下文的参数（隐身上下文和持久化上下文共用）
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "viewport": {"width": 1280, "height": 720},
+    "bypass_csp": True,
+}
+
+# 屏蔽的非必要资源类型（路由拦截模式）
+BLOCKED_RESOURCE_TYPES = {"image", "stylesheet", "font", "media"}
+
+# 请求拦截方式：browser（浏览器内CDP拦截）或 route（Python路由逐请求判断）
+REQUEST_BLOCKING = DEFAULT_REQUEST_BLOCKING
+
+
+def classify_error(error):
+    """根据异常信息归类错误类型"""
+    message = str(error)
+    if isinstance(error, PageCrashedError) or "crash" in message.lower():
+        return ERROR_CLASS_CRASH
+    if "ERR_NAME_NOT_RESOLVED" in message or "ERR_NAME_RESOLUTION_FAILED" in message:
+        return ERROR_CLASS_DNS
+    if "Timeout" in message or "ERR_TIMED_OUT" in message:
+        return ERROR_CLASS_TIMEOUT
+    if "ERR_CERT" in message or "ERR_SSL" in message:
+        return ERROR_CLASS_TLS
+    if "ERR_CONNECTION" in message or "ERR_ADDRESS" in message:
+        return ERROR_CLASS_CONNECTION
+    return ERROR_CLASS_OTHER
+
+
+class PageCrashedError(Exception):
+    """页面、上下文或浏览器在检查过程中崩溃/关闭"""
+
+
+def is_page_broken(page):
+    """页面是否已崩溃、被关闭，或其所在浏览器已断开"""
+    if page.is_closed() or page in _crashed_pages:
+        return True
+    browser = page.context.browser
+    return browser is not None and not browser.is_connected()
+
+
+async def is_page_alive(page):
+    """心跳检测：页面能否在限定时间内执行一段简单脚本"""
+    if is_page_broken(page):
+        return False
     try:
-        # 优化：只等待domcontentloaded，不等待所有网络请求完成
-        await page.wait_for_load_state(
-            "domcontentloaded", timeout=DEFAULT_PAGE_LOAD_TIMEOUT
+        await asyncio.wait_for(
+            page.evaluate("1"), timeout=DEFAULT_HEARTBEAT_TIMEOUT / 1000
         )
+        return True
+    except Exception:
+        return False
+
+
+class BrowserSupervisor:
+    """
+    浏览器守护：浏览器断开（崩溃）后按需重新启动
+    指定持久化配置（browser_profile.BrowserProfile）时，每个上下文是一个独立的持久化上下文
+    指定网络归档（network_archive.CaptureArchive/ReplayArchive）时，上下文的请求交给归档录制/回放
+    """
+
+    def __init__(self, playwright, headless=True, profile=None, archive=None):
+        self.playwright = playwright
+        self.headless = headless
+        self.profile = profile
+        self.archive = archive
+        self.browser = None
+        self.restarts = 0
+        self._lock = asyncio.Lock()
+
+    async def get_browser(self):
+        """返回可用的浏览器，必要时（首次或崩溃后）启动新浏览器"""
+        async with self._lock:
+            if self.browser is not None and self.browser.is_connected():
+                return self.browser
+            if self.browser is not None:
+                self.restarts += 1
+                logger.warning("💥 浏览器已断开，正在重新启动（第 %d 次）...", self.restarts)
+            self.browser = await self.playwright.chromium.launch(
+                headless=self.headless, args=BROWSER_LAUNCH_ARGS
+            )
+            return self.browser
+
+    async def new_context(self):
+        """创建检查用的上下文：普通模式下是隐身上下文，持久化模式下占用一个配置槽位"""
+        if self.profile is None:
+            return await new_checker_context(await self.get_browser(), self.archive)
+        slot_dir = self.profile.acquire_slot()
+        try:
+            context = await self.playwright.chromium.launch_persistent_context(
+                slot_dir,
+                headless=self.headless,
+                args=BROWSER_LAUNCH_ARGS + self.profile.launch_args(),
+                **CONTEXT_OPTIONS,
+            )
+        except Exception:
+            self.profile.release_slot(slot_dir)
+            raise
+        context.on("close", lambda _: self.profile.release_slot(slot_dir))
+        # 只复用HTTP缓存，不复用登录状态
+        await context.clear_cookies()
+        for page in context.pages:
+            await page.close()
+        await _prepare_checker_context(context, self.archive)
+        return context
+
+    async def close(self):
+        if self.browser is not None and self.browser.is_connected():
+            await self.browser.close()
+
+
+async def check_forms_on_page(page, url, level=1, record=None):
+    """
+    检查页面是否包含有效表单（包含input元素的表单）
+    :param record: 指标记录，不为None时记录dom_wait/evaluate/iframe_scan阶段耗时
+    """
+    try:
+        # 优化：只等待domcontentloaded，不等待所有网络请求完成
+        with phase_timer(record, "dom_wait"):
+            await page.wait_for_load_state(
+                "domcontentloaded", timeout=DEFAULT_PAGE_LOAD_TIMEOUT
+            )
 
         # 优化：使用更高效的CSS选择器直接查找包含input的表单
-        valid_forms = await page.evaluate(
+        with phase_timer(record, "evaluate"):
+            valid_forms = await page.evaluate(
             """
             () => {
                 const forms = document.querySelectorAll('form');
@@ -52,28 +324,37 @@ async def check_forms_on_page(page, url, level=1):
                 return validCount;
             }
         """
-        )
+            )
 
         if valid_forms > 0:
-            print(
-                f"{'  ' * (level-1)}✓ {level}级页面 {url} 包含 {valid_forms} 个有效表单（含input）"
+            logger.debug(
+                "✓ %d级页面 %s 包含 %d 个有效表单（含input）",
+                level,
+                url,
+                valid_forms,
+                extra=fields(url=url, level=level, forms=valid_forms),
             )
             return True, valid_forms
 
         # 如果主页面没有有效表单，检查同源iframe
         if valid_forms == 0:
-            iframe_forms = await check_iframes_for_forms(page, url, level)
+            with phase_timer(record, "iframe_scan"):
+                iframe_forms = await check_iframes_for_forms(page, url, level)
             if iframe_forms > 0:
-                print(
-                    f"{'  ' * (level-1)}✓ {level}级页面 {url} 在iframe中找到 {iframe_forms} 个有效表单"
+                logger.debug(
+                    "✓ %d级页面 %s 在iframe中找到 %d 个有效表单",
+                    level,
+                    url,
+                    iframe_forms,
+                    extra=fields(url=url, level=level, forms=iframe_forms, iframe=True),
                 )
                 return True, iframe_forms
 
-        print(f"{'  ' * (level-1)}✗ {level}级页面 {url} 不包含有效表单")
+        logger.debug("✗ %d级页面 %s 不包含有效表单", level, url)
         return False, 0
 
     except Exception as e:
-        print(f"{'  ' * (level-1)}✗ {level}级页面 {url} 检查失败: {str(e)}")
+        logger.debug("✗ %d级页面 %s 检查失败: %s", level, url, e)
         return False, 0
 
 
@@ -91,7 +372,7 @@ async def check_iframes_for_forms(page, url, level=1):
         if not iframes:
             return 0
 
-        print(f"{'  ' * level}🔍 找到 {len(iframes)} 个iframe，检查同源iframe...")
+        logger.debug("🔍 %s 找到 %d 个iframe，检查同源iframe", url, len(iframes))
 
         total_iframe_forms = 0
 
@@ -128,15 +409,13 @@ async def check_iframes_for_forms(page, url, level=1):
                             is_same_origin = True
                             iframe_description = f"同源iframe: {iframe_src}"
                         else:
-                            print(
-                                f"{'  ' * (level+1)}⏭ iframe {i+1} 跨域，跳过: {iframe_domain}"
-                            )
+                            logger.debug("⏭ iframe %d 跨域，跳过: %s", i + 1, iframe_domain)
                             continue
 
                 if not is_same_origin:
                     continue
 
-                print(f"{'  ' * (level+1)}🔍 检查iframe {i+1}: {iframe_description}")
+                logger.debug("🔍 检查iframe %d: %s", i + 1, iframe_description)
 
                 # 获取iframe内容
                 iframe_content = await iframe.content_frame()
@@ -151,21 +430,21 @@ async def check_iframes_for_forms(page, url, level=1):
                             iframe_valid_forms += 1
 
                     if iframe_valid_forms > 0:
-                        print(
-                            f"{'  ' * (level+1)}✓ iframe {i+1} 包含 {iframe_valid_forms} 个有效表单"
+                        logger.debug(
+                            "✓ iframe %d 包含 %d 个有效表单", i + 1, iframe_valid_forms
                         )
                         total_iframe_forms += iframe_valid_forms
                     else:
-                        print(f"{'  ' * (level+1)}✗ iframe {i+1} 无有效表单")
+                        logger.debug("✗ iframe %d 无有效表单", i + 1)
 
             except Exception as e:
-                print(f"{'  ' * (level+1)}✗ iframe {i+1} 检查失败: {str(e)}")
+                logger.debug("✗ iframe %d 检查失败: %s", i + 1, e)
                 continue
 
         return total_iframe_forms
 
     except Exception as e:
-        print(f"{'  ' * level}✗ iframe检查失败: {str(e)}")
+        logger.debug("✗ %s iframe检查失败: %s", url, e)
         return 0
 
 
@@ -201,7 +480,7 @@ async def get_links_from_page(page, max_links=10):
         return prioritized_links[:max_links]
 
     except Exception as e:
-        print(f"获取链接失败: {str(e)}")
+        logger.debug("获取链接失败: %s", e)
         return []
 
 
@@ -217,197 +496,775 @@ def get_cache_key(url):
     return hashlib.md5(url.encode()).hexdigest()
 
 
-def is_cache_valid(timestamp):
+def is_cache_valid(timestamp, ttl_hours=None):
     """检查缓存是否仍然有效"""
     if not timestamp:
         return False
     cache_time = datetime.fromisoformat(timestamp)
-    return datetime.now() - cache_time < timedelta(hours=CACHE_EXPIRE_HOURS)
+    ttl_hours = CACHE_EXPIRE_HOURS if ttl_hours is None else ttl_hours
+    return datetime.now() - cache_time < timedelta(hours=ttl_hours)
 
 
-def get_cached_result(url):
-    """获取缓存的结果"""
-    cache_key = get_cache_key(url)
-    if cache_key in _form_cache:
-        cached_data = _form_cache[cache_key]
-        if is_cache_valid(cached_data.get("timestamp")):
-            print(f"🔄 使用缓存结果: {url}")
-            return cached_data.get("has_forms")
-    return None
+def get_cache_ttl_hours(outcome, failures=1):
+    """结果类别对应的缓存时长（小时），同类连续失败时按倍数延长"""
+    policy = CACHE_POLICIES.get(outcome, CACHE_POLICIES[ERROR_CLASS_OTHER])
+    backoff = min(policy["max_backoff"], 2 ** max(0, failures - 1))
+    return policy["ttl_hours"] * backoff
+
 
+def _outcome_of(cached_data):
+    if cached_data.get("outcome"):
+        return cached_data["outcome"]
+    return VERDICT_FORM if cached_data.get("has_forms") else VERDICT_NO_FORM
 
-def set_cached_result(url, has_forms):
-    """设置缓存结果"""
+
+def peek_cached_result(url):
+    """查询缓存但不计入命中统计，返回有效缓存的结果类别或None"""
     cache_key = get_cache_key(url)
-    _form_cache[cache_key] = {
-        "has_forms": has_forms,
-        "timestamp": datetime.now().isoformat(),
-    }
-    # 简单的缓存清理：如果缓存过多，清理旧的
-    if len(_form_cache) > DEFAULT_MAX_CACHE_SIZE:
-        # 清理一半的旧缓存
-        old_keys = list(_form_cache.keys())[:DEFAULT_CACHE_CLEANUP_SIZE]
-        for key in old_keys:
-            del _form_cache[key]
+    with _cache_lock:
+        if cache_key in _revalidating:
+            return None
+        cached_data = _form_cache.get(cache_key)
+    if cached_data and is_cache_valid(
+        cached_data.get("timestamp"), cached_data.get("ttl_hours")
+    ):
+        return _outcome_of(cached_data)
+    return None
 
 
-async def check_url_with_forms(page, url):
-    """检查URL及其二级页面是否包含表单（优化+缓存版本）"""
+def get_cached_result(url, record=None):
+    """
+    获取缓存的结果
+    :param record: 指标记录，命中时记录缓存的结果类别（cache_class）
+    """
+    cache_key = get_cache_key(url)
+    with _cache_lock:
+        if cache_key in _revalidating:
+            return None
+        cached_data = _form_cache.get(cache_key)
+        valid = False
+        if cached_data is not None:
+            outcome = _outcome_of(cached_data)
+            valid = is_cache_valid(cached_data.get("timestamp"), cached_data.get("ttl_hours"))
+            counter = _cache_stats["hits" if valid else "expired"]
+            counter[outcome] = counter.get(outcome, 0) + 1
+        if not valid:
+            _cache_stats["misses"] += 1
+            return None
+    if record is not None:
+        record["cache_class"] = outcome
+    logger.debug(
+        "🔄 使用缓存结果(%s): %s", outcome, url, extra=fields(url=url, cache_class=outcome)
+    )
+    return cached_data.get("has_forms")
+
+
+def get_cache_stats():
+    """缓存命中统计：{"hits": {类别: 次数}, "expired": {类别: 次数}, "misses": 次数}"""
+    with _cache_lock:
+        return {
+            "hits": dict(_cache_stats["hits"]),
+            "expired": dict(_cache_stats["expired"]),
+            "misses": _cache_stats["misses"],
+        }
+
+
+def _collect_cache_metrics():
+    """指标端点抓取时读取缓存命中统计"""
+    stats = get_cache_stats()
+    hits = sum(stats["hits"].values())
+    lookups = hits + stats["misses"]
+    samples = [
+        ("formchecker_cache_hits_total", {"class": outcome}, count)
+        for outcome, count in sorted(stats["hits"].items())
+    ]
+    samples.append(("formchecker_cache_misses_total", None, stats["misses"]))
+    if lookups:
+        samples.append(("formchecker_cache_hit_ratio", None, round(hits / lookups, 4)))
+    return samples
+
+
+registry.register_collector(_collect_cache_metrics)
+
+
+def set_cached_result(url, has_forms, outcome=None):
+    """
+    设置缓存结果
+    :param outcome: 结果类别（VERDICT_FORM/VERDICT_NO_FORM 或 ERROR_CLASS_*），
+        决定缓存时长；为None时按has_forms取form/no_form
+    """
+    cache_key = get_cache_key(url)
+    if outcome is None:
+        outcome = VERDICT_FORM if has_forms else VERDICT_NO_FORM
+    with _cache_lock:
+        if cache_key in _revalidating and outcome in ERROR_CLASSES and cache_key in _form_cache:
+            # 后台重新检查失败（超时、网络错误等）不覆盖原有结论
+            return
+        previous = _form_cache.pop(cache_key, None)
+        failures = 1
+        if previous and _outcome_of(previous) == outcome and outcome in ERROR_CLASSES:
+            failures = previous.get("failures", 1) + 1
+        _form_cache[cache_key] = {
+            "url": url,
+            "has_forms": has_forms,
+            "outcome": outcome,
+            "failures": failures,
+            "ttl_hours": get_cache_ttl_hours(outcome, failures),
+            "timestamp": datetime.now().isoformat(),
+        }
+        # 简单的缓存清理：如果缓存过多，清理旧的
+        if len(_form_cache) > DEFAULT_MAX_CACHE_SIZE:
+            # 清理一半的旧缓存
+            old_keys = list(_form_cache.keys())[:DEFAULT_CACHE_CLEANUP_SIZE]
+            for key in old_keys:
+                del _form_cache[key]
+
+
+def get_cache_expiry(cached_data):
+    """缓存条目的过期时间（datetime）"""
+    ttl_hours = cached_data.get("ttl_hours")
+    ttl_hours = CACHE_EXPIRE_HOURS if ttl_hours is None else ttl_hours
+    return datetime.fromisoformat(cached_data["timestamp"]) + timedelta(hours=ttl_hours)
+
+
+def list_cached_results():
+    """所有记录了URL的缓存条目：[(url, 结果类别, 过期时间)]（供后台重新验证使用）"""
+    with _cache_lock:
+        entries = list(_form_cache.values())
+    return [
+        (data["url"], _outcome_of(data), get_cache_expiry(data))
+        for data in entries
+        if data.get("url") and data.get("timestamp")
+    ]
+
+
+def begin_revalidation(urls):
+    """
+    开始后台重新验证：这些URL的缓存查询视为未命中使其被重新检查，原条目保留，
+    只有新的form/no_form结论才覆盖（见set_cached_result），返回缓存键供end_revalidation使用
+    """
+    keys = {get_cache_key(url) for url in urls}
+    with _cache_lock:
+        _revalidating.update(keys)
+    return keys
+
+
+def end_revalidation(keys):
+    """结束后台重新验证，恢复这些URL的缓存查询"""
+    with _cache_lock:
+        _revalidating.difference_update(keys)
+
+
+async def check_url_with_forms(page, url, record=None):
+    """
+    检查URL及其二级页面是否包含表单（优化+缓存版本）
+    :param record: 指标记录（metrics.new_record），不为None时记录各阶段耗时和错误类型
+    """
     normalized_url = normalize_url(url)
 
     # 检查缓存
-    cached_result = get_cached_result(normalized_url)
+    cached_result = get_cached_result(normalized_url, record)
     if cached_result is not None:
+        if record is not None:
+            record["cached"] = True
         return cached_result
 
-    print(f"🔍 检查: {normalized_url}")
+    logger.debug("🔍 检查: %s", normalized_url)
 
     result = False
+    error_class = None
     try:
         # 优化：使用更快的导航策略
-        await page.goto(
-            normalized_url,
-            timeout=DEFAULT_NAVIGATION_TIMEOUT,
-            wait_until="domcontentloaded",
-        )
+        with phase_timer(record, "navigation"):
+            await page.goto(
+                normalized_url,
+                timeout=DEFAULT_NAVIGATION_TIMEOUT,
+                wait_until="domcontentloaded",
+            )
 
         # 优化：使用更快的表单检测
-        has_form, form_count = await check_forms_on_page(page, normalized_url, 1)
+        has_form, form_count = await check_forms_on_page(
+            page, normalized_url, 1, record
+        )
 
         if has_form:
             result = True
         else:
             # 优化：只检查最相关的二级页面（contact相关链接）
-            try:
-                # 优化：同时获取链接和执行快速表单检测
-                contact_links = await page.evaluate(
-                    f"""
-                    () => {{
-                        const links = Array.from(document.querySelectorAll('a[href*="contact"], a[href*="form"], a[href*="inquiry"]'));
-                        return links.slice(0, {DEFAULT_MAX_SECONDARY_LINKS}).map(link => link.href).filter(href => {{
-                            try {{
-                                const url = new URL(href);
-                                return url.protocol === 'http:' || url.protocol === 'https:';
-                            }} catch {{
-                                return false;
-                            }}
-                        }});
-                    }}
-                """
-                )
+            with phase_timer(record, "secondary_links"):
+                result = await check_secondary_links(page)
 
-                if contact_links:
-                    print(f"📋 检查 {len(contact_links)} 个相关链接...")
-
-                    # 快速检查contact相关页面
-                    for link in contact_links:
-                        try:
-                            await page.goto(
-                                link,
-                                timeout=DEFAULT_SECONDARY_PAGE_TIMEOUT,
-                                wait_until="domcontentloaded",
-                            )
-                            has_form, _ = await check_forms_on_page(page, link, 2)
-
-                            if has_form:
-                                print(f"✅ 在相关页面找到表单！{link}")
-                                result = True
-                                break
-
-                        except Exception as e:
-                            print(f"❌ 相关页面检查失败: {str(e)}")
-                            continue
+    except Exception as e:
+        error_class = classify_error(e)
+        logger.debug(
+            "❌ 无法访问: %s",
+            e,
+            extra=fields(url=normalized_url, error_class=error_class),
+        )
+        if record is not None:
+            record["error_class"] = error_class
+        result = False
 
-            except Exception as e:
-                print(f"❌ 链接检查失败: {str(e)}")
+    # 页面崩溃导致的失败不能当作“无表单”缓存，交给调用方重试
+    if not result and is_page_broken(page):
+        raise PageCrashedError(f"页面已崩溃或关闭: {normalized_url}")
+
+    # 缓存结果（按结果类别决定缓存时长）
+    set_cached_result(normalized_url, result, error_class)
+    return result
+
+
+async def check_secondary_links(page):
+    """检查当前页面中contact/form/inquiry相关的二级页面是否包含表单"""
+    result = False
+    try:
+        # 优化：同时获取链接和执行快速表单检测
+        contact_links = await page.evaluate(
+            f"""
+            () => {{
+                const links = Array.from(document.querySelectorAll('a[href*="contact"], a[href*="form"], a[href*="inquiry"]'));
+                return links.slice(0, {DEFAULT_MAX_SECONDARY_LINKS}).map(link => link.href).filter(href => {{
+                    try {{
+                        const url = new URL(href);
+                        return url.protocol === 'http:' || url.protocol === 'https:';
+                    }} catch {{
+                        return false;
+                    }}
+                }});
+            }}
+        """
+        )
+
+        if contact_links:
+            logger.debug("📋 检查 %d 个相关链接", len(contact_links))
+
+            # 快速检查contact相关页面
+            for link in contact_links:
+                try:
+                    await page.goto(
+                        link,
+                        timeout=DEFAULT_SECONDARY_PAGE_TIMEOUT,
+                        wait_until="domcontentloaded",
+                    )
+                    has_form, _ = await check_forms_on_page(page, link, 2)
+
+                    if has_form:
+                        logger.debug("✅ 在相关页面找到表单: %s", link)
+                        result = True
+                        break
+
+                except Exception as e:
+                    logger.debug("❌ 相关页面检查失败: %s", e)
+                    continue
 
     except Exception as e:
-        print(f"❌ 无法访问: {str(e)}")
-        result = False
+        logger.debug("❌ 链接检查失败: %s", e)
 
-    # 缓存结果
-    set_cached_result(normalized_url, result)
     return result
 
 
-async def check_single_url_with_page(page, url, page_id):
-    """使用单个页面检查单个URL"""
+async def check_url_with_deadline(page, url, deadline=None, archive=None):
+    """
+    在时限内检查URL，返回检查结论
+    :param deadline: 时限（秒），为None时使用滚动p95自适应时限
+    :param archive: 网络录制/回放归档，为None时不录制
+    """
+    if deadline is None:
+        deadline = _latency_tracker.deadline()
+    record = new_record(normalize_url(url))
+    _page_current_url[page] = record["url"]
+    if archive is not None:
+        archive.start(record["url"])
+    bytes_before = _page_bytes.get(page, 0)
+    requests_before = get_page_counters(page)
+    network_before = get_page_network(page)
+    verdict = VERDICT_CRASHED
+    started = time.monotonic()
+    registry.inc("formchecker_pages_in_flight")
     try:
-        has_forms = await check_url_with_forms(page, url)
-        if has_forms:
-            print(f"✅ 页面{page_id}: {url} 包含表单")
-            return url
-        else:
-            print(f"❌ 页面{page_id}: {url} 无表单")
-            return None
+        has_forms = await asyncio.wait_for(
+            check_url_with_forms(page, url, record), deadline
+        )
+        verdict = VERDICT_FORM if has_forms else VERDICT_NO_FORM
+        if not record["cached"]:
+            _latency_tracker.add(time.monotonic() - started)
+    except asyncio.TimeoutError:
+        logger.debug(
+            "⏱ 超时(%.1fs)，移入尾部队列: %s", deadline, url, extra=fields(url=url, deadline=deadline)
+        )
+        verdict = VERDICT_TIMEOUT
+        record["error_class"] = ERROR_CLASS_TIMEOUT
+        _latency_tracker.add_timeout(time.monotonic() - started)
     except Exception as e:
-        print(f"❌ 页面{page_id}: {url} 检查失败: {str(e)}")
-        return None
+        if not is_page_broken(page):
+            verdict = VERDICT_NO_FORM
+        record["error_class"] = classify_error(e)
+        raise
+    finally:
+        registry.inc("formchecker_pages_in_flight", value=-1)
+        record["total"] = round(time.monotonic() - started, 4)
+        record["bytes"] = _page_bytes.get(page, 0) - bytes_before
+        requests_after = get_page_counters(page)
+        record["blocked_requests"] = requests_after["blocked"] - requests_before["blocked"]
+        record["allowed_requests"] = requests_after["allowed"] - requests_before["allowed"]
+        network_after = get_page_network(page)
+        record["network_bytes"] = network_after["network_bytes"] - network_before["network_bytes"]
+        record["cache_hits"] = network_after["cache_hits"] - network_before["cache_hits"]
+        record["final_url"] = None if page.is_closed() else page.url
+        record["verdict"] = verdict
+        get_journal().write(record)
+        if archive is not None:
+            # 缓存命中没有访问网络，不能覆盖已有的归档
+            if record["cached"] or verdict == VERDICT_CRASHED:
+                archive.discard(record["url"])
+            else:
+                archive.finish(record["url"], verdict)
+    return verdict
 
 
-async def check_url_batch_multi_page(
-    browser, urls_batch, batch_id, pages_per_context=4
-):
-    """批量检查URL（多页面并行处理）"""
-    context = await browser.new_context(
-        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-        viewport={"width": 1280, "height": 720},
-        bypass_csp=True,
-    )
+async def check_single_url_with_page(page, url, page_id, deadline=None, archive=None):
+    """使用单个页面检查单个URL，返回检查结论；页面崩溃时抛出PageCrashedError"""
+    try:
+        verdict = await check_url_with_deadline(page, url, deadline, archive)
+        logger.debug(
+            "页面%s: %s -> %s", page_id, url, verdict, extra=fields(url=url, verdict=verdict)
+        )
+        return verdict
+    except PageCrashedError:
+        raise
+    except Exception as e:
+        if is_page_broken(page):
+            raise PageCrashedError(str(e)) from e
+        logger.debug("❌ 页面%s: %s 检查失败: %s", page_id, url, e)
+        return VERDICT_NO_FORM
+
+
+async def new_checker_context(browser, archive=None):
+    """
+    创建检查用的浏览器上下文（屏蔽非必要资源）
+    默认在浏览器内拦截（见request_blocker），只有路由拦截模式或启用录制/回放时才安装Python路由
+    :param archive: 网络录制/回放归档，为None时不录制
+    """
+    context = await browser.new_context(**CONTEXT_OPTIONS)
+    await _prepare_checker_context(context, archive)
+    return context
+
+
+async def _prepare_checker_context(context, archive=None):
+    if REQUEST_BLOCKING == "route" or archive is not None:
+        await context.route("**/*", _route_handler(archive))
+
+
+def _route_handler(archive):
+    """绑定归档的路由回调（playwright按回调的参数个数传参，不能用带关键字参数的partial）"""
+    return lambda route: _route_request(route, archive)
+
+
+async def _route_request(route, archive=None):
+    """屏蔽非必要资源；启用录制/回放时交给归档处理"""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        try:
+            count_request(request.frame.page, "blocked")
+        except Exception:
+            pass
+        await route.abort()
+        return
+    if archive is None:
+        await route.continue_()
+        return
+    try:
+        checked_url = _page_current_url.get(request.frame.page)
+    except Exception:
+        checked_url = None  # Service Worker等没有所属页面的请求
+    await archive.handle(route, checked_url)
+
+
+async def new_checker_page(context, archive=None):
+    """创建检查用的页面，登记crash事件和请求计数，并开启浏览器内拦截"""
+    page = await context.new_page()
+    page.set_default_timeout(8000)
+    page.on("crash", _crashed_pages.add)
+    track_page_requests(page)
+    session = await open_cdp_session(page)
+    if REQUEST_BLOCKING == "browser" and not await install_browser_blocking(session):
+        await page.route("**/*", _route_handler(archive))
+    track_network_bytes(page, session)
+    _page_bytes[page] = 0
+    page.on("response", lambda response: _count_response_bytes(page, response))
+    return page
+
+
+def _count_response_bytes(page, response):
+    """累计页面接收的字节数"""
+    length = response.headers.get("content-length")
+    if length and length.isdigit():
+        _page_bytes[page] = _page_bytes.get(page, 0) + int(length)
+
+
+class ContextPool:
+    """
+    批次内的上下文/页面管理
+    - 页面崩溃时替换页面，浏览器断开时由supervisor重启并重建上下文
+    - 上下文检查满 DEFAULT_CONTEXT_RECYCLE_NAVIGATIONS 个URL或看门狗要求回收时，
+      新页面改用新上下文，旧上下文在其页面全部释放后关闭
+    """
+
+    def __init__(self, supervisor, watchdog, batch_id):
+        self.supervisor = supervisor
+        self.watchdog = watchdog
+        self.batch_id = batch_id
+        self.context = None
+        self.context_navigations = 0
+        self.context_generation = watchdog.generation
+        self.recycled_contexts = 0
+        self._open_pages = {}  # 上下文 -> 仍在使用的页面数
+        self._lock = asyncio.Lock()
+
+    async def _new_context(self):
+        self.context = await self.supervisor.new_context()
+        self._open_pages[self.context] = 0
+        self.context_navigations = 0
+        self.context_generation = self.watchdog.generation
+
+    async def _close_context(self, context):
+        self._open_pages.pop(context, None)
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    async def _release(self, page):
+        context = page.context
+        if not page.is_closed():
+            try:
+                await page.close()
+            except Exception:
+                pass
+        if context in self._open_pages:
+            self._open_pages[context] -= 1
+            if context is not self.context and self._open_pages[context] <= 0:
+                await self._close_context(context)
+
+    async def acquire_page(self, old_page=None):
+        """释放旧页面（如有）并返回一个新页面"""
+        async with self._lock:
+            if old_page is not None:
+                await self._release(old_page)
+
+            if self.context is None:
+                await self._new_context()
+            elif (
+                self.context_navigations >= DEFAULT_CONTEXT_RECYCLE_NAVIGATIONS
+                or self.context_generation != self.watchdog.generation
+            ):
+                logger.debug("♻️ 批次 %s: 回收上下文", self.batch_id)
+                self.recycled_contexts += 1
+                retired = self.context
+                await self._new_context()
+                if self._open_pages.get(retired, 0) <= 0:
+                    await self._close_context(retired)
 
-    # 禁用图片、CSS、字体等非必要资源
-    await context.route(
-        "**/*",
-        lambda route: (
-            route.abort()
-            if route.request.resource_type in ["image", "stylesheet", "font", "media"]
-            else route.continue_()
-        ),
-    )
+            try:
+                page = await new_checker_page(self.context, self.supervisor.archive)
+            except Exception:
+                logger.warning("♻️ 批次 %s: 上下文不可用，重建上下文", self.batch_id)
+                await self._close_context(self.context)
+                await self._new_context()
+                page = await new_checker_page(self.context, self.supervisor.archive)
+            self._open_pages[self.context] += 1
+            return page
+
+    async def release_page(self, page):
+        async with self._lock:
+            await self._release(page)
+
+    def record_navigation(self):
+        self.context_navigations += 1
+
+    async def close(self):
+        for context in list(self._open_pages):
+            await self._close_context(context)
+        self.context = None
+
+
+class UrlFeed:
+    """
+    有界URL队列（生产者/消费者）
+    - 生产者从输入迭代器惰性读取URL，队列满时等待消费，内存中的URL数不随输入规模增长
+    - 崩溃/挂起需要重试的URL放入重试队列，优先取出，不受容量限制
+    - 输入读完且所有URL都得出结论后，get() 返回None
+    - stop() 后不再接收和取出新URL，检查中的URL完成后 get() 返回None
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.produced = 0
+        self.requeued = 0
+        self.outstanding = 0  # 已入队但尚未得出结论的URL数（含检查中的）
+        self.dropped = []  # stop() 时丢弃的未检查URL
+        self._queue = deque()
+        self._retries = deque()
+        self._closed = False
+        self._stopped = False
+        self._condition = asyncio.Condition()
+
+    @property
+    def finished(self):
+        return self._closed and self.outstanding == 0
+
+    async def put(self, url):
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self._stopped or len(self._queue) < self.maxsize
+            )
+            if self._stopped:
+                self.dropped.append(url)
+                return
+            self._queue.append((url, 0))
+            self.produced += 1
+            self.outstanding += 1
+            self._condition.notify_all()
+
+    async def close(self):
+        """输入已读完"""
+        async with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    async def get(self):
+        """取出 (url, attempts)，全部完成时返回None"""
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self._retries or self._queue or self.finished
+            )
+            if self._retries:
+                item = self._retries.popleft()
+            elif self._queue:
+                item = self._queue.popleft()
+            else:
+                return None
+            self._condition.notify_all()
+            return item
+
+    async def stop(self):
+        """停止检查新URL（到达运行截止时间），队列中的URL记入dropped"""
+        async with self._condition:
+            dropped = [url for url, _ in self._retries] + [url for url, _ in self._queue]
+            self.dropped.extend(dropped)
+            self.outstanding -= len(dropped)
+            self._retries.clear()
+            self._queue.clear()
+            self._closed = True
+            self._stopped = True
+            self._condition.notify_all()
+
+    async def requeue(self, url, attempts):
+        async with self._condition:
+            self._retries.append((url, attempts))
+            self.requeued += 1
+            self._condition.notify_all()
+
+    async def task_done(self):
+        """一个URL得出结论（或被放弃）"""
+        async with self._condition:
+            self.outstanding -= 1
+            self._condition.notify_all()
+
+
+async def run_context_workers(
+    supervisor,
+    feed,
+    context_id,
+    pages_per_context=4,
+    deadline=None,
+    watchdog=None,
+    on_result=None,
+):
+    """
+    一个上下文的消费者：pages_per_context 个页面工作协程从共享队列中依次取URL检查
+    页面崩溃或挂起时替换页面，受影响的URL重新入队，每个URL最多重试 DEFAULT_MAX_URL_RETRIES 次；
+    页面检查满 DEFAULT_PAGE_RECYCLE_NAVIGATIONS 个URL或看门狗要求回收时重建页面
+    :param supervisor: BrowserSupervisor
+    :param feed: UrlFeed
+    :param deadline: 单URL时限（秒），为None时使用滚动p95自适应时限
+    :param watchdog: MemoryWatchdog，为None时不做内存回收和降并发
+    :param on_result: 每个URL得出最终结论时的回调 on_result(url, verdict)
+    """
+    watchdog = watchdog or MemoryWatchdog()
+    pool = ContextPool(supervisor, watchdog, context_id)
+    stats = {
+        "checked": 0,
+        "found": 0,
+        "timed_out": 0,
+        "requeued": 0,
+        "replaced_pages": 0,
+        "recycled_pages": 0,
+    }
 
-    # 创建多个页面
-    pages = []
-    for i in range(pages_per_context):
-        page = await context.new_page()
-        page.set_default_timeout(8000)
-        pages.append(page)
+    async def finish(url, verdict):
+        stats["checked"] += 1
+        if verdict == VERDICT_FORM:
+            stats["found"] += 1
+        elif verdict == VERDICT_TIMEOUT:
+            stats["timed_out"] += 1
+        if on_result:
+            on_result(url, verdict)
+        await feed.task_done()
+
+    async def requeue(url, attempts, reason):
+        if attempts < DEFAULT_MAX_URL_RETRIES:
+            stats["requeued"] += 1
+            logger.debug("🔁 %s，URL重新入队（第 %d 次重试）: %s", reason, attempts + 1, url)
+            await feed.requeue(url, attempts + 1)
+            return True
+        logger.warning("⚠️ %s，URL已达重试上限: %s", reason, url)
+        return False
 
-    print(
-        f"📦 批次 {batch_id}: 使用 {len(pages)} 个页面并行检查 {len(urls_batch)} 个URL"
-    )
+    async def page_worker(index, page_id):
+        page = None
+        navigations = 0
+        generation = watchdog.generation
+        item = None
+        try:
+            while True:
+                # 主机内存紧张时暂停部分页面，并释放其占用的页面
+                if not watchdog.is_slot_allowed(index, pages_per_context):
+                    if page is not None:
+                        await pool.release_page(page)
+                        page = None
+                    if feed.finished:
+                        break
+                    await asyncio.sleep(DEFAULT_PARKED_WORKER_SLEEP)
+                    continue
 
-    results = []
+                item = await feed.get()
+                if item is None:
+                    break
+                url, attempts = item
+
+                if page is None:
+                    page = await pool.acquire_page()
+                    navigations, generation = 0, watchdog.generation
+                elif (
+                    navigations >= DEFAULT_PAGE_RECYCLE_NAVIGATIONS
+                    or generation != watchdog.generation
+                ):
+                    stats["recycled_pages"] += 1
+                    page = await pool.acquire_page(page)
+                    navigations, generation = 0, watchdog.generation
+
+                navigations += 1
+                pool.record_navigation()
+                try:
+                    verdict = await check_single_url_with_page(
+                        page, url, page_id, deadline, supervisor.archive
+                    )
+                except PageCrashedError:
+                    item = None
+                    if not await requeue(url, attempts, f"页面{page_id} 崩溃"):
+                        await finish(url, VERDICT_CRASHED)
+                    stats["replaced_pages"] += 1
+                    page = await pool.acquire_page(page)
+                    navigations = 0
+                    continue
 
-    # 将URL分配给不同页面并行处理
-    tasks = []
-    for i, url in enumerate(urls_batch):
-        page_index = i % len(pages)
-        page = pages[page_index]
-        page_id = f"{batch_id}-P{page_index+1}"
+                if verdict == VERDICT_TIMEOUT and not await is_page_alive(page):
+                    # 页面挂起（如卡在evaluate），替换页面后重试
+                    item = None
+                    retried = await requeue(url, attempts, f"页面{page_id} 无响应")
+                    if not retried:
+                        await finish(url, verdict)
+                    stats["replaced_pages"] += 1
+                    page = await pool.acquire_page(page)
+                    navigations = 0
+                    continue
 
-        task = check_single_url_with_page(page, url, page_id)
-        tasks.append(task)
+                item = None
+                await finish(url, verdict)
+        finally:
+            # 工作协程异常退出时，手中的URL交还队列（或记为崩溃）
+            if item is not None:
+                url, attempts = item
+                if not await requeue(url, attempts, f"页面{page_id} 异常退出"):
+                    await finish(url, VERDICT_CRASHED)
+            if page is not None:
+                await pool.release_page(page)
+
+    # 工作协程全部异常退出（如浏览器无法创建上下文）时，启动新一轮工作协程
+    for round_index in range(DEFAULT_MAX_BATCH_RETRIES + 1):
+        tasks = [
+            page_worker(i, f"{context_id}-P{i+1}") for i in range(pages_per_context)
+        ]
+        task_results = await asyncio.gather(*tasks, return_exceptions=True)
+        errors = [result for result in task_results if isinstance(result, Exception)]
+        for error in errors:
+            logger.warning("⚠️ 上下文 %s: 任务执行异常: %s", context_id, error)
+        if not errors or feed.finished:
+            break
+        logger.warning("🔁 上下文 %s: 重新启动页面工作协程（第 %d 次）", context_id, round_index + 1)
+
+    await pool.close()
+    logger.info(
+        "📦 上下文 %s: 完成 %d 个URL，找到 %d 个有效结果，%d 个超时，重新入队 %d 次，"
+        "替换页面 %d 个，回收页面 %d 个、上下文 %d 个",
+        context_id,
+        stats["checked"],
+        stats["found"],
+        stats["timed_out"],
+        stats["requeued"],
+        stats["replaced_pages"],
+        stats["recycled_pages"],
+        pool.recycled_contexts,
+        extra=fields(context=context_id, recycled_contexts=pool.recycled_contexts, **stats),
+    )
+    return stats
 
-    # 并行执行所有任务
-    task_results = await asyncio.gather(*tasks, return_exceptions=True)
 
-    # 收集有效结果
-    for result in task_results:
-        if isinstance(result, str):  # 成功返回URL
-            results.append(result)
-        elif isinstance(result, Exception):
-            print(f"⚠️ 批次 {batch_id}: 任务执行异常: {result}")
+async def check_url_batch_multi_page(
+    supervisor,
+    urls_batch,
+    batch_id,
+    pages_per_context=4,
+    deadline=None,
+    tail_queue=None,
+    watchdog=None,
+    on_result=None,
+):
+    """
+    批量检查URL（单个上下文多页面并行处理），返回包含表单的URL列表
+    :param tail_queue: 超时URL的收集列表（尾部队列），为None时只记录不收集
+    """
+    results = []
 
-    await context.close()
-    print(f"📦 批次 {batch_id}: 完成，找到 {len(results)} 个有效结果")
+    def collect(url, verdict):
+        if verdict == VERDICT_FORM:
+            results.append(url)
+        elif verdict == VERDICT_TIMEOUT and tail_queue is not None:
+            tail_queue.append(url)
+        if on_result:
+            on_result(url, verdict)
+
+    feed = UrlFeed(maxsize=max(1, len(urls_batch)))
+    for url in urls_batch:
+        await feed.put(url)
+    await feed.close()
+    logger.info(
+        "📦 批次 %s: 使用 %d 个页面并行检查 %d 个URL", batch_id, pages_per_context, len(urls_batch)
+    )
+    await run_context_workers(
+        supervisor, feed, batch_id, pages_per_context, deadline, watchdog, collect
+    )
+    if feed.outstanding:
+        logger.warning("❌ 批次 %s: %d 个URL未完成检查", batch_id, feed.outstanding)
     return results
 
 
 # 保留原来的单页面版本作为备选
-async def check_url_batch(browser, urls_batch, batch_id):
+async def check_url_batch(supervisor, urls_batch, batch_id):
     """批量检查URL（单页面处理，备选方案）"""
     return await check_url_batch_multi_page(
-        browser, urls_batch, batch_id, pages_per_context=1
+        supervisor, urls_batch, batch_id, pages_per_context=1
     )
 
 
@@ -415,74 +1272,403 @@ async def load_url(
     urls,
     max_concurrent=DEFAULT_MAX_CONCURRENT,
     pages_per_context=DEFAULT_PAGES_PER_CONTEXT,
+    deadline=None,
+    tail_queue=None,
+    archive=None,
+    profile=None,
+    on_result=None,
+    stop_at=None,
+):
+    """
+    主函数：多页面并行检查所有URL是否包含表单，返回包含表单的URL列表
+    （指定on_result时结论只通过回调交付，返回空列表，内存占用与输入规模无关）
+    :param urls: URL的可迭代对象（列表、生成器或异步迭代器），按需惰性读取
+    :param deadline: 单URL时限（秒），为None时使用滚动p95自适应时限
+    :param tail_queue: 超时URL的收集列表，由调用方决定是否重试
+    :param archive: 网络录制/回放归档（network_archive.CaptureArchive/ReplayArchive）
+    :param profile: 持久化浏览器配置（browser_profile.BrowserProfile），为None时使用隐身上下文
+    :param on_result: 每个URL得出最终结论时的回调 on_result(url, verdict)，
+        崩溃重试耗尽的URL结论为VERDICT_CRASHED，所有工作协程都无法运行时未检查的URL不回调
+    :param stop_at: 运行截止时间（time.time()时间戳），到达后不再开始检查新URL，
+        检查中的URL完成后返回，未检查的URL不回调
+    """
+    return await _load_url(
+        urls,
+        max_concurrent,
+        pages_per_context,
+        deadline,
+        tail_queue,
+        archive,
+        profile,
+        on_result,
+        stop_at,
+    )
+
+
+async def iter_check_urls(
+    urls,
+    max_concurrent=DEFAULT_MAX_CONCURRENT,
+    pages_per_context=DEFAULT_PAGES_PER_CONTEXT,
+    deadline=None,
+    archive=None,
+    profile=None,
 ):
-    """主函数：多页面并行检查所有URL是否包含表单"""
+    """
+    异步迭代器版本的load_url：按完成顺序逐个产出 (url, verdict)
+
+        async for url, verdict in iter_check_urls(url_iterator):
+            ...
+    """
+    results = asyncio.Queue()
+    finished = object()
+
+    async def run():
+        try:
+            await load_url(
+                urls,
+                max_concurrent,
+                pages_per_context,
+                deadline,
+                archive=archive,
+                profile=profile,
+                on_result=lambda url, verdict: results.put_nowait((url, verdict)),
+            )
+        finally:
+            results.put_nowait(finished)
+
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            item = await results.get()
+            if item is finished:
+                break
+            yield item
+        await task
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def _iterate(urls):
+    if hasattr(urls, "__aiter__"):
+        async for url in urls:
+            yield url
+    else:
+        for url in urls:
+            yield url
+
+
+async def _stop_at_deadline(feed, stop_at):
+    """到达运行截止时间后停止队列"""
+    await asyncio.sleep(max(0.0, stop_at - time.time()))
+    await feed.stop()
+
+
+async def _produce_urls(feed, urls, on_result, archive=None):
+    """生产者：按块读取输入，DNS预解析后放入有界队列"""
+    chunk = []
+
+    async def flush():
+        pending = chunk
+        # 回放时页面全部来自归档，不能用当前的DNS结果改变录制时的结论
+        replaying = getattr(archive, "mode", None) == "replay"
+        if DEFAULT_DNS_PREFLIGHT and not replaying:
+            pending = await short_circuit_dead_hosts(pending, on_result)
+        for url in pending:
+            await feed.put(url)
+        chunk.clear()
+
+    try:
+        async for url in _iterate(urls):
+            chunk.append(url)
+            if len(chunk) >= DEFAULT_PREFLIGHT_CHUNK:
+                await flush()
+        if chunk:
+            await flush()
+    finally:
+        await feed.close()
+
+
+async def short_circuit_dead_hosts(urls, on_result=None):
+    """
+    DNS预解析：并发解析所有URL的域名，域名不存在或不可路由的URL不再导航，
+    直接记为无法访问（无表单）并写入指标日志，返回剩余需要检查的URL
+    :param on_result: 跳过的URL的结论回调 on_result(url, verdict)
+    """
+    resolver = get_resolver()
+    started = time.monotonic()
+    pending = [url for url in urls if peek_cached_result(normalize_url(url)) is None]
+    dead_urls = await resolver.find_dead_urls(pending)
+    if not dead_urls:
+        return urls
+
+    journal = get_journal()
+    for url in dead_urls:
+        record = new_record(normalize_url(url))
+        record["verdict"] = VERDICT_NO_FORM
+        record["error_class"] = ERROR_CLASS_DNS
+        journal.write(record)
+        set_cached_result(record["url"], False, ERROR_CLASS_DNS)
+        if on_result:
+            on_result(url, VERDICT_NO_FORM)
+    logger.info(
+        "🪦 DNS预解析: %d 个URL域名不存在或不可路由，跳过导航（%.1fs，DNS缓存命中 %d）",
+        len(dead_urls),
+        time.monotonic() - started,
+        resolver.stats["cache_hits"],
+    )
+    return [url for url in urls if url not in dead_urls]
+
+
+async def _load_url(
+    urls,
+    max_concurrent,
+    pages_per_context,
+    deadline,
+    tail_queue,
+    archive=None,
+    profile=None,
+    on_result=None,
+    stop_at=None,
+):
+    found = []
+    progress = ProgressReporter(logger, "🚦 检查")
+
+    def collect(url, verdict):
+        progress.update(verdict)
+        if verdict == VERDICT_FORM and on_result is None:
+            found.append(url)
+        elif verdict == VERDICT_TIMEOUT and tail_queue is not None:
+            tail_queue.append(url)
+        if on_result:
+            on_result(url, verdict)
+
+    # playwright在第一次检查时才导入，只用到缓存/DNS的命令不付出导入开销
+    from playwright.async_api import async_playwright
+
     async with async_playwright() as p:
-        # 优化浏览器启动参数
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--disable-dev-shm-usage",
-                "--no-sandbox",
-                "--disable-setuid-sandbox",
-                "--disable-gpu",
-                "--disable-background-timer-throttling",
-                "--disable-backgrounding-occluded-windows",
-                "--disable-renderer-backgrounding",
-                "--disable-features=TranslateUI",
-                "--disable-ipc-flooding-protection",
-                "--memory-pressure-off",
-                "--disable-web-security",  # 允许跨域，提高兼容性
-            ],
-        )
+        # 浏览器在第一个需要导航的URL到来时才启动
+        supervisor = BrowserSupervisor(p, headless=True, profile=profile, archive=archive)
+        watchdog = MemoryWatchdog()
+        watchdog_task = asyncio.create_task(watchdog.run())
 
-        total_urls = len(urls)
         total_pages = max_concurrent * pages_per_context
-        print(f"🚀 开始多页面并行检查 {total_urls} 个URL")
-        print(
-            f"📊 配置: {max_concurrent} 个上下文 × {pages_per_context} 个页面 = {total_pages} 个并行页面"
+        feed = UrlFeed(maxsize=total_pages * DEFAULT_FEED_SIZE_FACTOR)
+        logger.info(
+            "🚀 开始多页面并行检查: %d 个上下文 × %d 个页面 = %d 个并行页面，队列上限 %d 个URL",
+            max_concurrent,
+            pages_per_context,
+            total_pages,
+            feed.maxsize,
         )
 
-        # 将URL分批处理，考虑每个上下文内的页面数
-        batch_size = max(1, total_urls // max_concurrent)
-        url_batches = [
-            urls[i : i + batch_size] for i in range(0, total_urls, batch_size)
+        producer = asyncio.create_task(_produce_urls(feed, urls, collect, archive))
+        stopper = asyncio.create_task(_stop_at_deadline(feed, stop_at)) if stop_at else None
+        consumers = [
+            run_context_workers(
+                supervisor,
+                feed,
+                context_id,
+                pages_per_context,
+                deadline,
+                watchdog,
+                collect,
+            )
+            for context_id in range(1, max_concurrent + 1)
         ]
+        results = await asyncio.gather(*consumers, return_exceptions=True)
+        for context_id, result in enumerate(results, 1):
+            if isinstance(result, Exception):
+                logger.error("⚠️ 上下文 %s 执行出错: %s", context_id, result)
+
+        if stopper is not None:
+            stopper.cancel()
+        # 消费者全部退出后生产者可能仍阻塞在满队列上
+        if not producer.done():
+            producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error("⚠️ 读取URL输入出错: %s", e)
+        if feed.outstanding:
+            logger.warning("❌ %d 个URL未完成检查", feed.outstanding)
+        if feed.dropped:
+            logger.warning("⏰ 已到运行截止时间，%d 个URL未检查", len(feed.dropped))
+
+        watchdog_task.cancel()
+        await supervisor.close()
+
+        progress.emit(final=True)
+        logger.info("🎯 多页面并行检查完成！浏览器共检查 %d 个URL", feed.produced)
+        if on_result is None:
+            logger.info("🎯 总计找到 %d 个有效结果", len(found))
+        if supervisor.restarts:
+            logger.warning("💥 浏览器重启次数: %d", supervisor.restarts)
+        cache_stats = get_cache_stats()
+        if cache_stats["hits"]:
+            hits = ", ".join(f"{k} {v}" for k, v in sorted(cache_stats["hits"].items()))
+            logger.info("🔄 缓存命中: %s（未命中 %d）", hits, cache_stats["misses"])
+        if watchdog.peak_rss_mb:
+            logger.info(
+                "🧠 浏览器峰值RSS: %.0fMB，强制回收 %d 次",
+                watchdog.peak_rss_mb,
+                watchdog.forced_recycles,
+            )
+        return found
 
-        print(f"📦 分为 {len(url_batches)} 个批次，每批约 {batch_size} 个URL")
 
-        # 并行执行所有批次，每个批次内部使用多页面并行
-        tasks = []
-        for batch_id, batch in enumerate(url_batches, 1):
-            task = check_url_batch_multi_page(
-                browser, batch, batch_id, pages_per_context
-            )
-            tasks.append(task)
+async def load_url_single_page(urls, max_concurrent=DEFAULT_MAX_CONCURRENT):
+    """单页面版本（兼容性备选方案）"""
+    return await load_url(urls, max_concurrent, pages_per_context=1)
 
-        # 等待所有批次完成
-        batch_results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        # 合并结果
-        all_results = []
-        for batch_result in batch_results:
-            if isinstance(batch_result, list):
-                all_results.extend(batch_result)
-            else:
-                print(f"⚠️ 批次执行出错: {batch_result}")
+def shard_urls(urls, processes):
+    """按域名哈希把URL分到各进程，同一域名总在同一分片，返回 [(原序号, url), ...] 列表"""
+    shards = [[] for _ in range(processes)]
+    for index, url in enumerate(urls):
+        host = urlparse(normalize_url(url)).netloc
+        shards[zlib.crc32(host.encode("utf-8")) % processes].append((index, url))
+    return shards
+
+
+def _run_shard(
+    shard,
+    max_concurrent,
+    pages_per_context,
+    deadline,
+    archive,
+    request_blocking,
+    profile=None,
+    stop_at=None,
+    log_level="INFO",
+):
+    """分片子进程入口：独立的事件循环、Playwright和浏览器"""
+    global REQUEST_BLOCKING
+    REQUEST_BLOCKING = request_blocking  # spawn子进程不继承运行时修改的模块变量
+    setup_logging(log_level)  # spawn子进程没有父进程的日志配置，输出到终端
+    urls = [url for _, url in shard]
+    tail_queue = []
+    found = asyncio.run(
+        load_url(
+            urls,
+            max_concurrent,
+            pages_per_context,
+            deadline=deadline,
+            tail_queue=tail_queue,
+            archive=archive,
+            profile=profile,
+            stop_at=stop_at,
+        )
+    )
+    journal = get_journal()
+    journal.flush()
+    return found, tail_queue, list(journal.run_records)
 
-        await browser.close()
 
-        print(f"🎯 多页面并行检查完成！总计找到 {len(all_results)} 个有效结果")
-        print(f"📈 实际并行度: {total_pages} 个页面同时工作")
-        return all_results
+async def load_url_sharded(
+    urls,
+    processes=DEFAULT_PROCESSES,
+    max_concurrent=DEFAULT_MAX_CONCURRENT,
+    pages_per_context=DEFAULT_PAGES_PER_CONTEXT,
+    deadline=None,
+    tail_queue=None,
+    archive=None,
+    profile=None,
+    stop_at=None,
+    layouts=None,
+):
+    """
+    多进程分片检查：按域名哈希把URL分给processes个子进程，每个子进程按
+    max_concurrent × pages_per_context 并行检查，结果按输入顺序合并
+    子进程异常退出时，其分片在当前进程中重新检查
+    :param layouts: 每个进程各自的 [(上下文数, 每上下文页面数), ...]（规划器分配），
+        设置时进程数为其长度，忽略 processes / max_concurrent / pages_per_context
+    """
+    if layouts:
+        processes = len(layouts)
+    else:
+        layouts = [(max_concurrent, pages_per_context)] * max(1, processes)
+    if processes <= 1:
+        max_concurrent, pages_per_context = layouts[0]
+        return await load_url(
+            urls,
+            max_concurrent,
+            pages_per_context,
+            deadline,
+            tail_queue,
+            archive,
+            profile,
+            stop_at=stop_at,
+        )
 
+    shards = [
+        (shard, layout) for shard, layout in zip(shard_urls(urls, processes), layouts) if shard
+    ]
+    logger.info(
+        "🧩 分片检查: %d 个URL 分到 %d 个进程 (%s)",
+        len(urls),
+        len(shards),
+        ", ".join(str(len(shard)) for shard, _ in shards),
+    )
 
-async def load_url_single_page(urls, max_concurrent=DEFAULT_MAX_CONCURRENT):
-    """单页面版本（兼容性备选方案）"""
-    return await load_url(urls, max_concurrent, pages_per_context=1)
+    loop = asyncio.get_running_loop()
+    # 使用spawn启动子进程，避免fork继承事件循环和Playwright连接
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=mp_context) as pool:
+        outcomes = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    pool,
+                    _run_shard,
+                    shard,
+                    *layout,
+                    deadline,
+                    archive,
+                    REQUEST_BLOCKING,
+                    profile,
+                    stop_at,
+                    logging.getLevelName(logging.getLogger().getEffectiveLevel()),
+                )
+                for shard, layout in shards
+            ],
+            return_exceptions=True,
+        )
 
+    found, timed_out = set(), set()
+    journal = get_journal()
+    for (shard, layout), outcome in zip(shards, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.error("⚠️ 分片进程出错，在当前进程中重新检查 %d 个URL: %s", len(shard), outcome)
+            shard_tail = []
+            shard_found = await load_url(
+                [url for _, url in shard],
+                *layout,
+                deadline,
+                shard_tail,
+                archive,
+                profile,
+                stop_at=stop_at,
+            )
+            found.update(shard_found)
+            timed_out.update(shard_tail)
+            continue
+        shard_found, shard_tail, records = outcome
+        found.update(shard_found)
+        timed_out.update(shard_tail)
+        # 子进程已写入指标日志文件，这里只合并到本次运行的内存汇总
+        journal.run_records.extend(records)
+
+    if tail_queue is not None:
+        tail_queue.extend(url for url in urls if url in timed_out)
+    results = [url for url in urls if url in found]
+    logger.info("🧩 分片检查完成！总计找到 %d 个有效结果", len(results))
+    return results
 
-# 运行检查
+
+# 运行检查：批量检查命令见 bulk_check.py
 if __name__ == "__main__":
-    asyncio.run(load_url())
+    import bulk_check
+
+    bulk_check.main()
@@ -1,21 +1,53 @@
 import datetime
 import json
-import requests
+import logging
+import sqlite3
+import time
 import asyncio
 from google_sheets import write_google_sheets
-from form_checker import load_url
+from form_checker import load_url, load_url_sharded, normalize_url, DEFAULT_TAIL_URL_DEADLINE
+from network_archive import CaptureArchive
+from browser_profile import DEFAULT_DISK_CACHE_MB, BrowserProfile
+from coordinator import check_urls_distributed, get_coordinator_server
 from config import URL_GROUPS, API_URL
+from metrics import get_journal, format_report_lines
 from robot import Robot
+from app_logging import fields
+from metrics_exporter import registry
+from verdict_store import get_store
+from run_planner import layout_pages
 
 robot = Robot()
+logger = logging.getLogger("get_url")
 
 # 全局统计收集器
 WORKSHEET_STATS = {}
 
+# 未由调度器分别运行时，从当前工作表起按此顺序依次执行
+WORKSHEET_SEQUENCE = ["00", "p0", "p1"]
 
-def send_summary_report():
-    """发送工作表汇总报告"""
-    if not WORKSHEET_STATS:
+
+def chained_worksheets(worksheet_name):
+    """从指定工作表起依次执行的工作表（不在序列中时只有它自己）"""
+    if worksheet_name in WORKSHEET_SEQUENCE:
+        return WORKSHEET_SEQUENCE[WORKSHEET_SEQUENCE.index(worksheet_name) :]
+    return [worksheet_name]
+
+
+def send_summary_report(worksheets=None, planner=None):
+    """
+    发送工作表汇总报告
+    :param worksheets: 只汇总并清除这些工作表的统计（调度器按工作表分别运行时使用），默认全部
+    :param planner: 限时运行的规划器（run_planner.RunPlanner），报告中列出截止时的完成情况
+    """
+    if worksheets is not None:
+        stats_to_report = {
+            ws: WORKSHEET_STATS.pop(ws) for ws in worksheets if ws in WORKSHEET_STATS
+        }
+    else:
+        stats_to_report = dict(WORKSHEET_STATS)
+        WORKSHEET_STATS.clear()
+    if not stats_to_report:
         robot.send_text("📊 任务执行完成，但没有统计数据")
         return
 
@@ -32,9 +64,10 @@ def send_summary_report():
 
     # 按照执行顺序显示统计
     sequence = ["p0", "00", "p1"]
+    sequence += [ws for ws in stats_to_report if ws not in sequence]
     for ws_name in sequence:
-        if ws_name in WORKSHEET_STATS:
-            stats = WORKSHEET_STATS[ws_name]
+        if ws_name in stats_to_report:
+            stats = stats_to_report[ws_name]
             total_target += stats["target_results"]
             total_actual += stats["actual_results"]
 
@@ -46,6 +79,8 @@ def send_summary_report():
                 f"   完成度: {stats['completion_rate']}% | {stats['status']}"
             )
             report_lines.append(f"   批次数: {stats['total_batches']}")
+            if stats.get("timed_out"):
+                report_lines.append(f"   超时URL: {stats['timed_out']}")
             report_lines.append("")
 
     # 总体统计
@@ -57,6 +92,19 @@ def send_summary_report():
             f"📈 总体统计:",
             f"   总目标: {total_target} | 总实际: {total_actual}",
             f"   总完成度: {overall_rate}%",
+        ]
+    )
+
+    if planner is not None:
+        report_lines.extend(planner.report_lines())
+
+    # 耗时与吞吐统计
+    latency_lines = format_report_lines(get_journal().run_summary())
+    if latency_lines:
+        report_lines.extend(latency_lines)
+
+    report_lines.extend(
+        [
             f"━━━━━━━━━━━━━━━━━━━━━━━━",
             f"✅ 所有工作表处理完成，请查看 https://docs.google.com/spreadsheets/d/1-WdCcC3JA2cyk6Q1gem7a2gkyDJ5RJM_esFJr724OPI/edit?gid=2015433169#gid=2015433169",
         ]
@@ -66,8 +114,9 @@ def send_summary_report():
     report_text = "\n".join(report_lines)
     robot.send_text(report_text)
 
-    # 清空统计数据，为下次运行做准备
-    WORKSHEET_STATS.clear()
+    # 其他工作表都已汇报时清空耗时记录，为下次运行做准备
+    if not WORKSHEET_STATS:
+        get_journal().reset()
 
 
 def parse_data(urls_data):
@@ -76,7 +125,7 @@ def parse_data(urls_data):
     :param urls_data: URL列表，可以是字符串列表或字典列表
     :return: 格式化的行数据，匹配Google Sheets表头 ["href", "param", "日期", "负责人", "状态"]
     """
-    print(f"解析数据: {urls_data}")
+    logger.debug("解析数据: %d 行", len(urls_data), extra=fields(rows=len(urls_data)))
     rows = []
     today = datetime.datetime.now().strftime("%Y-%m-%d")
 
@@ -94,7 +143,7 @@ def parse_data(urls_data):
             rows.append([href, param_first, today, "", ""])
         else:
             # 未知格式，跳过
-            print(f"⚠️ 跳过未知格式的数据: {item}")
+            logger.warning("⚠️ 跳过未知格式的数据: %r", item)
             continue
 
     return rows
@@ -119,12 +168,20 @@ def write_batch_to_sheets_with_retry(batch_results, batch_id, config, max_retrie
     while retry_count < max_retries:
         try:
             sheets_config = config.get_sheets_config()
-            write_google_sheets(
-                parse_data(batch_results),
-                sheets_config["credentials_path"],
-                sheets_config["sheet_name"],
-                sheets_config["worksheet_name"],
-            )
+            write_started = time.monotonic()
+            try:
+                write_google_sheets(
+                    parse_data(batch_results),
+                    sheets_config["credentials_path"],
+                    sheets_config["sheet_name"],
+                    sheets_config["worksheet_name"],
+                )
+            finally:
+                registry.observe(
+                    "formchecker_sheets_write_seconds",
+                    time.monotonic() - write_started,
+                    {"worksheet": sheets_config["worksheet_name"]},
+                )
             print(f"✅ 第 {batch_id} 批次结果已成功写入Google Sheets")
             return True
 
@@ -134,8 +191,6 @@ def write_batch_to_sheets_with_retry(batch_results, batch_id, config, max_retrie
                 print(
                     f"⚠️  第 {batch_id} 批次写入失败，第 {retry_count} 次重试: {str(e)}"
                 )
-                import time
-
                 time.sleep(2**retry_count)  # 指数退避：2秒、4秒、8秒
             else:
                 print(
@@ -170,7 +225,13 @@ def fetch_urls_batch(api_url, batch_size=100, skip=0, config=None):
         "urls": config.req_urls,
     }
 
-    response = requests.post(api_url, json=data)
+    import requests
+
+    api_started = time.monotonic()
+    try:
+        response = requests.post(api_url, json=data)
+    finally:
+        registry.observe("formchecker_api_request_seconds", time.monotonic() - api_started)
     try:
         res_data = response.json()
     except ValueError:
@@ -210,6 +271,17 @@ def fetch_urls_batch(api_url, batch_size=100, skip=0, config=None):
     return res
 
 
+def annotate_verdicts(worksheet, url_to_data, since):
+    """为本批次检查写入结论库的记录补充工作表和param"""
+    if not get_journal().enabled:
+        return
+    params = {normalize_url(href): item.get("param", "") for href, item in url_to_data.items()}
+    try:
+        get_store().annotate(worksheet, params, since)
+    except sqlite3.Error as e:
+        logger.warning("补充结论库的工作表和param失败: %s", e)
+
+
 def get_url(api_url, config=None):
     """
     获取URL并处理表单检查，支持循环获取直到满足最小结果数量
@@ -224,16 +296,49 @@ def get_url(api_url, config=None):
     batch_size = config.batch_size if config else 100
     max_batches = config.max_batches if config else 10
     max_urls = config.max_urls if config else None
+    capture_dir = getattr(config, "capture_dir", None)
+    processes = max(1, getattr(config, "processes", 1) or 1)
+    coordinator_port = getattr(config, "coordinator_port", None)
+    coordinator_server = (
+        get_coordinator_server(coordinator_port, getattr(config, "coordinator_host", None))
+        if coordinator_port
+        else None
+    )
+    archive = CaptureArchive(capture_dir) if capture_dir else None
+    profile_dir = getattr(config, "browser_profile", None)
+    profile = (
+        BrowserProfile(
+            profile_dir, getattr(config, "disk_cache_mb", None) or DEFAULT_DISK_CACHE_MB
+        )
+        if profile_dir
+        else None
+    )
+
+    # 限时运行：同一次运行的各工作表共享一个规划器（由入口按 --deadline/--time-budget 创建）
+    planner = getattr(config, "planner", None)
+    if planner is not None:
+        planner.register(config.worksheet_name, min_results)
+    stop_at = planner.stop_at if planner else None
+
+    worksheet_labels = {"worksheet": config.worksheet_name}
+    registry.set("formchecker_worksheet_min_results", min_results, worksheet_labels)
+    registry.set("formchecker_worksheet_results", 0, worksheet_labels)
+    registry.set("formchecker_worksheet_batches", 0, worksheet_labels)
 
     print(f"目标：获取至少 {min_results} 个有效结果")
     print(f"配置：批次大小={batch_size}, 最大批次数={max_batches}")
 
     all_valid_results = []  # 存储所有有效结果（包含完整数据）
     processed_urls = set()  # 避免重复处理相同URL
+    url_to_data_all = {}  # 所有批次的URL到完整数据映射（尾部队列重试用）
+    tail_urls = []  # 超出时限的URL（低优先级尾部队列）
     current_batch = 0
     skip = 0
 
     while len(all_valid_results) < min_results and current_batch < max_batches:
+        if planner and planner.expired():
+            print(f"⏰ 已到运行截止时间，停止获取新批次")
+            break
         current_batch += 1
         print(f"\n{'='*60}")
         print(f"第 {current_batch} 批次开始...")
@@ -246,6 +351,7 @@ def get_url(api_url, config=None):
         # 创建URL到完整数据的映射
         url_to_data = {item.get("href"): item for item in res_datas if item.get("href")}
         batch_urls = list(url_to_data.keys())
+        url_to_data_all.update(url_to_data)
 
         if not batch_urls:
             print(f"第 {current_batch} 批次没有获取到新URL，停止")
@@ -268,16 +374,53 @@ def get_url(api_url, config=None):
 
         # 检查这批URL中的表单（使用多页面并行处理）
         print(f"开始检查第 {current_batch} 批次的 {len(new_urls)} 个URL...")
-        # 根据URL数量动态调整并发数和页面数
-        max_concurrent = min(4, max(2, len(new_urls) // 15))
-        pages_per_context = min(6, max(3, len(new_urls) // max_concurrent // 3))
+        batch_started = time.time()
+        # 根据URL数量动态调整并发数和页面数（分片时按每个进程的URL数计算）
+        if planner:
+            # 限时运行：由规划器按各工作表的进度分配并行页面，各进程的页面数可能不同
+            layouts = planner.parallelism(config.worksheet_name, len(new_urls), processes)
+        else:
+            urls_per_process = len(new_urls) // processes
+            max_concurrent = min(4, max(2, urls_per_process // 15))
+            pages_per_context = min(6, max(3, urls_per_process // max_concurrent // 3))
+            layouts = [(max_concurrent, pages_per_context)] * processes
+        batch_pages = layout_pages(layouts)
+        registry.set("formchecker_worksheet_pages", batch_pages, worksheet_labels)
+
+        if coordinator_server:
+            # 协调器模式：由工作节点领取租约检查
+            batch_results = check_urls_distributed(
+                new_urls, coordinator_server, tail_queue=tail_urls, stop_at=stop_at
+            )
+        else:
+            if len(set(layouts)) == 1:
+                max_concurrent, pages_per_context = layouts[0]
+                layout_text = f"{len(layouts)} 进程 × {max_concurrent} 上下文 × {pages_per_context} 页面"
+            else:
+                layout_text = f"{len(layouts)} 进程（" + " + ".join(
+                    f"{c} 上下文 × {p} 页面" for c, p in layouts
+                ) + "）"
+            print(f"🔧 并行配置: {layout_text} = {batch_pages} 并行度")
+            batch_results = asyncio.run(
+                load_url_sharded(
+                    new_urls,
+                    tail_queue=tail_urls,
+                    archive=archive,
+                    profile=profile,
+                    stop_at=stop_at,
+                    layouts=layouts,
+                )
+            )
 
-        print(
-            f"🔧 并行配置: {max_concurrent} 上下文 × {pages_per_context} 页面 = {max_concurrent * pages_per_context} 并行度"
-        )
-        batch_results = asyncio.run(
-            load_url(new_urls, max_concurrent, pages_per_context)
-        )
+        annotate_verdicts(config.worksheet_name, url_to_data, batch_started)
+        if planner:
+            planner.record_batch(
+                config.worksheet_name,
+                len(new_urls),
+                len(batch_results),
+                time.time() - batch_started,
+                batch_pages,
+            )
 
         # 将找到表单的URL转换为完整数据（包含param）
         batch_results_with_data = []
@@ -297,10 +440,13 @@ def get_url(api_url, config=None):
 
         # 添加到总结果中（用于统计）
         all_valid_results.extend(batch_results_with_data)
+        registry.set("formchecker_worksheet_results", len(all_valid_results), worksheet_labels)
+        registry.set("formchecker_worksheet_batches", current_batch, worksheet_labels)
 
         print(f"第 {current_batch} 批次完成:")
         print(f"  - 检查URL数: {len(new_urls)}")
         print(f"  - 有效结果: {len(batch_results)}")
+        print(f"  - 尾部队列: {len(tail_urls)}")
         print(f"  - 累计有效结果: {len(all_valid_results)}")
         print(f"  - 目标进度: {len(all_valid_results)}/{min_results}")
 
@@ -323,15 +469,61 @@ def get_url(api_url, config=None):
         skip += batch_size
 
         # 添加短暂延迟避免请求过快
-        import time
-
         time.sleep(1)
 
+    # 目标未达成时，使用放宽的时限重试尾部队列中的超时URL
+    if tail_urls and len(all_valid_results) < min_results and not (planner and planner.expired()):
+        current_batch += 1
+        print(f"\n{'='*60}")
+        print(f"⏱ 目标未达成，重试尾部队列中的 {len(tail_urls)} 个超时URL...")
+        retry_urls = tail_urls
+        tail_urls = []
+        tail_started = time.time()
+        max_concurrent = min(4, max(2, len(retry_urls) // 15))
+        pages_per_context = min(6, max(3, len(retry_urls) // max_concurrent // 3))
+        if coordinator_server:
+            tail_results = check_urls_distributed(
+                retry_urls,
+                coordinator_server,
+                tail_queue=tail_urls,
+                stop_at=stop_at,
+                deadline=DEFAULT_TAIL_URL_DEADLINE / 1000,
+            )
+        else:
+            tail_results = asyncio.run(
+                load_url(
+                    retry_urls,
+                    max_concurrent,
+                    pages_per_context,
+                    deadline=DEFAULT_TAIL_URL_DEADLINE / 1000,
+                    tail_queue=tail_urls,
+                    archive=archive,
+                    profile=profile,
+                    stop_at=stop_at,
+                )
+            )
+        annotate_verdicts(
+            config.worksheet_name,
+            {u: url_to_data_all.get(u, {}) for u in retry_urls},
+            tail_started,
+        )
+        tail_results_with_data = [
+            url_to_data_all.get(u, {"href": u, "param": ""}) for u in tail_results
+        ]
+        write_batch_to_sheets_with_retry(
+            tail_results_with_data, current_batch, config, config.write_retry
+        )
+        all_valid_results.extend(tail_results_with_data)
+        registry.set("formchecker_worksheet_results", len(all_valid_results), worksheet_labels)
+        print(f"  - 尾部队列有效结果: {len(tail_results)}")
+        print(f"  - 仍然超时: {len(tail_urls)}")
+
     print(f"\n{'='*60}")
     print(f"🎯 最终结果:")
     print(f"  - 总批次数: {current_batch}")
     print(f"  - 检查URL总数: {len(processed_urls)}")
     print(f"  - 有效结果数: {len(all_valid_results)}")
+    print(f"  - 超时URL数: {len(tail_urls)}")
     print(
         f"  - 目标完成度: {len(all_valid_results)}/{min_results} ({len(all_valid_results)/min_results*100:.1f}%)"
     )
@@ -341,6 +533,10 @@ def get_url(api_url, config=None):
     else:
         print("⚠️  没有找到任何有效结果")
 
+    if planner:
+        planner.finish(config.worksheet_name)
+    deadline_missed = planner is not None and planner.expired() and len(all_valid_results) < min_results
+
     # 收集当前工作表的统计信息
     if config and hasattr(config, "worksheet_name"):
         current_ws = config.worksheet_name
@@ -349,13 +545,16 @@ def get_url(api_url, config=None):
             "target_results": min_results,
             "actual_results": len(all_valid_results),
             "total_batches": current_batch,
+            "timed_out": len(tail_urls),
             "completion_rate": (
                 round((len(all_valid_results) / min_results) * 100, 1)
                 if min_results > 0
                 else 0
             ),
             "status": (
-                "✅ 完成" if len(all_valid_results) >= min_results else "⚠️ 未达标"
+                "✅ 完成"
+                if len(all_valid_results) >= min_results
+                else "⏰ 截止未达标" if deadline_missed else "⚠️ 未达标"
             ),
         }
 
@@ -369,14 +568,19 @@ def get_url(api_url, config=None):
     #     print(f"✅ 手动执行工作表 '{config.worksheet_name}' 完成")
     #     return all_valid_results
 
-    # 按顺序依次执行 [00, p0, p1]
+    # 调度器按工作表分别运行时，不串行执行后续工作表，由调度器发送汇总报告
+    if config and not getattr(config, "chain_worksheets", True):
+        print(f"✅ 工作表 '{config.worksheet_name}' 完成")
+        return all_valid_results
+
+    # 按顺序依次执行 [00, p0, p1]（限时运行时入口改为并发运行，见 scheduler.run_worksheets）
     if config:
-        sequence = ["00", "p0", "p1"]
+        sequence = WORKSHEET_SEQUENCE
         current_ws = getattr(config, "worksheet_name", None)
         if current_ws in sequence:
             if current_ws == sequence[-1]:
                 # 最后一个工作表完成，发送汇总报告
-                send_summary_report()
+                send_summary_report(planner=planner)
                 return all_valid_results
             # 切换到下一个 worksheet
             next_index = sequence.index(current_ws) + 1
@@ -399,10 +603,20 @@ def get_url(api_url, config=None):
 
 
 if __name__ == "__main__":
-    from config import Config
+    from config import Config, create_common_parser
+    from run_profiler import profile_run
 
     # 使用统一的配置管理
-    config = Config()
+    config = Config(create_common_parser().parse_args())
+    config.setup_logging()
 
     api_url = "http://testing-novabid-dsp.testing.svc.gzk8s.zhizh.com/api/admin/script/export/filter"
-    get_url(api_url, config)
+    if config.deadline or config.time_budget:
+        # 限时运行：各工作表并发运行，规划器才能在工作表之间调配页面和时间，
+        # 依次运行时第一个工作表可能用完整个截止时间
+        from scheduler import run_worksheets
+
+        run_worksheets(chained_worksheets(config.worksheet_name), config)
+    else:
+        with profile_run(config, config.worksheet_name):
+            get_url(api_url, config)
@@ -1,24 +1,56 @@
 # -*- coding: utf-8 -*-
 
-import gspread
 import logging
 
-# --- 配置日志 ---
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+from sheet_mirror import HEADER, append_start_row, get_mirror
+
+# gspread（连同google-auth和requests）在第一次连接时才导入，导入本模块没有副作用
+
+# 自定义gspread客户端工厂（credentials_path -> gspread.Client），用于接入本地伪后端
+_client_factory = None
+
+# 工作表本地镜像（sheet_mirror.SheetMirror），为None时使用默认镜像，为False时不使用镜像
+_mirror = None
+
+
+def set_client_factory(factory):
+    """
+    设置gspread客户端工厂，为None时恢复使用服务账号凭证
+    :param factory: 接收credentials_path并返回gspread.Client的函数
+    """
+    global _client_factory
+    _client_factory = factory
+
+
+def set_mirror(mirror):
+    """
+    设置工作表镜像
+    :param mirror: sheet_mirror.SheetMirror；为None时恢复默认镜像，为False时去重和读回直接读取远端
+    """
+    global _mirror
+    _mirror = mirror
 
 
 class GoogleSheetsManager:
-    def __init__(self, credentials_path, sheet_name):
+    def __init__(self, credentials_path, sheet_name, mirror=None):
         """
         初始化 Google Sheets 管理器
         :param credentials_path: Google Service Account 的 JSON 凭证文件路径
         :param sheet_name: 要操作的 Google Sheet 文件名
+        :param mirror: 工作表本地镜像，为None时使用 set_mirror 设置的镜像
         """
+        import gspread
+
+        if mirror is None:
+            mirror = get_mirror() if _mirror is None else _mirror
+        self.mirror = mirror or None
+
         try:
             # 使用服务账号凭证进行授权
-            self.gc = gspread.service_account(filename=credentials_path)
+            if _client_factory is not None:
+                self.gc = _client_factory(credentials_path)
+            else:
+                self.gc = gspread.service_account(filename=credentials_path)
             # 打开指定的 Google Sheet
             self.spreadsheet = self.gc.open(sheet_name)
             logging.info(f"成功连接到 Google Sheet: '{sheet_name}'")
@@ -34,6 +66,8 @@ class GoogleSheetsManager:
         """获取或创建一个工作表(worksheet)"""
         if not self.spreadsheet:
             return None
+        import gspread
+
         try:
             # 尝试获取工作表
             worksheet = self.spreadsheet.worksheet(worksheet_name)
@@ -59,6 +93,8 @@ class GoogleSheetsManager:
         try:
             worksheet.clear()  # 清空工作表
             worksheet.update(data)  # 写入所有数据
+            if self.mirror:
+                self.mirror.replace(self.spreadsheet.id, worksheet.title, data, worksheet.title)
             logging.info(f"成功向 '{worksheet.title}' 写入 {len(data)} 行数据。")
         except Exception as e:
             logging.error(f"写入数据失败: {e}", exc_info=True)
@@ -68,17 +104,19 @@ class GoogleSheetsManager:
         向指定的工作表追加数据，自动去重（基于href字段）
         :param worksheet: gspread 的 Worksheet 对象
         :param data: 一个二维列表，例如 [['href1', 'param1', '2025-09-26', '', '']]
+        :raises Exception: 读取或写入失败时记录日志后抛出原异常
         """
         if not worksheet:
             logging.warning("Worksheet 对象无效，无法追加数据。")
             return
+        if self.mirror:
+            return self._append_with_mirror(worksheet, data)
         try:
             # 检查是否需要添加表头
             existing_data = worksheet.get_all_values()
             if not existing_data:
                 # 如果工作表为空，先添加表头
-                header = ["href", "param", "日期", "负责人", "状态"]
-                worksheet.append_row(header)
+                worksheet.append_row(HEADER)
                 logging.info("添加表头到空工作表")
                 existing_hrefs = set()  # 空表，没有现有的href
             else:
@@ -117,12 +155,57 @@ class GoogleSheetsManager:
 
         except Exception as e:
             logging.error(f"追加数据失败: {e}", exc_info=True)
+            raise  # 交给调用方重试（见 get_url.write_batch_to_sheets_with_retry）
+
+    def _append_with_mirror(self, worksheet, data):
+        """追加数据，去重使用本地镜像（必要时先增量同步），写入成功后记入镜像"""
+        spreadsheet_id, title = self.spreadsheet.id, worksheet.title
+        try:
+            self.mirror.sync(self.spreadsheet, worksheet)
+            if self.mirror.row_count(spreadsheet_id, title) == 0:
+                response = worksheet.append_row(HEADER)
+                self.mirror.record_append(
+                    spreadsheet_id, worksheet, [HEADER], append_start_row(response)
+                )
+                logging.info("添加表头到空工作表")
+
+            rows = [row for row in data if row and len(row) > 0]
+            existing_hrefs = self.mirror.existing_hrefs(
+                spreadsheet_id, title, [row[0] for row in rows]
+            )
+            new_data = []
+            duplicate_count = 0
+            for row in rows:
+                if row[0] in existing_hrefs:
+                    duplicate_count += 1
+                else:
+                    new_data.append(row)
+                    existing_hrefs.add(row[0])  # 避免本批次内重复
+
+            if new_data:
+                response = worksheet.append_rows(new_data)
+                self.mirror.record_append(
+                    spreadsheet_id, worksheet, new_data, append_start_row(response)
+                )
+                logging.info(f"成功向 '{title}' 追加 {len(new_data)} 行新数据")
+            if duplicate_count > 0:
+                logging.info(f"跳过 {duplicate_count} 行重复数据（href已存在）")
+            logging.info(
+                f"数据处理完成：新增 {len(new_data)} 行，跳过重复 {duplicate_count} 行"
+            )
+        except Exception as e:
+            logging.error(f"追加数据失败: {e}", exc_info=True)
+            raise  # 交给调用方重试（见 get_url.write_batch_to_sheets_with_retry）
 
     def read_data(self, worksheet):
-        """从工作表读取所有数据"""
+        """从工作表读取所有数据（使用镜像时读取本地镜像）"""
         if not worksheet:
             logging.warning("Worksheet 对象无效，无法读取数据。")
             return None
+        if self.mirror:
+            records = self.mirror.records(self.spreadsheet.id, worksheet.title)
+            logging.info(f"从 '{worksheet.title}' 的本地镜像读取到 {len(records)} 条记录。")
+            return records
         try:
             records = worksheet.get_all_records()  # 以字典列表形式获取数据
             logging.info(f"从 '{worksheet.title}' 读取到 {len(records)} 条记录。")
@@ -146,33 +229,28 @@ def write_google_sheets(
         # --- 3. 获取或创建工作表 ---
         worksheet = manager.get_or_create_worksheet(worksheet_name)
 
-        # --- 4. 追加数据 ---
-        logging.info("使用追加模式写入数据...")
+        # --- 4. 追加数据（不再整表读回，只记录本次写入的行）---
+        logging.info(f"使用追加模式写入 {len(data_list)} 行数据...")
         manager.append_data(worksheet, data_list)
-
-        # --- 5. 读取数据 ---
-        logging.info("\n--- 读取表格数据 ---")
-        read_records = manager.read_data(worksheet)
-        if read_records:
-            for record in read_records:
-                print(record)
+        for row in data_list:
+            logging.debug(f"写入行: {row}")
 
 
 def main():
     """命令行入口函数"""
-    from config import Config
+    from config import Config, create_common_parser
 
     # 使用统一的配置管理
-    config = Config()
+    config = Config(create_common_parser().parse_args())
+    config.setup_logging()
     sheets_config = config.get_sheets_config()
 
-    # 调用主函数
-    write_google_sheets(
-        [],
-        sheets_config["credentials_path"],
-        sheets_config["sheet_name"],
-        sheets_config["worksheet_name"],
-    )
+    # 读取并显示工作表数据（write_google_sheets 写入后不再读回）
+    manager = GoogleSheetsManager(sheets_config["credentials_path"], sheets_config["sheet_name"])
+    if manager.spreadsheet:
+        worksheet = manager.get_or_create_worksheet(sheets_config["worksheet_name"])
+        for record in manager.read_data(worksheet) or []:
+            print(record)
 
 
 if __name__ == "__main__":
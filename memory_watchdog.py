@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import math
+import os
+import time
+
+# ===== 默认配置参数 =====
+DEFAULT_WATCHDOG_INTERVAL = 5  # 采样间隔（秒）
+DEFAULT_BROWSER_RSS_LIMIT_MB = 2048  # 浏览器进程树RSS上限，超过后强制回收页面和上下文
+DEFAULT_MIN_AVAILABLE_MB = 512  # 主机可用内存下限，低于时强制回收并降低并发
+DEFAULT_RECYCLE_COOLDOWN = 15  # 两次强制回收之间的最短间隔（秒）
+DEFAULT_MIN_CONCURRENCY_SCALE = 0.25  # 降低并发时的最低比例
+
+logger = logging.getLogger("memory_watchdog")
+
+
+def _read_proc_stat(pid):
+    """读取 /proc/<pid>/stat，返回 (ppid, rss页数)"""
+    with open(f"/proc/{pid}/stat", "r") as f:
+        data = f.read()
+    # 进程名可能包含空格和括号，从最后一个右括号之后开始解析
+    fields = data[data.rindex(")") + 2 :].split()
+    return int(fields[1]), int(fields[21])
+
+
+def get_process_tree_rss_mb(root_pid=None):
+    """
+    统计进程树（默认当前进程的所有子孙进程，即Playwright驱动和Chromium）的RSS总和
+    :return: RSS（MB），非Linux系统返回None
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    root_pid = root_pid or os.getpid()
+    page_size = os.sysconf("SC_PAGE_SIZE")
+
+    children = {}
+    rss_pages = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            ppid, rss = _read_proc_stat(entry)
+        except (OSError, ValueError, IndexError):
+            continue  # 进程已退出
+        pid = int(entry)
+        children.setdefault(ppid, []).append(pid)
+        rss_pages[pid] = rss
+
+    total = 0
+    stack = list(children.get(root_pid, []))
+    while stack:
+        pid = stack.pop()
+        total += rss_pages.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total * page_size / (1024 * 1024)
+
+
+def get_available_memory_mb():
+    """读取主机可用内存（MB），非Linux系统返回None"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemoryWatchdog:
+    """
+    浏览器内存看门狗：定期采样Chromium进程树RSS和主机可用内存，
+    超限时提升回收代数（页面/上下文据此重建），主机内存紧张时降低并发比例
+    未调用run()时为惰性对象：不回收、不降并发
+    """
+
+    def __init__(
+        self,
+        rss_limit_mb=DEFAULT_BROWSER_RSS_LIMIT_MB,
+        min_available_mb=DEFAULT_MIN_AVAILABLE_MB,
+        interval=DEFAULT_WATCHDOG_INTERVAL,
+    ):
+        self.rss_limit_mb = rss_limit_mb
+        self.min_available_mb = min_available_mb
+        self.interval = interval
+        self.generation = 0  # 回收代数，变化时页面和上下文需要重建
+        self.scale = 1.0  # 当前允许的并发比例
+        self.last_rss_mb = None
+        self.peak_rss_mb = 0
+        self.forced_recycles = 0
+        self._last_recycle = 0
+
+    def sample(self):
+        """采样一次并根据结果调整回收代数和并发比例"""
+        rss = get_process_tree_rss_mb()
+        available = get_available_memory_mb()
+        if rss is not None:
+            self.last_rss_mb = rss
+            self.peak_rss_mb = max(self.peak_rss_mb, rss)
+
+        host_pressure = available is not None and available < self.min_available_mb
+        rss_pressure = rss is not None and rss > self.rss_limit_mb
+
+        if host_pressure or rss_pressure:
+            now = time.monotonic()
+            if now - self._last_recycle >= DEFAULT_RECYCLE_COOLDOWN:
+                self._last_recycle = now
+                self.generation += 1
+                self.forced_recycles += 1
+                logger.warning(
+                    "🧹 内存告警（浏览器RSS %.0fMB，可用 %.0fMB），强制回收页面和上下文",
+                    rss or 0,
+                    available or 0,
+                )
+            if host_pressure and self.scale > DEFAULT_MIN_CONCURRENCY_SCALE:
+                self.scale = max(DEFAULT_MIN_CONCURRENCY_SCALE, self.scale / 2)
+                logger.warning("🐢 主机内存紧张，并发比例降至 %.0f%%", self.scale * 100)
+        elif self.scale < 1.0 and (
+            available is None or available > self.min_available_mb * 2
+        ):
+            self.scale = min(1.0, self.scale + 0.25)
+            logger.info("🐇 内存恢复，并发比例升至 %.0f%%", self.scale * 100)
+
+    def is_slot_allowed(self, index, total):
+        """第index个（从0开始）并行页面当前是否允许工作，至少保留一个"""
+        return index < max(1, math.ceil(total * self.scale))
+
+    async def run(self):
+        """后台采样循环，由调用方创建任务并在结束时取消"""
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning("⚠️ 内存采样失败: %s", e)
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+
+from app_logging import BackgroundHandler
+from metrics_exporter import record_verdict
+from verdict_store import get_store, store_record
+
+# ===== 默认配置参数 =====
+DEFAULT_METRICS_DIR = "log"  # 指标日志目录
+DEFAULT_RUN_RECORDS_LIMIT = 50000  # 内存中保留的本次运行记录数（用于汇总报告）
+DEFAULT_TOP_HOSTS = 10  # 汇总中展示的最慢域名数量
+
+# 单URL检查的各阶段
+PHASES = ["navigation", "dom_wait", "evaluate", "iframe_scan", "secondary_links"]
+
+
+def percentile(values, pct):
+    """计算分位数（最近秩法），values为空时返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def new_record(url):
+    """创建一条单URL检查记录"""
+    return {
+        "url": url,
+        "host": urlparse(url).netloc,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "phases": {},
+        "total": None,
+        "bytes": 0,
+        "blocked_requests": 0,
+        "allowed_requests": 0,
+        "network_bytes": 0,
+        "cache_hits": 0,
+        "final_url": None,
+        "verdict": None,
+        "error_class": None,
+        "cached": False,
+        "cache_class": None,
+    }
+
+
+@contextmanager
+def phase_timer(record, phase):
+    """计时上下文管理器，将耗时（秒）累加到 record["phases"][phase]，record为None时不计时"""
+    if record is None:
+        yield
+        return
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        elapsed = time.monotonic() - started
+        record["phases"][phase] = round(record["phases"].get(phase, 0) + elapsed, 4)
+
+
+class JournalFileHandler(logging.Handler):
+    """把指标记录追加到当天的JSONL文件（在后台线程中运行，文件保持打开，跨天时切换）"""
+
+    def __init__(self, journal):
+        super().__init__()
+        self.journal = journal
+        self._path = None
+        self._file = None
+
+    def emit(self, record):
+        try:
+            path = self.journal.path()
+            if path != self._path:
+                self.close_file()
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._file = open(path, "a", encoding="utf-8")
+                self._path = path
+            self._file.write(json.dumps(record.journal_record, ensure_ascii=False) + "\n")
+            self._file.flush()
+        except OSError as e:
+            print(f"⚠️ 写入指标日志失败: {e}")
+            self.close_file()
+
+    def close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        self._file = None
+        self._path = None
+
+    def close(self):
+        self.close_file()
+        super().close()
+
+
+class MetricsJournal:
+    """
+    单URL检查指标日志（JSONL，每天一个文件），同时在内存中保留本次运行的记录
+    文件写入经队列在后台线程完成（app_logging.BackgroundHandler），write()不做磁盘I/O
+    """
+
+    def __init__(self, directory=DEFAULT_METRICS_DIR, enabled=True):
+        self.directory = directory
+        self.enabled = enabled
+        self.run_records = deque(maxlen=DEFAULT_RUN_RECORDS_LIMIT)
+        self.run_started = time.time()
+        self._local = threading.local()
+        self._writer = BackgroundHandler(JournalFileHandler(self))
+
+    def path(self):
+        return os.path.join(
+            self.directory, f"url_metrics_{datetime.now().strftime('%Y%m%d')}.jsonl"
+        )
+
+    def write(self, record):
+        """写入一条记录"""
+        record["ended_at"] = time.time()
+        if getattr(self._local, "background", False):
+            record["background"] = True
+        else:
+            self.run_records.append(record)
+        record_verdict(record)
+        if not self.enabled:
+            return
+        store_record(record)
+        self._writer.handle(
+            logging.makeLogRecord({"levelno": logging.INFO, "journal_record": record})
+        )
+
+    @contextmanager
+    def background(self):
+        """当前线程中的检查为后台检查：照常写入日志，但不计入本次运行的汇总"""
+        self._local.background = True
+        try:
+            yield
+        finally:
+            self._local.background = False
+
+    def flush(self):
+        """等待指标日志写出，并把缓冲中的记录写入结论库"""
+        self._writer.flush()
+        if self.enabled:
+            get_store().flush()
+
+    def run_summary(self):
+        """本次运行（自上次reset起）的汇总"""
+        return summarize(self.run_records)
+
+    def reset(self):
+        self.run_records.clear()
+        self.run_started = time.time()
+
+
+_journal = MetricsJournal()
+
+
+def get_journal():
+    """获取全局指标日志"""
+    return _journal
+
+
+def _latency_stats(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+def summarize(records):
+    """
+    汇总检查记录：各阶段和各域名的p50/p95/p99，结论分布和吞吐量
+    :param records: 记录可迭代对象
+    """
+    totals = []
+    phases = {phase: [] for phase in PHASES}
+    hosts = {}
+    verdicts = {}
+    error_classes = {}
+    total_bytes = 0
+    blocked_requests = 0
+    allowed_requests = 0
+    network_bytes = 0
+    cache_hits = 0
+    cached_by_class = {}
+    first_start = None
+    last_end = None
+
+    for record in records:
+        verdict = record.get("verdict") or "unknown"
+        verdicts[verdict] = verdicts.get(verdict, 0) + 1
+        if record.get("error_class"):
+            error_classes[record["error_class"]] = (
+                error_classes.get(record["error_class"], 0) + 1
+            )
+        total_bytes += record.get("bytes") or 0
+        blocked_requests += record.get("blocked_requests") or 0
+        allowed_requests += record.get("allowed_requests") or 0
+        network_bytes += record.get("network_bytes") or 0
+        cache_hits += record.get("cache_hits") or 0
+
+        ended = record.get("ended_at")
+        if ended is not None and record.get("total") is not None:
+            started = ended - record["total"]
+            first_start = started if first_start is None else min(first_start, started)
+            last_end = ended if last_end is None else max(last_end, ended)
+
+        if record.get("cached"):
+            cache_class = record.get("cache_class") or "unknown"
+            cached_by_class[cache_class] = cached_by_class.get(cache_class, 0) + 1
+        if record.get("cached") or record.get("total") is None:
+            continue
+        totals.append(record["total"])
+        hosts.setdefault(record.get("host", ""), []).append(record["total"])
+        for phase, seconds in record.get("phases", {}).items():
+            phases.setdefault(phase, []).append(seconds)
+
+    count = sum(verdicts.values())
+    wall = (last_end - first_start) if first_start is not None else 0
+    return {
+        "count": count,
+        "checked": len(totals),
+        "verdicts": verdicts,
+        "error_classes": error_classes,
+        "cached_by_class": cached_by_class,
+        "bytes": total_bytes,
+        "blocked_requests": blocked_requests,
+        "allowed_requests": allowed_requests,
+        "network_bytes": network_bytes,
+        "cache_hits": cache_hits,
+        "wall_seconds": round(wall, 2),
+        "urls_per_sec": round(count / wall, 2) if wall > 0 else None,
+        "total": _latency_stats(totals),
+        "phases": {
+            phase: _latency_stats(values) for phase, values in phases.items() if values
+        },
+        "hosts": {host: _latency_stats(values) for host, values in hosts.items()},
+    }
+
+
+def _fmt_seconds(value):
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def format_report_lines(summary, top_hosts=3):
+    """生成企业微信报告用的简短耗时/吞吐量段落"""
+    if not summary["count"]:
+        return []
+    total = summary["total"]
+    lines = [
+        "⏱ 耗时与吞吐:",
+        f"   检查URL: {summary['count']}（实际访问 {summary['checked']}）| 吞吐: {summary['urls_per_sec'] or '-'} URL/s",
+        f"   单URL耗时 p50/p95/p99: {_fmt_seconds(total['p50'])} / {_fmt_seconds(total['p95'])} / {_fmt_seconds(total['p99'])}",
+    ]
+    phase_parts = [
+        f"{phase} {_fmt_seconds(stats['p95'])}"
+        for phase, stats in summary["phases"].items()
+    ]
+    if phase_parts:
+        lines.append(f"   阶段p95: {', '.join(phase_parts)}")
+    if summary.get("cached_by_class"):
+        lines.append(
+            "   缓存命中: "
+            + ", ".join(f"{k} {v}" for k, v in sorted(summary["cached_by_class"].items()))
+        )
+    if summary.get("blocked_requests") or summary.get("allowed_requests"):
+        lines.append(
+            f"   请求拦截: 拦截 {summary['blocked_requests']} / 放行 {summary['allowed_requests']}"
+        )
+    if summary.get("network_bytes") or summary.get("cache_hits"):
+        per_url = summary["network_bytes"] / summary["count"] / 1024
+        lines.append(
+            f"   网络传输: {summary['network_bytes'] / 1024 / 1024:.1f}MB（平均 {per_url:.0f}KB/URL，缓存命中 {summary['cache_hits']}）"
+        )
+    slow_hosts = sorted(
+        summary["hosts"].items(), key=lambda item: item[1]["p95"] or 0, reverse=True
+    )[:top_hosts]
+    if slow_hosts:
+        lines.append(
+            "   最慢域名p95: "
+            + ", ".join(f"{host} {_fmt_seconds(s['p95'])}" for host, s in slow_hosts)
+        )
+    return lines
+
+
+def load_records(paths):
+    """逐行读取JSONL指标日志"""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def print_summary(summary, top_hosts=DEFAULT_TOP_HOSTS):
+    """在终端打印完整汇总"""
+    print(f"📊 记录数: {summary['count']}（实际访问 {summary['checked']}）")
+    print(f"📈 吞吐: {summary['urls_per_sec'] or '-'} URL/s，墙钟 {summary['wall_seconds']}s")
+    print(f"📦 传输字节: {summary['bytes']}")
+    print(
+        f"🌐 网络传输字节: {summary.get('network_bytes', 0)}，缓存命中 {summary.get('cache_hits', 0)}"
+    )
+    print(
+        f"🚫 请求拦截: 拦截 {summary.get('blocked_requests', 0)} / 放行 {summary.get('allowed_requests', 0)}"
+    )
+    print(f"🏷 结论: {summary['verdicts']}")
+    if summary["error_classes"]:
+        print(f"❗ 错误类型: {summary['error_classes']}")
+    if summary.get("cached_by_class"):
+        print(f"🔄 缓存命中（按类别）: {summary['cached_by_class']}")
+
+    header = f"{'':<24}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}"
+    print("\n" + header)
+    rows = [("total", summary["total"])] + list(summary["phases"].items())
+    for name, stats in rows:
+        print(
+            f"{name:<24}{stats['count']:>8}{_fmt_seconds(stats['p50']):>10}"
+            f"{_fmt_seconds(stats['p95']):>10}{_fmt_seconds(stats['p99']):>10}"
+        )
+
+    print(f"\n最慢的 {top_hosts} 个域名（按p95）:")
+    slow_hosts = sorted(
+        summary["hosts"].items(), key=lambda item: item[1]["p95"] or 0, reverse=True
+    )[:top_hosts]
+    for host, stats in slow_hosts:
+        print(
+            f"{host[:23]:<24}{stats['count']:>8}{_fmt_seconds(stats['p50']):>10}"
+            f"{_fmt_seconds(stats['p95']):>10}{_fmt_seconds(stats['p99']):>10}"
+        )
+
+
+def main():
+    """命令行入口：汇总指标日志"""
+    parser = argparse.ArgumentParser(description="汇总单URL检查指标日志")
+    parser.add_argument("paths", nargs="+", help="url_metrics_*.jsonl 文件路径")
+    parser.add_argument(
+        "--top-hosts",
+        type=int,
+        default=DEFAULT_TOP_HOSTS,
+        help=f"展示的最慢域名数量（默认: {DEFAULT_TOP_HOSTS}）",
+    )
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出汇总")
+    args = parser.parse_args()
+
+    summary = summarize(load_records(args.paths))
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print_summary(summary, args.top_hosts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Prometheus文本格式的指标端点（可选），供长时间运行的调度器进程暴露运行状况
+
+    python scheduler.py --metrics-port 9108
+    curl http://127.0.0.1:9108/metrics
+
+- 计数器/仪表/直方图保存在进程内的注册表中，由各模块在关键位置更新；
+  缓存命中、浏览器RSS等在抓取时通过采集函数读取
+- 吞吐量下降看 rate(formchecker_urls_checked_total[5m])，
+  运行卡住看 time() - formchecker_last_verdict_timestamp_seconds 和 scheduler_job_running
+- 只统计本进程中检查的URL：分片子进程和协调器工作节点的检查不计入
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ===== 默认配置参数 =====
+DEFAULT_METRICS_HOST = "127.0.0.1"  # 只在本机暴露
+DEFAULT_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)  # 直方图分桶（秒）
+
+# 指标名 -> (类型, 说明)
+METRICS = {
+    "formchecker_urls_checked_total": ("counter", "已得出结论的URL数"),
+    "formchecker_verdicts_total": ("counter", "按结论和错误类别统计的URL数"),
+    "formchecker_pages_in_flight": ("gauge", "正在检查的页面数"),
+    "formchecker_last_verdict_timestamp_seconds": ("gauge", "最近一次得出结论的时间"),
+    "formchecker_cache_hits_total": ("counter", "按结果类别统计的缓存命中数"),
+    "formchecker_cache_misses_total": ("counter", "缓存未命中数"),
+    "formchecker_cache_hit_ratio": ("gauge", "缓存命中率"),
+    "formchecker_browser_rss_mb": ("gauge", "浏览器进程树RSS（MB）"),
+    "formchecker_api_request_seconds": ("histogram", "URL接口请求耗时"),
+    "formchecker_sheets_write_seconds": ("histogram", "Google Sheets写入耗时"),
+    "formchecker_worksheet_results": ("gauge", "工作表本次运行的有效结果数"),
+    "formchecker_worksheet_min_results": ("gauge", "工作表的目标结果数"),
+    "formchecker_worksheet_batches": ("gauge", "工作表本次运行的批次数"),
+    "formchecker_worksheet_pages": ("gauge", "工作表当前批次的并行页面数"),
+    "scheduler_job_running": ("gauge", "任务是否正在运行"),
+    "scheduler_job_started_timestamp_seconds": ("gauge", "任务最近一次开始运行的时间"),
+    "scheduler_job_last_duration_seconds": ("gauge", "任务最近一次运行的耗时"),
+    "scheduler_job_last_start_lag_seconds": ("gauge", "任务最近一次运行的启动延迟"),
+    "scheduler_job_runs_total": ("counter", "按状态统计的任务运行次数"),
+}
+
+
+class Registry:
+    """线程安全的进程内指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # (指标名, 标签元组) -> 数值
+        self._histograms = {}  # (指标名, 标签元组) -> [各桶计数, 总和, 总数]
+        self._collectors = []
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name, labels=None, value=1):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, value, labels=None):
+        with self._lock:
+            self._values[self._key(name, labels)] = value
+
+    def observe(self, name, value, labels=None):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(DEFAULT_LATENCY_BUCKETS), 0.0, 0]
+            for index, bound in enumerate(DEFAULT_LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def register_collector(self, collector):
+        """登记采集函数：抓取时调用，返回 [(指标名, 标签字典, 数值)]"""
+        self._collectors.append(collector)
+
+    def render(self):
+        """输出Prometheus文本格式"""
+        samples = {}
+        with self._lock:
+            for (name, labels), value in self._values.items():
+                samples.setdefault(name, []).append((name, labels, value))
+            for (name, labels), (counts, total, count) in self._histograms.items():
+                rows = samples.setdefault(name, [])
+                for bound, bucket_count in zip(DEFAULT_LATENCY_BUCKETS, counts):
+                    rows.append((f"{name}_bucket", labels + (("le", str(bound)),), bucket_count))
+                rows.append((f"{name}_bucket", labels + (("le", "+Inf"),), count))
+                rows.append((f"{name}_sum", labels, total))
+                rows.append((f"{name}_count", labels, count))
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    key = self._key(name, labels)
+                    samples.setdefault(name, []).append((name, key[1], value))
+            except Exception as e:
+                samples.setdefault("formchecker_collector_errors", []).append(
+                    ("formchecker_collector_errors", (("error", type(e).__name__),), 1)
+                )
+
+        lines = []
+        for name in sorted(samples):
+            kind, description = METRICS.get(name, ("gauge", ""))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples[name]:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+registry = Registry()
+
+
+def record_verdict(record):
+    """登记一条单URL检查记录（metrics.MetricsJournal.write 调用）"""
+    registry.inc("formchecker_urls_checked_total")
+    registry.inc(
+        "formchecker_verdicts_total",
+        {
+            "verdict": record.get("verdict") or "unknown",
+            "error_class": record.get("error_class") or "none",
+        },
+    )
+    registry.set("formchecker_last_verdict_timestamp_seconds", time.time())
+
+
+def _collect_browser_rss():
+    from memory_watchdog import get_process_tree_rss_mb
+
+    rss = get_process_tree_rss_mb()
+    return [] if rss is None else [("formchecker_browser_rss_mb", None, round(rss, 1))]
+
+
+registry.register_collector(_collect_browser_rss)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body = registry.render().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path == "/healthz":
+            body, content_type = b"ok\n", "text/plain; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+
+
+def start_metrics_server(port, host=DEFAULT_METRICS_HOST):
+    """在后台线程中启动指标端点（重复调用返回同一个服务器）"""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(
+            target=_server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+        print(f"📈 指标端点: http://{host}:{_server.server_address[1]}/metrics")
+    return _server
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+网络录制与回放：录制模式下把每个被检查URL的所有网络响应保存为一个归档文件，
+回放模式下通过Playwright路由从归档中返回响应（无网络），用于在固定的真实页面语料上
+做可重复的性能测试和结论校验
+
+归档格式（每个被检查URL一个JSON文件，类似精简版HAR）：
+{"url": ..., "verdict": ..., "captured_at": ..., "entries": [
+    {"method": "GET", "url": ..., "status": 200, "headers": {...}, "body": "<base64>"},
+    {"method": "GET", "url": ..., "error": "net::ERR_NAME_NOT_RESOLVED"}]}
+
+重定向逐跳录制（3xx响应连同Location头），网络错误录制为error条目，回放时以相同原因中止
+"""
+
+import base64
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime
+
+# ===== 默认配置参数 =====
+DEFAULT_ARCHIVE_DIR = "log/archive"
+DEFAULT_MAX_BODY_SIZE = 5 * 1024 * 1024  # 单个响应体最大录制字节数，超过时不录制
+
+# 回放时不能原样返回的响应头（内容已解码，长度可能变化）
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+# 网络错误信息 -> route.abort 的错误码（其他错误记为failed）
+_ABORT_REASONS = {
+    "ERR_NAME_NOT_RESOLVED": "namenotresolved",
+    "ERR_CONNECTION_REFUSED": "connectionrefused",
+    "ERR_CONNECTION_RESET": "connectionreset",
+    "ERR_CONNECTION_CLOSED": "connectionclosed",
+    "ERR_CONNECTION_FAILED": "connectionfailed",
+    "ERR_ADDRESS_UNREACHABLE": "addressunreachable",
+    "ERR_TIMED_OUT": "timedout",
+    "ERR_INTERNET_DISCONNECTED": "internetdisconnected",
+}
+
+
+def archive_file_name(url):
+    return hashlib.md5(url.encode()).hexdigest() + ".json"
+
+
+def abort_reason(message):
+    """网络错误信息对应的 route.abort 错误码"""
+    for marker, reason in _ABORT_REASONS.items():
+        if marker in message:
+            return reason
+    return "failed"
+
+
+async def _abort(route, reason):
+    try:
+        await route.abort(reason)
+    except Exception:
+        pass  # 页面已关闭，请求不再需要处理
+
+
+class CaptureArchive:
+    """录制模式：转发请求到网络，同时记录响应"""
+
+    mode = "capture"
+
+    def __init__(self, directory=DEFAULT_ARCHIVE_DIR):
+        self.directory = directory
+        self._entries = {}  # 被检查URL -> 响应列表
+        self.saved = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self, url):
+        """开始检查一个URL（重试时丢弃上次的录制）"""
+        self._entries[url] = []
+
+    async def handle(self, route, checked_url):
+        """转发请求并录制响应；请求失败时中止请求并录制错误，与正常运行时页面看到的一致"""
+        request = route.request
+        try:
+            # 不跟随重定向：每一跳分别录制，浏览器按Location继续请求
+            response = await route.fetch(max_redirects=0)
+            body = await response.body()
+        except Exception as e:
+            message = str(e).splitlines()[0] if str(e) else type(e).__name__
+            if checked_url in self._entries:
+                self._entries[checked_url].append(
+                    {"method": request.method, "url": request.url, "error": message}
+                )
+            await _abort(route, abort_reason(message))
+            return
+        if checked_url in self._entries and len(body) <= DEFAULT_MAX_BODY_SIZE:
+            self._entries[checked_url].append(
+                {
+                    "method": request.method,
+                    "url": request.url,
+                    "status": response.status,
+                    "headers": response.headers,
+                    "body": base64.b64encode(body).decode("ascii"),
+                }
+            )
+        await route.fulfill(response=response, body=body)
+
+    def discard(self, url):
+        """丢弃本次录制（缓存命中或页面崩溃）"""
+        self._entries.pop(url, None)
+
+    def finish(self, url, verdict):
+        """检查完成，写入归档文件；没有录制到响应时不覆盖已有的归档"""
+        entries = self._entries.pop(url, None)
+        if entries is None:
+            return
+        path = os.path.join(self.directory, archive_file_name(url))
+        if not entries and os.path.exists(path):
+            return
+        data = {
+            "url": url,
+            "verdict": verdict,
+            "captured_at": datetime.now().isoformat(timespec="seconds"),
+            "entries": entries,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        self.saved += 1
+
+
+class ReplayArchive:
+    """回放模式：只从归档返回响应，归档中没有的请求直接中止"""
+
+    mode = "replay"
+
+    def __init__(self, directory=DEFAULT_ARCHIVE_DIR):
+        self.directory = directory
+        self.expected = {}  # 被检查URL -> 录制时的结论
+        self._responses = {}  # (method, url) -> 响应
+        self.hits = 0
+        self.misses = 0
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.expected[data["url"]] = data.get("verdict")
+            for entry in data.get("entries", []):
+                self._responses.setdefault((entry["method"], entry["url"]), entry)
+
+    def urls(self):
+        """语料中的所有被检查URL"""
+        return list(self.expected)
+
+    def start(self, url):
+        pass
+
+    async def handle(self, route, checked_url):
+        request = route.request
+        entry = self._responses.get((request.method, request.url))
+        if entry is None:
+            self.misses += 1
+            await route.abort("internetdisconnected")
+            return
+        self.hits += 1
+        if "error" in entry:
+            await _abort(route, abort_reason(entry["error"]))
+            return
+        headers = {
+            key: value
+            for key, value in entry["headers"].items()
+            if key.lower() not in _DROP_HEADERS
+        }
+        await route.fulfill(
+            status=entry["status"],
+            headers=headers,
+            body=base64.b64decode(entry["body"]),
+        )
+
+    def discard(self, url):
+        pass
+
+    def finish(self, url, verdict):
+        pass
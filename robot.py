@@ -1,17 +1,158 @@
-import requests
+import atexit
+import queue
+import threading
+import time
+
 import json
 from config import DEFAULT_ROBOT
 
+# ===== 默认配置参数 =====
+DEFAULT_COALESCE_SECONDS = 3  # 合并窗口：窗口内的多条消息合并为一条发送
+DEFAULT_RATE_PER_MINUTE = 20  # 企业微信机器人限流（每分钟消息数）
+DEFAULT_SEND_RETRY = 3  # 发送失败重试次数
+DEFAULT_RETRY_BACKOFF = 2  # 重试退避基数（秒）
+DEFAULT_FLUSH_TIMEOUT = 30  # 退出时等待队列发送完的最长时间（秒）
+MAX_CONTENT_BYTES = 2048  # 企业微信文本消息content上限（UTF-8字节）
 
-class Robot:
-    def __init__(self):
-        self.url = "https://qyapi.weixin.qq.com/cgi-bin/webhook/send?key=8d36956a-8984-4c1c-8fc4-2acbf8b00e35"
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        }
+# 企业微信接口频率超限的错误码
+ERRCODE_RATE_LIMITED = 45009
+# 可以重试的错误码（限流、系统繁忙）；其余错误码（key无效、内容超长等）重试也不会成功
+RETRYABLE_ERRCODES = {ERRCODE_RATE_LIMITED, -1}
 
-    def send_text(self, content):
 
+def split_content(content, limit=MAX_CONTENT_BYTES):
+    """
+    把超过长度上限的消息按UTF-8字符边界切成多段，优先在换行处切分
+
+    :param content: 消息内容
+    :param limit: 每段的UTF-8字节上限
+    :return: 切分后的消息列表
+    """
+    data = content.encode("utf-8")
+    parts = []
+    while len(data) > limit:
+        cut = data.rfind(b"\n", 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+            # 不切在多字节字符中间（10xxxxxx是后续字节）
+            while cut > 0 and data[cut] & 0xC0 == 0x80:
+                cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:].lstrip(b"\n")
+    if data or not parts:
+        parts.append(data.decode("utf-8"))
+    return parts
+
+
+class TokenBucket:
+    """令牌桶限流"""
+
+    def __init__(self, rate_per_minute=DEFAULT_RATE_PER_MINUTE):
+        self.capacity = rate_per_minute
+        self.tokens = float(rate_per_minute)
+        self.refill_per_second = rate_per_minute / 60
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second
+        )
+        self.updated_at = now
+
+    def acquire(self):
+        """取一个令牌，令牌不足时睡眠到有令牌为止"""
+        self._refill()
+        if self.tokens < 1:
+            time.sleep((1 - self.tokens) / self.refill_per_second)
+            self._refill()
+        self.tokens -= 1
+
+    def drain(self):
+        """接口报告限流时清空令牌，按补充速率等待"""
+        self.tokens = 0
+        self.updated_at = time.monotonic()
+
+
+class Dispatcher:
+    """
+    后台发送线程：send_text只入队立即返回，合并窗口内的消息合并为一条，
+    按令牌桶限流发送，失败按退避重试，进程退出前发送完队列中的消息
+    """
+
+    def __init__(
+        self,
+        url,
+        headers,
+        coalesce_seconds=DEFAULT_COALESCE_SECONDS,
+        rate_per_minute=DEFAULT_RATE_PER_MINUTE,
+    ):
+        self.url = url
+        self.headers = headers
+        self.coalesce_seconds = coalesce_seconds
+        self.bucket = TokenBucket(rate_per_minute)
+        self.stats = {"queued": 0, "sent": 0, "merged": 0, "retried": 0, "failed": 0}
+        self._queue = queue.Queue()
+        self._pending = None  # 合并时超出长度上限、留到下一条发送的消息
+        self._thread = threading.Thread(
+            target=self._run, name="robot-dispatcher", daemon=True
+        )
+        self._thread.start()
+
+    def put(self, content):
+        self.stats["queued"] += 1
+        # 单条消息超过上限时拆开发送，否则会被接口拒绝
+        for part in split_content(content):
+            self._queue.put(part)
+
+    def flush(self, timeout=DEFAULT_FLUSH_TIMEOUT):
+        """等待队列中的消息发送完，返回是否在超时前完成"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _next_batch(self):
+        """取出第一条消息后在合并窗口内继续收集，返回 (合并后的内容, 收到的flush事件)"""
+        first = self._pending if self._pending is not None else self._queue.get()
+        self._pending = None
+        if isinstance(first, threading.Event):
+            return None, [first]
+        parts = [first]
+        size = len(first.encode("utf-8"))
+        events = []
+        deadline = time.monotonic() + self.coalesce_seconds
+        while True:
+            # 有flush请求时不再等待合并窗口
+            timeout = 0 if events else deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=max(0, timeout))
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                events.append(item)
+                continue
+            item_size = len(item.encode("utf-8")) + 2
+            if size + item_size > MAX_CONTENT_BYTES:
+                self._pending = item
+                break
+            parts.append(item)
+            size += item_size
+        self.stats["merged"] += len(parts) - 1
+        return "\n\n".join(parts), events
+
+    def _run(self):
+        while True:
+            content, events = self._next_batch()
+            if content is not None:
+                self._deliver(content)
+            if events and self._pending is not None:
+                # 还有因长度上限留下的消息，发送完再通知flush
+                self._deliver(self._pending)
+                self._pending = None
+            for event in events:
+                event.set()
+
+    def _deliver(self, content):
         data = {
             "msgtype": "text",
             "text": {
@@ -20,32 +161,96 @@ class Robot:
                 "mentioned_user_list": [],
             },
         }
+        for attempt in range(DEFAULT_SEND_RETRY + 1):
+            if attempt:
+                self.stats["retried"] += 1
+                time.sleep(DEFAULT_RETRY_BACKOFF**attempt)
+            self.bucket.acquire()
+            result = post_message(self.url, self.headers, data)
+            if result is True:
+                self.stats["sent"] += 1
+                return True
+            if result == ERRCODE_RATE_LIMITED:
+                self.bucket.drain()
+            if result is not False and result not in RETRYABLE_ERRCODES:
+                # 接口明确拒绝（key无效、内容超长等），重试也不会成功
+                self.stats["failed"] += 1
+                print(f"❌ 消息被拒绝（errcode={result}），不再重试，已丢弃")
+                return False
+        self.stats["failed"] += 1
+        print(f"❌ 消息发送失败（已重试 {DEFAULT_SEND_RETRY} 次），已丢弃")
+        return False
+
+
+def post_message(url, headers, data):
+    """发送请求到企业微信机器人，成功返回True，接口报错返回errcode，网络等错误返回False"""
+    # requests在后台线程第一次发送时才导入
+    import requests
+
+    try:
+        response = requests.post(url, headers=headers, data=json.dumps(data), timeout=10)
+        response.raise_for_status()
+        result = response.json()
+
+        if result.get("errcode") == 0:
+            print("✅ 消息发送成功")
+            return True
+        else:
+            print(f"❌ 消息发送失败: {result}")
+            return result.get("errcode") or False
+
+    except requests.exceptions.RequestException as e:
+        print(f"❌ 网络请求失败: {e}")
+        return False
+    except json.JSONDecodeError as e:
+        print(f"❌ JSON解析失败: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ 发送消息时出现错误: {e}")
+        return False
+
+
+# 每个webhook一个发送线程，所有Robot实例共享，限流按webhook计算
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_dispatcher(url, headers):
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(url)
+        if dispatcher is None:
+            dispatcher = _dispatchers[url] = Dispatcher(url, headers)
+        return dispatcher
+
+
+@atexit.register
+def flush_all(timeout=DEFAULT_FLUSH_TIMEOUT):
+    """发送完所有队列中的消息（进程退出时自动调用）"""
+    for dispatcher in list(_dispatchers.values()):
+        if not dispatcher.flush(timeout):
+            print("⚠️ 退出前未能发送完所有通知消息")
+
+
+class Robot:
+    def __init__(self):
+        self.url = "https://qyapi.weixin.qq.com/cgi-bin/webhook/send?key=8d36956a-8984-4c1c-8fc4-2acbf8b00e35"
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        }
 
-        return self._send_request(data)
+    def send_text(self, content):
+        """消息入队后立即返回，由后台线程合并、限流发送"""
+        if not DEFAULT_ROBOT:
+            return False
+        get_dispatcher(self.url, self.headers).put(content)
+        return True
+
+    def flush(self, timeout=DEFAULT_FLUSH_TIMEOUT):
+        """等待已入队的消息发送完"""
+        dispatcher = _dispatchers.get(self.url)
+        return dispatcher.flush(timeout) if dispatcher else True
 
     def _send_request(self, data):
-        """发送请求到企业微信机器人"""
+        """同步发送请求到企业微信机器人"""
         if DEFAULT_ROBOT:
-            try:
-                response = requests.post(
-                    self.url, headers=self.headers, data=json.dumps(data), timeout=10
-                )
-                response.raise_for_status()
-                result = response.json()
-
-                if result.get("errcode") == 0:
-                    print("✅ 消息发送成功")
-                    return True
-                else:
-                    print(f"❌ 消息发送失败: {result}")
-                    return False
-
-            except requests.exceptions.RequestException as e:
-                print(f"❌ 网络请求失败: {e}")
-                return False
-            except json.JSONDecodeError as e:
-                print(f"❌ JSON解析失败: {e}")
-                return False
-            except Exception as e:
-                print(f"❌ 发送消息时出现错误: {e}")
-                return False
+            return post_message(self.url, self.headers, data) is True
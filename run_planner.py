@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+按截止时间规划一次运行：多个工作表共享全局时间预算和浏览器并行页面数
+
+    python scheduler.py --deadline 09:30 --planner-pages 24
+    python get_url.py --time-budget 90
+
+- 每个工作表每批次结束后登记检查数、有效结果数和耗时，规划器据此估算
+  单页面吞吐（URL/页面·秒）和命中率，进而估算达到目标还需要的页面·秒
+- 每批次开始时按各工作表还需要的页面·秒分配并行页面数：落后越多分到的页面越多，
+  已达标的工作表不再占用页面
+- 到达截止时间后不再获取新批次，正在检查的批次停止检查新URL（检查中的URL完成后返回），
+  已找到的结果照常写入，汇总报告中列出截止时的完成情况
+- 分配只在批次边界调整；协调器模式下批次中途不会停止
+- 各工作表同时占用的页面数之和不超过共享页面数：批次结束即归还页面，
+  没有空闲页面时新批次等待其他工作表归还
+"""
+
+import datetime
+import math
+import threading
+import time
+
+# ===== 默认配置参数 =====
+DEFAULT_PLANNER_PAGES = 24  # 所有工作表共享的并行页面数
+DEFAULT_MIN_PAGES = 3  # 未达标工作表至少分到的页面数
+DEFAULT_MAX_PAGES_PER_CONTEXT = 6  # 每个浏览器上下文的最大页面数
+DEFAULT_PRIOR_URL_SECONDS = 8.0  # 没有历史时假定的单页面每个URL耗时（秒）
+DEFAULT_PRIOR_HIT_RATE = 0.1  # 没有历史时假定的命中率
+DEFAULT_PRIOR_WEIGHT = 20  # 先验相当于多少个已检查URL
+DEFAULT_ALLOCATE_POLL = 5.0  # 没有空闲页面时重新检查的间隔（秒）
+
+
+def parse_deadline(deadline=None, time_budget=None, now=None):
+    """
+    计算运行截止时间（time.time()时间戳），都未设置时返回None
+    :param deadline: 每天的截止时间 "HH:MM"，已过时视为次日
+    :param time_budget: 从现在起的时间预算（分钟）
+    """
+    now = now or datetime.datetime.now()
+    candidates = []
+    if deadline:
+        at = datetime.datetime.strptime(deadline, "%H:%M").time()
+        moment = datetime.datetime.combine(now.date(), at)
+        if moment <= now:
+            moment += datetime.timedelta(days=1)
+        candidates.append(moment.timestamp())
+    if time_budget:
+        candidates.append(now.timestamp() + float(time_budget) * 60)
+    return min(candidates) if candidates else None
+
+
+def context_layout(pages):
+    """把一个进程的页面数换算为 (上下文数, 每上下文页面数)，两者之积不超过页面数"""
+    max_concurrent = max(1, math.ceil(pages / DEFAULT_MAX_PAGES_PER_CONTEXT))
+    return max_concurrent, max(1, pages // max_concurrent)
+
+
+def layout_pages(layouts):
+    """各进程 (上下文数, 每上下文页面数) 的总页面数"""
+    return sum(max_concurrent * pages_per_context for max_concurrent, pages_per_context in layouts)
+
+
+class WorksheetProgress:
+    """一个工作表的运行进度"""
+
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+        self.found = 0
+        self.checked = 0
+        self.batches = 0
+        self.page_seconds = 0.0  # 检查耗时 × 并行页面数
+        self.pages = 0  # 当前批次占用的页面数，批次之间为0
+        self.status = "running"
+
+    @property
+    def remaining_results(self):
+        return max(0, self.target - self.found)
+
+
+class RunPlanner:
+    """在多个工作表之间按截止时间分配并行页面，线程安全（调度器并发运行各工作表）"""
+
+    def __init__(self, stop_at, total_pages=DEFAULT_PLANNER_PAGES, min_pages=DEFAULT_MIN_PAGES):
+        self.stop_at = stop_at
+        self.total_pages = total_pages
+        self.min_pages = min(min_pages, total_pages)
+        self.started = time.time()
+        self.worksheets = {}
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+
+    @classmethod
+    def from_config(cls, config):
+        """按配置创建规划器，没有设置截止时间或时间预算时返回None"""
+        stop_at = parse_deadline(
+            getattr(config, "deadline", None), getattr(config, "time_budget", None)
+        )
+        if stop_at is None:
+            return None
+        planner = cls(stop_at, getattr(config, "planner_pages", None) or DEFAULT_PLANNER_PAGES)
+        print(
+            f"⏰ 运行截止时间: {datetime.datetime.fromtimestamp(stop_at):%Y-%m-%d %H:%M}"
+            f"（剩余 {planner.remaining() / 60:.0f} 分钟，共享 {planner.total_pages} 个并行页面）"
+        )
+        return planner
+
+    # ----- 时间 -----
+    def remaining(self):
+        """距截止时间的秒数"""
+        return max(0.0, self.stop_at - time.time())
+
+    def expired(self):
+        return time.time() >= self.stop_at
+
+    # ----- 进度 -----
+    def register(self, name, target):
+        with self._lock:
+            if name not in self.worksheets:
+                self.worksheets[name] = WorksheetProgress(name, target)
+            return self.worksheets[name]
+
+    def record_batch(self, name, checked, found, elapsed, pages):
+        """登记一个批次的检查结果"""
+        with self._lock:
+            progress = self.worksheets[name]
+            progress.batches += 1
+            progress.checked += checked
+            progress.found += found
+            progress.page_seconds += elapsed * pages
+            self._release(progress)
+
+    def finish(self, name):
+        with self._lock:
+            progress = self.worksheets[name]
+            self._release(progress)
+            if self.expired() and progress.remaining_results:
+                progress.status = "deadline"
+            else:
+                progress.status = "done" if not progress.remaining_results else "exhausted"
+
+    def release(self, name):
+        """归还工作表占用的页面（运行异常退出时由调用方保证归还）"""
+        with self._lock:
+            self._release(self.worksheets[name])
+
+    def _release(self, progress):
+        """归还工作表占用的页面并唤醒等待页面的批次（调用方持有锁）"""
+        progress.pages = 0
+        self._released.notify_all()
+
+    def held_pages(self, exclude=None):
+        """各工作表当前占用的页面数之和（调用方持有锁）"""
+        return sum(p.pages for p in self.worksheets.values() if p is not exclude)
+
+    # ----- 估算 -----
+    def _rates(self, progress):
+        """(单页面每秒检查的URL数, 命中率)，历史不足时向所有工作表的整体水平/先验收缩"""
+        total_checked = sum(p.checked for p in self.worksheets.values())
+        total_page_seconds = sum(p.page_seconds for p in self.worksheets.values())
+        total_found = sum(p.found for p in self.worksheets.values())
+        prior_rate = (
+            total_checked / total_page_seconds
+            if total_page_seconds
+            else 1 / DEFAULT_PRIOR_URL_SECONDS
+        )
+        prior_hit = total_found / total_checked if total_checked else DEFAULT_PRIOR_HIT_RATE
+        weight = DEFAULT_PRIOR_WEIGHT
+        rate = (progress.checked + weight) / (progress.page_seconds + weight / prior_rate)
+        hit_rate = (progress.found + weight * prior_hit) / (progress.checked + weight)
+        return rate, max(hit_rate, 1e-3)
+
+    def estimate(self, name):
+        """估算工作表达标还需要检查的URL数和页面·秒"""
+        progress = self.worksheets[name]
+        rate, hit_rate = self._rates(progress)
+        urls = progress.remaining_results / hit_rate
+        return {"urls": urls, "page_seconds": urls / rate, "rate": rate, "hit_rate": hit_rate}
+
+    def allocate(self, name):
+        """
+        为工作表即将开始的批次分配并行页面数：按各未达标工作表还需要的页面·秒比例分配，
+        不超过其他工作表占用后剩余的页面；没有剩余页面时等待其他批次归还（截止后不再等待）
+        :return: 页面数
+        """
+        with self._lock:
+            progress = self.worksheets[name]
+            while True:
+                available = self.total_pages - self.held_pages(exclude=progress)
+                if available >= 1 or self.expired():
+                    break
+                self._released.wait(DEFAULT_ALLOCATE_POLL)
+            active = [
+                p
+                for p in self.worksheets.values()
+                if p.status == "running" and p.remaining_results
+            ]
+            if progress not in active:
+                pages = self.min_pages
+            else:
+                needs = {p.name: self.estimate(p.name)["page_seconds"] for p in active}
+                share = needs[name] / sum(needs.values())
+                pages = max(self.min_pages, round(self.total_pages * share))
+                # 其他工作表至少保留最低页面数
+                reserved = self.min_pages * (len(active) - 1)
+                pages = min(pages, max(self.min_pages, self.total_pages - reserved))
+            pages = max(1, min(pages, available))
+            progress.pages = pages
+            return pages
+
+    def parallelism(self, name, urls, processes=1):
+        """
+        把分到的页面数按进程拆分为每个进程的 (上下文数, 每上下文页面数)，并按本批URL数收缩；
+        不能整除时余下的页面分给前几个进程，页面少于进程数时只用部分进程，
+        各进程页面数之和不超过分到的页面数
+        :return: 每个进程一项的 [(上下文数, 每上下文页面数), ...]
+        """
+        pages = min(self.allocate(name), max(1, urls))
+        processes = max(1, min(processes, pages))
+        per_process, extra = divmod(pages, processes)
+        layouts = [
+            context_layout(per_process + (1 if index < extra else 0))
+            for index in range(processes)
+        ]
+        with self._lock:
+            # 按本批实际使用的页面数占用，多出的页面留给其他工作表
+            self.worksheets[name].pages = layout_pages(layouts)
+            self._released.notify_all()
+        return layouts
+
+    # ----- 报告 -----
+    def report_lines(self):
+        """汇总报告中的规划器部分"""
+        stop_at = datetime.datetime.fromtimestamp(self.stop_at)
+        lines = [
+            f"⏰ 截止时间 {stop_at:%H:%M}，"
+            + ("已到达" if self.expired() else f"剩余 {self.remaining() / 60:.0f} 分钟")
+        ]
+        labels = {"running": "进行中", "done": "达标", "exhausted": "无更多URL", "deadline": "截止未达标"}
+        with self._lock:
+            for progress in self.worksheets.values():
+                estimate = self.estimate(progress.name)
+                line = (
+                    f"  {progress.name}: {progress.found}/{progress.target} "
+                    f"{labels.get(progress.status, progress.status)}，检查 {progress.checked} 个URL，"
+                    f"命中率 {estimate['hit_rate']:.1%}"
+                )
+                if progress.remaining_results:
+                    line += f"，预计还需 {estimate['urls']:.0f} 个URL"
+                lines.append(line)
+        return lines
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+运行剖析（--profile）：定位一次运行慢在Python CPU、事件循环阻塞还是等待Chromium
+
+- CPU采样：后台线程按固定间隔采样运行线程的调用栈，输出折叠栈文件（.folded，
+  可直接用于 flamegraph.pl 或 speedscope）；栈顶在selector等待上的样本记为 [idle]，即在等浏览器/网络
+- 事件循环延迟：运行期间创建的事件循环（asyncio.run）每隔一段时间被投递一个回调，
+  回调实际执行时间与投递时间之差即为循环被阻塞的时长
+- 协程耗时拆分：运行期间创建的任务包装为计时协程，按协程名统计运行（占用事件循环）和等待的时间
+
+每次运行在输出目录写出 <时间>.folded 和 <时间>_summary.txt 两个文件。
+"""
+
+import asyncio
+import collections.abc
+import contextlib
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+# ===== 默认配置参数 =====
+DEFAULT_PROFILE_DIR = "log/profile"  # 剖析结果目录
+DEFAULT_SAMPLE_INTERVAL = 0.005  # CPU采样间隔（秒）
+DEFAULT_LAG_INTERVAL = 0.1  # 事件循环延迟探测间隔（秒）
+DEFAULT_TOP_N = 15  # 摘要中列出的热点数
+
+# 栈顶为这些函数时表示线程在等待I/O（事件循环空闲）
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+}
+
+# 累计热点中不列出的框架帧（事件循环调度本身）
+PLUMBING_FILES = {"runners.py", "base_events.py", "events.py", "threading.py"}
+
+# 线程ID -> 该线程上正在进行的剖析
+_active = {}
+# 剖析期间替换进程全局的事件循环策略：[使用中的剖析数, 替换前的策略]，
+# 并发剖析（调度器并发运行各工作表）时最后一个结束的剖析恢复原策略
+_policy_state = [0, None]
+_policy_lock = threading.Lock()
+
+
+class _TimedCoroutine(collections.abc.Coroutine):
+    """包装协程，累计每一步send/throw占用事件循环的时间"""
+
+    def __init__(self, coro, stats):
+        self._coro = coro
+        self._stats = stats
+        self._created = time.perf_counter()
+
+    def _step(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        except BaseException:
+            self._stats["wall"] += time.perf_counter() - self._created
+            raise
+        finally:
+            self._stats["run"] += time.perf_counter() - started
+
+    def send(self, value):
+        return self._step(self._coro.send, value)
+
+    def throw(self, *args):
+        return self._step(self._coro.throw, *args)
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+
+class _ProfilingPolicy(asyncio.DefaultEventLoopPolicy):
+    """为剖析中的线程创建的事件循环安装计时任务工厂和延迟探测"""
+
+    def new_event_loop(self):
+        loop = super().new_event_loop()
+        profiler = _active.get(threading.get_ident())
+        if profiler is not None:
+            profiler.instrument(loop)
+        return loop
+
+
+class RunProfiler:
+    """
+    剖析一次运行（上下文管理器）：
+        with RunProfiler(label="00"):
+            get_url(API_URL, config)
+    """
+
+    def __init__(
+        self,
+        label="run",
+        output_dir=DEFAULT_PROFILE_DIR,
+        interval=DEFAULT_SAMPLE_INTERVAL,
+    ):
+        self.label = label
+        self.output_dir = output_dir
+        self.interval = interval
+        self.stacks = {}  # 折叠栈 -> 样本数
+        self.samples = 0
+        self.idle_samples = 0
+        self.lags = []  # 事件循环延迟（秒）
+        self.coroutines = {}  # 协程名 -> {"count", "run", "wall"}
+        self._loops = []
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self.started = None
+        self.elapsed = 0
+
+    # ----- 事件循环 -----
+    def instrument(self, loop):
+        self._loops.append(loop)
+        loop.set_task_factory(self._task_factory)
+
+    def _task_factory(self, loop, coro, **kwargs):
+        name = getattr(coro, "__qualname__", None) or type(coro).__name__
+        stats = self.coroutines.setdefault(name, {"count": 0, "run": 0.0, "wall": 0.0})
+        stats["count"] += 1
+        return asyncio.Task(_TimedCoroutine(coro, stats), loop=loop, **kwargs)
+
+    def _probe_loops(self):
+        for loop in self._loops:
+            if loop.is_running() and not loop.is_closed():
+                posted = time.perf_counter()
+                try:
+                    loop.call_soon_threadsafe(
+                        lambda posted=posted: self.lags.append(time.perf_counter() - posted)
+                    )
+                except RuntimeError:
+                    pass  # 循环刚好关闭
+        self._loops = [loop for loop in self._loops if not loop.is_closed()]
+
+    # ----- CPU采样 -----
+    def _sample(self):
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return
+        names = []
+        top = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+        while frame is not None:
+            code = frame.f_code
+            # 计时协程的包装帧不进入火焰图
+            if code.co_filename != __file__:
+                names.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+            frame = frame.f_back
+        names.reverse()
+        if top in IDLE_FRAMES:
+            names.append("[idle]")
+            self.idle_samples += 1
+        stack = ";".join(names)
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+
+    def _run_sampler(self):
+        next_probe = 0
+        while not self._stop.wait(self.interval):
+            self._sample()
+            now = time.perf_counter()
+            if now >= next_probe:
+                self._probe_loops()
+                next_probe = now + DEFAULT_LAG_INTERVAL
+
+    # ----- 启停 -----
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        with _policy_lock:
+            if _policy_state[0] == 0:
+                _policy_state[1] = asyncio.get_event_loop_policy()
+                asyncio.set_event_loop_policy(_ProfilingPolicy())
+            _policy_state[0] += 1
+        _active[self._thread_id] = self
+        self.started = time.perf_counter()
+        self._sampler = threading.Thread(
+            target=self._run_sampler, name=f"profiler-{self.label}", daemon=True
+        )
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._sampler.join()
+        self.elapsed = time.perf_counter() - self.started
+        _active.pop(self._thread_id, None)
+        with _policy_lock:
+            _policy_state[0] -= 1
+            if _policy_state[0] == 0:
+                # 剖析期间被他人替换过的策略保持不动
+                if isinstance(asyncio.get_event_loop_policy(), _ProfilingPolicy):
+                    asyncio.set_event_loop_policy(_policy_state[1])
+                _policy_state[1] = None
+        try:
+            self.write()
+        except OSError as e:
+            print(f"⚠️ 写入剖析结果失败: {e}")
+        return False
+
+    # ----- 输出 -----
+    def write(self):
+        """写出折叠栈和文本摘要，返回两个文件路径"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(
+            self.output_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.label}"
+        )
+        folded_path = f"{prefix}.folded"
+        with open(folded_path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        summary_path = f"{prefix}_summary.txt"
+        summary = self.summary()
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write(summary + "\n")
+        print(summary)
+        print(f"🔥 剖析结果: {folded_path}（flamegraph.pl / speedscope）")
+        return folded_path, summary_path
+
+    def summary(self, top_n=DEFAULT_TOP_N):
+        """热点摘要：CPU占比、自身/累计热点函数、事件循环延迟、协程运行/等待时间"""
+        busy = self.samples - self.idle_samples
+        lines = [
+            f"📊 剖析摘要 [{self.label}] 耗时 {self.elapsed:.1f}s，"
+            f"样本 {self.samples}（Python运行 {busy}，等待I/O {self.idle_samples}）",
+        ]
+        if self.samples:
+            lines.append(f"   Python CPU占比: {busy / self.samples:.0%}")
+
+        own, inclusive = {}, {}
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            if frames[-1] == "[idle]":
+                continue
+            own[frames[-1]] = own.get(frames[-1], 0) + count
+            for name in set(frames):
+                if name.startswith("<module>") or name.split("(")[-1].split(":")[0] in PLUMBING_FILES:
+                    continue
+                inclusive[name] = inclusive.get(name, 0) + count
+        if own:
+            lines.append("🔥 自身耗时热点（占Python运行样本）:")
+            for name, count in sorted(own.items(), key=lambda x: -x[1])[:top_n]:
+                lines.append(f"   {count / busy:6.1%}  {name}")
+            lines.append("🔥 累计耗时热点:")
+            for name, count in sorted(inclusive.items(), key=lambda x: -x[1])[:top_n]:
+                lines.append(f"   {count / busy:6.1%}  {name}")
+
+        if self.lags:
+            lags = sorted(self.lags)
+            pick = lambda p: lags[min(len(lags) - 1, int(len(lags) * p / 100))] * 1000
+            lines.append(
+                f"⏳ 事件循环延迟: p50 {pick(50):.1f}ms  p95 {pick(95):.1f}ms  "
+                f"p99 {pick(99):.1f}ms  max {lags[-1] * 1000:.1f}ms（{len(lags)} 次探测）"
+            )
+
+        if self.coroutines:
+            lines.append("🧵 协程运行/等待时间（按运行时间排序）:")
+            ranked = sorted(self.coroutines.items(), key=lambda x: -x[1]["run"])
+            for name, stats in ranked[:top_n]:
+                wait = max(0.0, stats["wall"] - stats["run"])
+                lines.append(
+                    f"   {name:<40} ×{stats['count']:<6} 运行 {stats['run']:8.2f}s  等待 {wait:8.2f}s"
+                )
+        return "\n".join(lines)
+
+
+def profile_run(config, label):
+    """config.profile 开启时返回剖析上下文，否则返回空上下文"""
+    if not getattr(config, "profile", False):
+        return contextlib.nullcontext()
+    return RunProfiler(label, getattr(config, "profile_dir", None) or DEFAULT_PROFILE_DIR)
@@ -1,35 +1,368 @@
 # -*- coding: utf-8 -*-
+"""
+定时任务调度器
+- 主线程精确睡眠到最近的到期时间，任务在线程池中执行，长任务不阻塞其他任务的调度
+- 每个工作表（或工作表组）可以有独立的执行时间，如 --schedule "00=07:00,p0=07:30,p1=08:00"
+- 同一任务上一次运行尚未结束时，本次到期的运行被跳过（重叠保护）
+- 调度器停止期间错过的运行（含被中断的运行）按补跑策略处理：skip 不补跑，once 补跑一次，
+  all 依次补跑（最多 DEFAULT_MAX_CATCH_UP 次）
+- 每次运行的启动延迟和耗时写入 log/scheduler_runs.jsonl，调度状态保存在 log/scheduler_state.json
+"""
 
-import schedule
-import time
-import logging
+import copy
 import datetime
-from get_url import get_url
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app_logging
+from metrics_exporter import registry, start_metrics_server
+from run_profiler import profile_run
+
+from get_url import chained_worksheets, get_url, send_summary_report
+from run_planner import RunPlanner
+from cache_revalidator import CacheRevalidator
 from robot import Robot
-from config import API_URL
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("log/scheduler.log", encoding="utf-8"),
-        logging.StreamHandler(),
-    ],
-)
+from config import API_URL, URL_GROUPS, DEFAULT_CATCH_UP, DEFAULT_SCHEDULER_WORKERS
+
+# ===== 默认配置参数 =====
+DEFAULT_MAX_CATCH_UP = 3  # all 策略下最多补跑的次数
+DEFAULT_LOG_PATH = "log/scheduler.log"
+DEFAULT_STATE_PATH = "log/scheduler_state.json"
+DEFAULT_RUNS_LOG_PATH = "log/scheduler_runs.jsonl"
+DEFAULT_WORKSHEET_SEQUENCE = ["00", "p0", "p1"]
+
+CATCH_UP_POLICIES = ("skip", "once", "all")
+
 robot = Robot()
 
 
+def setup_logging(log_file=DEFAULT_LOG_PATH, level="INFO", log_format="text"):
+    """配置调度器日志（入口调用，导入本模块不打开日志文件）"""
+    app_logging.setup_logging(level, log_file, log_format)
+
+
+def parse_schedule(text, default_time):
+    """
+    解析调度配置 "00=07:00,p0=07:30,p1=08:00"，工作表组用 + 连接，如 "00+p0=07:00"
+    返回 [(任务名, 工作表列表, "HH:MM")]；为空时所有工作表按顺序在default_time执行
+    """
+    if not text:
+        return [("daily", list(DEFAULT_WORKSHEET_SEQUENCE), default_time)]
+    jobs = []
+    for item in text.split(","):
+        name, _, at = item.strip().partition("=")
+        worksheets = [ws for ws in name.split("+") if ws]
+        unknown = [ws for ws in worksheets if ws not in URL_GROUPS]
+        if not worksheets or not at or unknown:
+            raise ValueError(f"无效的调度配置: {item}")
+        datetime.datetime.strptime(at, "%H:%M")
+        jobs.append((name, worksheets, at))
+    return jobs
+
+
+class ScheduledJob:
+    """每天在固定时间执行的任务"""
+
+    def __init__(self, name, at, func, *args):
+        self.name = name
+        self.at = at
+        self.func = func
+        self.args = args
+        hour, minute = at.split(":")
+        self.time = datetime.time(int(hour), int(minute))
+
+    @property
+    def key(self):
+        return f"{self.name}@{self.at}"
+
+    def next_due(self, after):
+        """after之后（不含）的下一次到期时间"""
+        due = datetime.datetime.combine(after.date(), self.time)
+        if due <= after:
+            due += datetime.timedelta(days=1)
+        return due
+
+    def due_times(self, after, until):
+        """(after, until] 区间内的所有到期时间"""
+        dues = []
+        due = self.next_due(after)
+        while due <= until:
+            dues.append(due)
+            due += datetime.timedelta(days=1)
+        return dues
+
+
+class Scheduler:
+    """精确睡眠 + 线程池执行的调度器"""
+
+    def __init__(
+        self,
+        max_workers=DEFAULT_SCHEDULER_WORKERS,
+        catch_up=DEFAULT_CATCH_UP,
+        state_path=DEFAULT_STATE_PATH,
+        runs_log_path=DEFAULT_RUNS_LOG_PATH,
+    ):
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"未知的补跑策略: {catch_up}")
+        self.catch_up = catch_up
+        self.state_path = state_path
+        self.runs_log_path = runs_log_path
+        self.jobs = []
+        self.stop_event = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+        self._running = set()  # 正在运行的任务名
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+
+    def add_job(self, name, at, func, *args):
+        job = ScheduledJob(name, at, func, *args)
+        self.jobs.append(job)
+        logging.info(f"设置定时任务 {name}，每天 {at} 执行")
+        return job
+
+    # ----- 状态 -----
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _job_state(self, job):
+        return self._state.setdefault(job.key, {})
+
+    def _log_run(self, entry):
+        os.makedirs(os.path.dirname(self.runs_log_path) or ".", exist_ok=True)
+        with open(self.runs_log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    # ----- 调度 -----
+    def _collect_due(self, now):
+        """处理所有到期（含错过）的运行"""
+        for job in self.jobs:
+            with self._lock:
+                job_state = self._job_state(job)
+                last_due = job_state.get("last_due")
+                if last_due is None:
+                    # 首次运行：从现在开始计时，不补跑历史
+                    job_state["last_due"] = now.isoformat(timespec="seconds")
+                    self._save_state()
+                    continue
+                dues = job.due_times(datetime.datetime.fromisoformat(last_due), now)
+                # 有运行标记但任务并未在本进程中运行：上次运行被重启中断，按错过处理
+                interrupted = None
+                if job.name not in self._running:
+                    interrupted = job_state.pop("running", None)
+                if interrupted:
+                    logging.warning(f"任务 {job.name} 的上次运行（{interrupted}）被中断")
+                    dues.insert(0, datetime.datetime.fromisoformat(interrupted))
+                if not dues:
+                    if interrupted is not None:
+                        self._save_state()
+                    continue
+                job_state["last_due"] = dues[-1].isoformat(timespec="seconds")
+                self._save_state()
+
+            # 最近一次到期属于正常运行，之前的属于错过的运行
+            missed, current = dues[:-1], dues[-1]
+            if now - current > datetime.timedelta(minutes=5):
+                missed, current = dues, None
+            if missed:
+                if self.catch_up == "skip":
+                    logging.warning(f"任务 {job.name} 错过 {len(missed)} 次运行，按策略不补跑")
+                    missed = []
+                elif self.catch_up == "once":
+                    missed = missed[-1:]
+                else:
+                    missed = missed[-DEFAULT_MAX_CATCH_UP:]
+            runs = [(due, "catch_up") for due in missed]
+            if current is not None:
+                runs.append((current, "scheduled"))
+            if runs:
+                self._submit(job, runs)
+
+    def _submit(self, job, runs):
+        with self._lock:
+            if job.name in self._running:
+                for due, kind in runs:
+                    logging.warning(f"任务 {job.name} 上一次运行尚未结束，跳过 {due} 的运行")
+                    registry.inc(
+                        "scheduler_job_runs_total", {"job": job.name, "status": "skipped_overlap"}
+                    )
+                    self._log_run(
+                        {
+                            "job": job.name,
+                            "due": due.isoformat(timespec="seconds"),
+                            "kind": kind,
+                            "status": "skipped_overlap",
+                        }
+                    )
+                return
+            self._running.add(job.name)
+        self._executor.submit(self._run, job, runs)
+
+    def _run(self, job, runs):
+        try:
+            for due, kind in runs:
+                if self.stop_event.is_set():
+                    break
+                started = datetime.datetime.now()
+                lag = (started - due).total_seconds()
+                with self._lock:
+                    self._job_state(job)["running"] = due.isoformat(timespec="seconds")
+                    self._save_state()
+                job_labels = {"job": job.name}
+                registry.set("scheduler_job_running", 1, job_labels)
+                registry.set("scheduler_job_started_timestamp_seconds", time.time(), job_labels)
+                registry.set("scheduler_job_last_start_lag_seconds", round(lag, 3), job_labels)
+                logging.info(
+                    f"开始执行任务 {job.name}（{kind}，计划 {due:%Y-%m-%d %H:%M}，启动延迟 {lag:.1f}s）"
+                )
+                status = "ok"
+                started_monotonic = time.monotonic()
+                try:
+                    job.func(*job.args)
+                except Exception as e:
+                    status = "error"
+                    logging.error(f"任务 {job.name} 执行失败: {str(e)}", exc_info=True)
+                duration = time.monotonic() - started_monotonic
+                registry.set("scheduler_job_running", 0, job_labels)
+                registry.set("scheduler_job_last_duration_seconds", round(duration, 3), job_labels)
+                registry.inc("scheduler_job_runs_total", {"job": job.name, "status": status})
+                logging.info(f"任务 {job.name} 执行完成，耗时 {duration:.1f}s")
+                entry = {
+                    "job": job.name,
+                    "due": due.isoformat(timespec="seconds"),
+                    "kind": kind,
+                    "started_at": started.isoformat(timespec="seconds"),
+                    "start_lag": round(lag, 3),
+                    "duration": round(duration, 3),
+                    "status": status,
+                }
+                with self._lock:
+                    job_state = self._job_state(job)
+                    job_state.pop("running", None)
+                    job_state["last_run"] = entry
+                    self._save_state()
+                    self._log_run(entry)
+        finally:
+            with self._lock:
+                self._running.discard(job.name)
+
+    def is_busy(self):
+        """是否有任务正在运行"""
+        with self._lock:
+            return bool(self._running)
+
+    def next_run_time(self, now):
+        """最近一次到期时间，没有任务时返回None"""
+        if not self.jobs:
+            return None
+        return min(job.next_due(now) for job in self.jobs)
+
+    def seconds_until_next(self, now):
+        """距最近一次到期的秒数"""
+        next_due = self.next_run_time(now)
+        return None if next_due is None else (next_due - now).total_seconds()
+
+    def run_forever(self):
+        """主循环：精确睡眠到下一次到期，到期后提交任务"""
+        self._collect_due(datetime.datetime.now())
+        while not self.stop_event.is_set():
+            wait = self.seconds_until_next(datetime.datetime.now())
+            if wait is None:
+                break
+            # 睡眠可被stop_event提前唤醒；醒来后按当前时间收集到期运行
+            if self.stop_event.wait(max(0.0, wait) + 0.01):
+                break
+            self._collect_due(datetime.datetime.now())
+
+    def shutdown(self, wait=True):
+        self.stop_event.set()
+        self._executor.shutdown(wait=wait)
+
+
+def run_worksheets(worksheets, config=None):
+    """
+    处理多个工作表，完成后发送这些工作表的汇总报告
+    未限时时依次处理；设置了 --deadline/--time-budget 时各工作表并发运行，
+    由规划器按进度分配共享的并行页面，到截止时间停止
+    """
+    current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    robot.send_text(f"开始执行任务（工作表 {', '.join(worksheets)}）- {current_time}")
+    planner = RunPlanner.from_config(config) if config is not None else None
+
+    def run_one(worksheet):
+        # 每次运行使用独立的配置副本，并发任务之间互不影响
+        job_config = copy.copy(config)
+        if job_config is not None:
+            job_config.worksheet_name = worksheet
+            job_config.req_urls = URL_GROUPS.get(worksheet, {}).get("urls", "")
+            job_config.min_results = URL_GROUPS.get(worksheet, {}).get(
+                "min_results", job_config.min_results
+            )
+            job_config.chain_worksheets = False
+            job_config.planner = planner
+        try:
+            with profile_run(config, worksheet):
+                get_url(API_URL, job_config)
+        finally:
+            if planner is not None and worksheet in planner.worksheets:
+                # 运行异常退出时归还页面，其他工作表不必等到截止时间
+                planner.release(worksheet)
+
+    if planner is None or len(worksheets) == 1:
+        for worksheet in worksheets:
+            run_one(worksheet)
+    else:
+        # 先登记所有工作表，第一个批次的页面分配就考虑到全部工作表
+        for worksheet in worksheets:
+            planner.register(
+                worksheet, URL_GROUPS.get(worksheet, {}).get("min_results", config.min_results)
+            )
+        with ThreadPoolExecutor(
+            max_workers=len(worksheets), thread_name_prefix="worksheet"
+        ) as executor:
+            for future in [executor.submit(run_one, ws) for ws in worksheets]:
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"工作表运行失败: {str(e)}", exc_info=True)
+    send_summary_report(worksheets, planner)
+
+
 # API_URL = "http://127.0.0.1:56337/response.json"
 def run_daily_task(config=None):
-    """执行每日任务"""
+    """
+    执行每日任务（所有工作表按顺序依次处理）
+    设置了 --deadline/--time-budget 时与定时任务一样并发运行各工作表，
+    依次运行时规划器无法在工作表之间调配，第一个工作表可能用完整个截止时间
+    """
     try:
+        if getattr(config, "deadline", None) or getattr(config, "time_budget", None):
+            run_worksheets(chained_worksheets(config.worksheet_name), config)
+            return
+
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         logging.info(f"开始执行每日任务 - {current_time}")
 
         robot.send_text(f"开始执行每日任务 - {current_time}")
         # 调用主要的处理函数
-        get_url(API_URL, config)
+        with profile_run(config, "daily"):
+            get_url(API_URL, config)
 
         logging.info(f"每日任务执行完成 - {current_time}")
 
@@ -40,31 +373,33 @@ def run_daily_task(config=None):
 def setup_scheduler(run_time="07:00", config=None):
     """
     设置定时任务调度器
-    :param run_time: 执行时间，格式为 "HH:MM"，默认上午9点
+    :param run_time: 未指定 --schedule 时所有工作表的执行时间，格式为 "HH:MM"
     :param config: 配置对象
     """
-    logging.info(f"设置定时任务，每天 {run_time} 执行")
-
-    # 设置每天在指定时间执行任务
-    schedule.every().day.at(run_time).do(run_daily_task, config)  # 每30分钟
+    scheduler = Scheduler(
+        max_workers=getattr(config, "scheduler_workers", DEFAULT_SCHEDULER_WORKERS),
+        catch_up=getattr(config, "catch_up", DEFAULT_CATCH_UP),
+    )
+    for name, worksheets, at in parse_schedule(
+        getattr(config, "schedule", None), run_time
+    ):
+        scheduler.add_job(name, at, run_worksheets, worksheets, config)
+    return scheduler
 
 
-def run_scheduler():
+def run_scheduler(scheduler):
     """运行调度器主循环"""
     logging.info("定时任务调度器启动")
     logging.info("按 Ctrl+C 停止调度器")
 
     try:
-        while True:
-            # 检查是否有待执行的任务
-            schedule.run_pending()
-            time.sleep(60)  # 每分钟检查一次
-
+        scheduler.run_forever()
     except KeyboardInterrupt:
-        logging.info("收到停止信号，正在关闭调度器 ...")
+        logging.info("收到停止信号，正在关闭调度器，等待运行中的任务结束 ...")
     except Exception as e:
         logging.error(f"调度器运行出错: {str(e)}", exc_info=True)
     finally:
+        scheduler.shutdown(wait=True)
         logging.info("定时任务调度器已停止")
 
 
@@ -75,16 +410,27 @@ def run_once_now(config=None):
 
 
 if __name__ == "__main__":
-    from config import Config
+    from config import Config, create_common_parser
 
     # 使用统一的配置管理
-    config = Config()
+    config = Config(create_common_parser().parse_args())
+    setup_logging(level=config.log_level, log_format=config.log_format)
+    if config.metrics_port:
+        start_metrics_server(config.metrics_port)
 
     if config.run_now:
         # 立即执行一次
         run_once_now(config)
     else:
         # 设置定时任务
-        setup_scheduler(config.schedule_time, config)
+        scheduler = setup_scheduler(config.schedule_time, config)
+        # 空闲时段后台重新验证缓存（可选）
+        revalidator = None
+        if config.revalidate:
+            revalidator = CacheRevalidator(
+                scheduler, config.revalidate_window, config.revalidate_pages
+            ).start()
         # 运行调度器
-        run_scheduler()
+        run_scheduler(scheduler)
+        if revalidator is not None:
+            revalidator.stop()
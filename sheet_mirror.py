@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+"""
+工作表本地镜像（SQLite）：去重、读回和报告从镜像读取，不再每次整表下载
+
+    python sheet_mirror.py status
+    python sheet_mirror.py report --worksheet 00 --days 7
+    python sheet_mirror.py sync --full
+
+- 我们几乎是唯一的写入方：自己追加的行写入成功后同步记入镜像
+- 变更检查：打开表格时Drive列表已返回表格的 modifiedTime（lastUpdateTime），不晚于镜像上次同步时
+  记下的服务器 modifiedTime 时镜像就是最新的，不需要任何额外请求；两边都是服务器时间，不受本机时钟偏差影响。
+  记下的是同步前打开表格时的值，自己的写入之后下次打开表格会做一次增量校验，不会掩盖写入前他人的修改
+- 表格被他人修改过时增量拉取：读取镜像最后一行及其后的行（发现他人追加的行，
+  最后一行对不上说明有删除/插入，改为整表同步），再只读取 负责人/状态 两列更新到镜像
+- 每 DEFAULT_FULL_RESYNC_HOURS 小时或增量校验失败时整表同步一次
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import warnings
+from datetime import date, datetime, timedelta
+
+# ===== 默认配置参数 =====
+DEFAULT_MIRROR_PATH = "log/sheets_mirror.db"  # 镜像库路径
+DEFAULT_FULL_RESYNC_HOURS = 24  # 整表同步的最长间隔（小时）
+DEFAULT_REPORT_DAYS = 7  # 报告默认统计的天数
+
+HEADER = ["href", "param", "日期", "负责人", "状态"]
+LAST_COLUMN = "E"
+# 他人会编辑的列：负责人、状态（D、E列，从0开始的序号）
+EDITABLE_COLUMNS = (3, 4)
+EDITABLE_RANGE = ("D", "E")
+DATE_COLUMN = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheet_rows (
+    spreadsheet_id TEXT NOT NULL,
+    worksheet TEXT NOT NULL,
+    row_number INTEGER NOT NULL,
+    href TEXT,
+    cells TEXT NOT NULL,
+    PRIMARY KEY (spreadsheet_id, worksheet, row_number)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sheet_rows_href ON sheet_rows(spreadsheet_id, worksheet, href);
+CREATE TABLE IF NOT EXISTS sync_state (
+    spreadsheet_id TEXT NOT NULL,
+    worksheet TEXT NOT NULL,
+    title TEXT,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL NOT NULL DEFAULT 0,
+    checked_at REAL NOT NULL DEFAULT 0,
+    full_synced_at REAL NOT NULL DEFAULT 0,
+    remote_modified REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (spreadsheet_id, worksheet)
+);
+"""
+
+# 同步结果
+SYNC_UNCHANGED = "unchanged"  # 远端没有变化
+SYNC_INCREMENTAL = "incremental"
+SYNC_FULL = "full"
+
+
+def _parse_modified_time(value):
+    """Drive的modifiedTime（RFC 3339）转换为时间戳"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def remote_modified_time(spreadsheet):
+    """
+    表格在服务器上的修改时间（时间戳），取不到时返回None
+    lastUpdateTime 是打开表格时Drive列表返回的值，不需要额外请求；gspread 6 把它标记为弃用
+    （提示改用 get_lastUpdateTime 实时读取），这里要的正是打开时的值，没有该属性时才经Drive读取
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            if hasattr(type(spreadsheet), "lastUpdateTime"):
+                value = spreadsheet.lastUpdateTime
+            else:
+                value = spreadsheet.get_lastUpdateTime()
+    except Exception as e:
+        print(f"⚠️ 读取表格修改时间失败: {e}")
+        return None
+    return _parse_modified_time(value)
+
+
+def append_start_row(response):
+    """values.append 响应中写入范围的起始行号"""
+    updated_range = ((response or {}).get("updates") or {}).get("updatedRange", "")
+    match = re.search(r"![A-Z]+(\d+)", updated_range)
+    return int(match.group(1)) if match else None
+
+
+def _pad(row, width=len(HEADER)):
+    row = [str(value) if value is not None else "" for value in row]
+    return row + [""] * (width - len(row))
+
+
+class SheetMirror:
+    """多个工作表的本地镜像，线程安全（调度器并发写不同工作表）"""
+
+    def __init__(self, path=DEFAULT_MIRROR_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sync_state)")}
+            if "remote_modified" not in columns:
+                # 旧版镜像库没有该列，升级后第一次打开表格时做一次增量校验
+                conn.execute(
+                    "ALTER TABLE sync_state ADD COLUMN remote_modified REAL NOT NULL DEFAULT 0"
+                )
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ----- 状态 -----
+    def state(self, spreadsheet_id, worksheet):
+        row = self.conn.execute(
+            "SELECT row_count, synced_at, checked_at, full_synced_at, remote_modified FROM sync_state"
+            " WHERE spreadsheet_id = ? AND worksheet = ?",
+            (spreadsheet_id, worksheet),
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(
+            zip(("row_count", "synced_at", "checked_at", "full_synced_at", "remote_modified"), row)
+        )
+
+    def _set_state(self, spreadsheet_id, worksheet, title=None, **values):
+        self.conn.execute(
+            "INSERT INTO sync_state (spreadsheet_id, worksheet, title) VALUES (?, ?, ?)"
+            " ON CONFLICT (spreadsheet_id, worksheet) DO UPDATE SET"
+            " title = COALESCE(excluded.title, title)",
+            (spreadsheet_id, worksheet, title),
+        )
+        assignments = ", ".join(f"{key} = ?" for key in values)
+        self.conn.execute(
+            f"UPDATE sync_state SET {assignments} WHERE spreadsheet_id = ? AND worksheet = ?",
+            (*values.values(), spreadsheet_id, worksheet),
+        )
+
+    # ----- 写入镜像 -----
+    def replace(self, spreadsheet_id, worksheet, values, title=None, remote_modified=None):
+        """
+        用整表数据替换镜像
+        :param remote_modified: 读取整表前表格的服务器修改时间，为None时保留原值
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM sheet_rows WHERE spreadsheet_id = ? AND worksheet = ?",
+                (spreadsheet_id, worksheet),
+            )
+            self._insert(spreadsheet_id, worksheet, 1, values)
+            self._set_state(
+                spreadsheet_id,
+                worksheet,
+                title,
+                row_count=len(values),
+                synced_at=now,
+                checked_at=now,
+                full_synced_at=now,
+                **({"remote_modified": remote_modified} if remote_modified is not None else {}),
+            )
+
+    def _insert(self, spreadsheet_id, worksheet, start_row, rows):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO sheet_rows (spreadsheet_id, worksheet, row_number, href, cells)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    spreadsheet_id,
+                    worksheet,
+                    start_row + offset,
+                    row[0] if row else None,
+                    json.dumps(_pad(row), ensure_ascii=False),
+                )
+                for offset, row in enumerate(rows)
+            ],
+        )
+
+    def record_append(self, spreadsheet_id, worksheet, rows, start_row=None):
+        """
+        记入我们自己追加成功的行；不推进同步时间，写入前他人的修改由下次增量同步发现
+        :param worksheet: gspread.Worksheet
+        :param start_row: 远端写入的起始行号，为None时接在镜像末尾；
+            晚于镜像末尾时说明刚刚有他人追加的行，读取补齐
+        """
+        title = worksheet.title
+        with self._lock, self.conn:
+            count = self.row_count(spreadsheet_id, title)
+            start_row = start_row or count + 1
+            if start_row > count + 1:
+                gap = worksheet.get(f"A{count + 1}:{LAST_COLUMN}{start_row - 1}")
+                self._insert(spreadsheet_id, title, count + 1, [list(row) for row in gap])
+            self._insert(spreadsheet_id, title, start_row, rows)
+            self._set_state(
+                spreadsheet_id, title, row_count=max(count, start_row + len(rows) - 1)
+            )
+
+    # ----- 读取镜像 -----
+    def row_count(self, spreadsheet_id, worksheet):
+        state = self.state(spreadsheet_id, worksheet)
+        return state["row_count"] if state else 0
+
+    def existing_hrefs(self, spreadsheet_id, worksheet, hrefs):
+        """hrefs中已在工作表里的部分（去重用）"""
+        hrefs = list(set(hrefs))
+        existing = set()
+        for index in range(0, len(hrefs), 500):
+            chunk = hrefs[index : index + 500]
+            placeholders = ",".join("?" * len(chunk))
+            existing.update(
+                href
+                for (href,) in self.conn.execute(
+                    f"SELECT href FROM sheet_rows WHERE spreadsheet_id = ? AND worksheet = ?"
+                    f" AND row_number > 1 AND href IN ({placeholders})",
+                    (spreadsheet_id, worksheet, *chunk),
+                )
+            )
+        return existing
+
+    def rows(self, spreadsheet_id, worksheet, first_row=1):
+        """[(行号, 单元格列表)]"""
+        return [
+            (number, json.loads(cells))
+            for number, cells in self.conn.execute(
+                "SELECT row_number, cells FROM sheet_rows WHERE spreadsheet_id = ? AND worksheet = ?"
+                " AND row_number >= ? ORDER BY row_number",
+                (spreadsheet_id, worksheet, first_row),
+            )
+        ]
+
+    def records(self, spreadsheet_id, worksheet):
+        """与 get_all_records 相同形式的字典列表（表头为键）"""
+        rows = self.rows(spreadsheet_id, worksheet)
+        if not rows:
+            return []
+        header = [name for name in rows[0][1] if name] or HEADER
+        return [dict(zip(header, cells)) for _, cells in rows[1:]]
+
+    # ----- 与远端同步 -----
+    def sync(self, spreadsheet, worksheet, force=False):
+        """
+        按需与远端工作表同步，返回 SYNC_* 之一
+        :param spreadsheet: gspread.Spreadsheet（提供id和打开时的lastUpdateTime）
+        :param worksheet: gspread.Worksheet
+        :param force: 忽略变更检查，至少做一次增量拉取
+        """
+        spreadsheet_id, title = spreadsheet.id, worksheet.title
+        # 打开表格时的服务器修改时间，同步成功后记下，与下次打开时的值比较
+        modified = remote_modified_time(spreadsheet)
+        with self._lock:
+            state = self.state(spreadsheet_id, title)
+            now = time.time()
+            if state is None or now - state["full_synced_at"] > DEFAULT_FULL_RESYNC_HOURS * 3600:
+                return self.full_sync(spreadsheet_id, worksheet, modified)
+            if not force and modified is not None and modified <= state["remote_modified"]:
+                self._set_state(spreadsheet_id, title, checked_at=now)
+                return SYNC_UNCHANGED
+            return self._incremental_sync(spreadsheet_id, worksheet, state, modified)
+
+    def full_sync(self, spreadsheet_id, worksheet, remote_modified=None):
+        """
+        整表同步
+        :param remote_modified: 读取前表格的服务器修改时间（remote_modified_time）
+        """
+        self.replace(
+            spreadsheet_id,
+            worksheet.title,
+            worksheet.get_all_values(),
+            worksheet.title,
+            remote_modified=remote_modified,
+        )
+        return SYNC_FULL
+
+    def _incremental_sync(self, spreadsheet_id, worksheet, state, remote_modified=None):
+        title = worksheet.title
+        count = state["row_count"]
+        if count == 0:
+            return self.full_sync(spreadsheet_id, worksheet, remote_modified)
+
+        # 镜像最后一行及其后的行：最后一行对不上说明中间有删除/插入，整表同步
+        tail = worksheet.get(f"A{count}:{LAST_COLUMN}")
+        last = self.rows(spreadsheet_id, title, count)
+        tail_href = tail[0][0] if tail and tail[0] else ""
+        if not last or last[0][1][0] != tail_href:
+            return self.full_sync(spreadsheet_id, worksheet, remote_modified)
+        appended = [list(row) for row in tail[1:]]
+
+        # 只拉取他人会编辑的列
+        first, last_column = EDITABLE_RANGE
+        edits = worksheet.get(f"{first}2:{last_column}{count}") if count > 1 else []
+        changed = []
+        for number, cells in self.rows(spreadsheet_id, title, 2):
+            remote = _pad(edits[number - 2] if number - 2 < len(edits) else [], len(EDITABLE_COLUMNS))
+            local = [cells[column] for column in EDITABLE_COLUMNS]
+            if remote != local:
+                for column, value in zip(EDITABLE_COLUMNS, remote):
+                    cells[column] = value
+                changed.append((json.dumps(cells, ensure_ascii=False), spreadsheet_id, title, number))
+
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE sheet_rows SET cells = ? WHERE spreadsheet_id = ? AND worksheet = ? AND row_number = ?",
+                changed,
+            )
+            if appended:
+                self._insert(spreadsheet_id, title, count + 1, appended)
+            self._set_state(
+                spreadsheet_id,
+                title,
+                row_count=count + len(appended),
+                synced_at=now,
+                checked_at=now,
+                **({"remote_modified": remote_modified} if remote_modified is not None else {}),
+            )
+        if changed or appended:
+            print(f"🔁 工作表 '{title}' 增量同步：更新 {len(changed)} 行，新增 {len(appended)} 行")
+        return SYNC_INCREMENTAL
+
+    # ----- 报告 -----
+    def worksheets(self):
+        return self.conn.execute(
+            "SELECT spreadsheet_id, worksheet, row_count, synced_at, full_synced_at FROM sync_state"
+            " ORDER BY worksheet"
+        ).fetchall()
+
+    def report(self, spreadsheet_id, worksheet, since):
+        """按日期统计行数及负责人/状态的填写情况：[(日期, 行数, 已分配, 状态分布)]"""
+        by_day = {}
+        for _, cells in self.rows(spreadsheet_id, worksheet, 2):
+            day = cells[DATE_COLUMN]
+            if day < since:
+                continue
+            entry = by_day.setdefault(day, [0, 0, {}])
+            entry[0] += 1
+            if cells[EDITABLE_COLUMNS[0]]:
+                entry[1] += 1
+            status = cells[EDITABLE_COLUMNS[1]] or "-"
+            entry[2][status] = entry[2].get(status, 0) + 1
+        return [(day, *by_day[day]) for day in sorted(by_day, reverse=True)]
+
+
+_mirror = None
+
+
+def get_mirror():
+    """进程内共享的工作表镜像"""
+    global _mirror
+    if _mirror is None:
+        _mirror = SheetMirror()
+    return _mirror
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工作表本地镜像：状态、报告和同步")
+    parser.add_argument("--db", default=DEFAULT_MIRROR_PATH, help=f"镜像库路径（默认: {DEFAULT_MIRROR_PATH}）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="各工作表的镜像行数和同步时间")
+    report = sub.add_parser("report", help="按日期统计行数和负责人/状态（只读镜像）")
+    report.add_argument("--worksheet", help="只统计该工作表")
+    report.add_argument("--days", type=int, default=DEFAULT_REPORT_DAYS, help="统计最近几天")
+    sync = sub.add_parser("sync", help="与远端同步（读取 --sheet-name 等凭证配置）")
+    sync.add_argument("--full", action="store_true", help="整表同步")
+    args, rest = parser.parse_known_args()
+    mirror = SheetMirror(args.db)
+
+    if args.command == "status":
+        for spreadsheet_id, worksheet, rows, synced_at, full_synced_at in mirror.worksheets():
+            print(
+                f"📋 {worksheet:<6} {rows:>7} 行  同步 {datetime.fromtimestamp(synced_at):%Y-%m-%d %H:%M}"
+                f"  整表 {datetime.fromtimestamp(full_synced_at):%Y-%m-%d %H:%M}  ({spreadsheet_id})"
+            )
+    elif args.command == "report":
+        since = (date.today() - timedelta(days=args.days - 1)).isoformat()
+        for spreadsheet_id, worksheet, *_ in mirror.worksheets():
+            if args.worksheet and worksheet != args.worksheet:
+                continue
+            print(f"📊 工作表 {worksheet}（{since} 起）")
+            for day, rows, assigned, statuses in mirror.report(spreadsheet_id, worksheet, since):
+                status_text = ", ".join(f"{k} {v}" for k, v in sorted(statuses.items()))
+                print(f"   {day}  {rows:>5} 行  已分配 {assigned:>5}  状态: {status_text}")
+    elif args.command == "sync":
+        from config import Config, create_common_parser
+        from google_sheets import GoogleSheetsManager
+
+        config = Config(create_common_parser().parse_args(rest))
+        sheets_config = config.get_sheets_config()
+        manager = GoogleSheetsManager(
+            sheets_config["credentials_path"], sheets_config["sheet_name"], mirror=mirror
+        )
+        if manager.spreadsheet:
+            worksheet = manager.get_or_create_worksheet(sheets_config["worksheet_name"])
+            if args.full:
+                result = mirror.full_sync(
+                    manager.spreadsheet.id, worksheet, remote_modified_time(manager.spreadsheet)
+                )
+            else:
+                result = mirror.sync(manager.spreadsheet, worksheet, force=True)
+            print(f"✅ {worksheet.title}: {result}，镜像 {mirror.row_count(manager.spreadsheet.id, worksheet.title)} 行")
+    mirror.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,10 +10,12 @@ fi
 
 # 设置默认执行时间（可以通过参数修改）
 RUN_TIME=${1:-"09:00"}
+# 其余参数原样传给调度器，如 --schedule "00=07:00,p0=07:30" --catch-up all
+[ $# -gt 0 ] && shift
 
 echo "启动定时任务调度器..."
 echo "执行时间: $RUN_TIME"
 echo "按 Ctrl+C 停止"
 
 # 启动调度器
-python3 scheduler.py --time "$RUN_TIME"
+python3 scheduler.py --time "$RUN_TIME" "$@"
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""测试从仓库根目录导入模块（各模块平铺在根目录）"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""后台重新验证：候选选择，以及重新检查期间原缓存条目的保留/覆盖规则"""
+
+import datetime
+
+import pytest
+
+import form_checker
+from cache_revalidator import parse_window, select_candidates, window_end
+from form_checker import (
+    ERROR_CLASS_DNS,
+    ERROR_CLASS_TIMEOUT,
+    VERDICT_FORM,
+    VERDICT_NO_FORM,
+    begin_revalidation,
+    end_revalidation,
+    get_cached_result,
+    list_cached_results,
+    peek_cached_result,
+    set_cached_result,
+)
+
+NOW = datetime.datetime(2026, 3, 10, 2, 0)
+HORIZON = datetime.datetime(2026, 3, 10, 11, 0)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    form_checker._form_cache.clear()
+    yield
+    form_checker._form_cache.clear()
+    form_checker._revalidating.clear()
+
+
+def expiring(hours):
+    return NOW + datetime.timedelta(hours=hours)
+
+
+def test_select_candidates_filters_and_orders():
+    entries = [
+        ("https://cold.com/", VERDICT_FORM, expiring(1)),
+        ("https://hot.com/b", VERDICT_NO_FORM, expiring(5)),
+        ("https://hot.com/a", VERDICT_FORM, expiring(2)),
+        ("https://fresh.com/", VERDICT_FORM, expiring(20)),  # 到horizon仍然新鲜
+        ("https://dead.com/", ERROR_CLASS_DNS, expiring(1)),  # 错误类别保留退避
+        ("https://slow.com/", ERROR_CLASS_TIMEOUT, expiring(1)),
+    ]
+    counts = {"hot.com": 5, "cold.com": 1}
+    assert select_candidates(entries, HORIZON, counts, NOW) == [
+        "https://hot.com/a",
+        "https://hot.com/b",
+        "https://cold.com/",
+    ]
+
+
+def test_select_candidates_skips_verdicts_that_would_expire_before_horizon():
+    far_horizon = NOW + datetime.timedelta(hours=form_checker.CACHE_EXPIRE_HOURS + 1)
+    entries = [("https://a.com/", VERDICT_FORM, expiring(1))]
+    assert select_candidates(entries, far_horizon, {}, NOW) == []
+
+
+def test_revalidation_bypasses_but_keeps_entry():
+    set_cached_result("https://a.com/", True)
+    keys = begin_revalidation(["https://a.com/"])
+    assert get_cached_result("https://a.com/") is None
+    assert peek_cached_result("https://a.com/") is None
+    end_revalidation(keys)
+    assert get_cached_result("https://a.com/") is True
+
+
+@pytest.mark.parametrize("error_class", [ERROR_CLASS_TIMEOUT, ERROR_CLASS_DNS])
+def test_failed_recheck_keeps_old_verdict(error_class):
+    set_cached_result("https://a.com/", True)
+    keys = begin_revalidation(["https://a.com/"])
+    set_cached_result("https://a.com/", False, error_class)
+    end_revalidation(keys)
+    [(url, outcome, _)] = list_cached_results()
+    assert outcome == VERDICT_FORM
+    assert get_cached_result("https://a.com/") is True
+
+
+def test_new_verdict_replaces_old_entry():
+    set_cached_result("https://a.com/", True)
+    before = list_cached_results()[0][2]
+    keys = begin_revalidation(["https://a.com/"])
+    set_cached_result("https://a.com/", False)
+    end_revalidation(keys)
+    [(_, outcome, expires)] = list_cached_results()
+    assert outcome == VERDICT_NO_FORM
+    assert expires >= before
+
+
+def test_error_backoff_grows_outside_revalidation():
+    for _ in range(3):
+        set_cached_result("https://dead.com/", False, ERROR_CLASS_DNS)
+    entry = next(iter(form_checker._form_cache.values()))
+    assert entry["failures"] == 3
+    assert entry["ttl_hours"] == form_checker.get_cache_ttl_hours(ERROR_CLASS_DNS, 3)
+
+
+def test_window_end_across_midnight():
+    window = parse_window("22:00-05:00")
+    assert window_end(window, NOW) == datetime.datetime(2026, 3, 10, 5, 0)
+    assert window_end(window, datetime.datetime(2026, 3, 10, 12, 0)) is None
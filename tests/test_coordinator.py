@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""协调器的租约分发、超时重新入队和迟到回报"""
+
+import asyncio
+
+import pytest
+
+import coordinator
+from coordinator import CoordinatorServer, LeaseCoordinator, _post, check_urls_distributed
+from form_checker import VERDICT_CRASHED, VERDICT_FORM, VERDICT_NO_FORM, VERDICT_TIMEOUT
+
+URLS = [f"https://site{i}.com/" for i in range(5)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的monotonic时钟"""
+    now = [1000.0]
+    monkeypatch.setattr(coordinator.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_coordinator(**kwargs):
+    lease_coordinator = LeaseCoordinator(lease_size=3, lease_ttl=60, **kwargs)
+    lease_coordinator.submit(URLS)
+    return lease_coordinator
+
+
+def test_leases_split_pending_and_submit_dedups(clock):
+    lease_coordinator = make_coordinator()
+    lease_coordinator.submit(URLS[:2])
+    first = lease_coordinator.lease("w1")
+    second = lease_coordinator.lease("w2")
+    assert first["urls"] == URLS[:3]
+    assert second["urls"] == URLS[3:]
+    assert lease_coordinator.lease("w3") == {
+        "urls": [],
+        "retry_after": coordinator.DEFAULT_WORKER_IDLE_SLEEP,
+    }
+
+
+def test_report_accepts_only_leased_urls_and_requeues_the_rest(clock):
+    lease_coordinator = make_coordinator()
+    lease = lease_coordinator.lease("w1")
+    accepted = lease_coordinator.report(
+        lease["lease_id"], {URLS[0]: VERDICT_FORM, URLS[4]: VERDICT_FORM}
+    )
+    assert accepted == 1
+    assert lease_coordinator.verdicts == {URLS[0]: VERDICT_FORM}
+    assert list(lease_coordinator.pending) == URLS[3:] + URLS[1:3]
+    assert lease_coordinator.report("unknown", {URLS[1]: VERDICT_FORM}) == 0
+
+
+def test_expired_lease_is_requeued_and_late_report_accepted(clock):
+    lease_coordinator = make_coordinator()
+    lease = lease_coordinator.lease("w1")
+    clock[0] += 61
+    retry = lease_coordinator.lease("w2")
+    assert retry["urls"] == URLS[3:] + URLS[:1]
+    assert lease_coordinator.expired_leases == 1
+
+    # 超时后一个有效期内的迟到回报仍然接受，已有结论的URL不被覆盖
+    lease_coordinator.report(retry["lease_id"], {URLS[0]: VERDICT_NO_FORM})
+    accepted = lease_coordinator.report(
+        lease["lease_id"], {URLS[0]: VERDICT_FORM, URLS[1]: VERDICT_FORM}
+    )
+    assert accepted == 1
+    assert lease_coordinator.verdicts[URLS[0]] == VERDICT_NO_FORM
+    assert lease_coordinator.verdicts[URLS[1]] == VERDICT_FORM
+
+
+def test_report_after_grace_period_is_ignored(clock):
+    lease_coordinator = make_coordinator()
+    lease = lease_coordinator.lease("w1")
+    clock[0] += 61
+    lease_coordinator.lease("w2")
+    clock[0] += 61
+    assert lease_coordinator.report(lease["lease_id"], {URLS[0]: VERDICT_FORM}) == 0
+
+
+def test_heartbeat_extends_lease(clock):
+    lease_coordinator = make_coordinator()
+    lease = lease_coordinator.lease("w1")
+    clock[0] += 50
+    assert lease_coordinator.heartbeat(lease["lease_id"])
+    clock[0] += 50
+    lease_coordinator.lease("w2")
+    assert lease_coordinator.expired_leases == 0
+    assert lease_coordinator.report(lease["lease_id"], {URLS[0]: VERDICT_FORM}) == 1
+
+
+def test_repeatedly_expired_url_becomes_timeout(clock):
+    lease_coordinator = LeaseCoordinator(lease_size=1, lease_ttl=60, max_attempts=2)
+    lease_coordinator.submit(URLS[:1])
+    for _ in range(2):
+        assert lease_coordinator.lease("w1")["urls"] == URLS[:1]
+        clock[0] += 61
+    assert lease_coordinator.lease("w2")["urls"] == []
+    assert lease_coordinator.is_done()
+    assert lease_coordinator.verdicts == {URLS[0]: VERDICT_TIMEOUT}
+
+
+def test_distributed_check_gives_up_without_progress():
+    class Server:
+        coordinator = LeaseCoordinator()
+
+    tail = []
+    assert check_urls_distributed(URLS, Server, tail_queue=tail, stall_timeout=0) == []
+    assert tail == URLS
+    assert Server.coordinator.status()["expected"] == 0
+
+
+def test_http_round_trip():
+    server = CoordinatorServer(LeaseCoordinator(lease_size=5), port=0).start()
+    try:
+        base = f"http://127.0.0.1:{server.port}"
+        server.coordinator.submit(URLS)
+        lease = _post(f"{base}/lease", {"worker": "w1"})
+        assert lease["urls"] == URLS
+        assert _post(f"{base}/heartbeat", {"lease_id": lease["lease_id"]}) == {"ok": True}
+        verdicts = {url: VERDICT_NO_FORM for url in URLS}
+        assert _post(f"{base}/report", {"lease_id": lease["lease_id"], "verdicts": verdicts}) == {
+            "accepted": 5
+        }
+        assert server.coordinator.is_done()
+    finally:
+        server.stop()
+
+
+class ScriptedCoordinator:
+    """按脚本返回租约的协调器接口（替换coordinator._post）"""
+
+    def __init__(self, leases):
+        self.leases = list(leases)
+        self.reports = []
+
+    def __call__(self, url, payload, timeout=None):
+        if url.endswith("/lease"):
+            if self.leases:
+                return self.leases.pop(0)
+            return {"urls": [], "retry_after": 0}
+        if url.endswith("/report"):
+            self.reports.append((payload["lease_id"], payload["verdicts"]))
+            return {"accepted": len(payload["verdicts"])}
+        return {"ok": True}
+
+
+def scripted_lease(lease_id, urls, deadline=None):
+    return {"lease_id": lease_id, "urls": urls, "ttl": 60, "deadline": deadline}
+
+
+def run_scripted_worker(monkeypatch, leases, verdict_of=lambda url: VERDICT_NO_FORM):
+    scripted = ScriptedCoordinator(leases)
+    sessions = []
+
+    async def fake_load_url(urls, max_concurrent, pages_per_context, deadline=None, **kwargs):
+        checked = []
+        sessions.append((deadline, checked))
+        async for url in urls:
+            checked.append(url)
+            kwargs["on_result"](url, verdict_of(url))
+        return []
+
+    monkeypatch.setattr(coordinator, "_post", scripted)
+    monkeypatch.setattr(coordinator, "load_url", fake_load_url)
+    asyncio.run(coordinator.run_worker("http://coordinator", "w1", exit_when_idle=True))
+    return scripted, sessions
+
+
+def test_worker_keeps_one_browser_session_across_leases(monkeypatch):
+    scripted, sessions = run_scripted_worker(
+        monkeypatch,
+        [
+            scripted_lease("l1", URLS[:2]),
+            scripted_lease("l2", URLS[2:4]),
+            scripted_lease("l3", URLS[4:], deadline=40.0),
+        ],
+    )
+    assert sessions == [(None, URLS[:4]), (40.0, URLS[4:])]
+    assert [lease_id for lease_id, _ in scripted.reports] == ["l1", "l2", "l3"]
+    assert all(len(verdicts) for _, verdicts in scripted.reports)
+
+
+def test_worker_does_not_report_crashed_urls(monkeypatch):
+    scripted, _ = run_scripted_worker(
+        monkeypatch,
+        [scripted_lease("l1", URLS[:3])],
+        verdict_of=lambda url: VERDICT_CRASHED if url == URLS[1] else VERDICT_FORM,
+    )
+    assert scripted.reports == [("l1", {URLS[0]: VERDICT_FORM, URLS[2]: VERDICT_FORM})]
+
+
+def test_lease_carries_round_deadline(clock):
+    lease_coordinator = LeaseCoordinator(lease_size=5)
+    lease_coordinator.submit(URLS, deadline=40.0)
+    assert lease_coordinator.lease("w1")["deadline"] == 40.0
+    lease_coordinator.take_verdicts()
+    lease_coordinator.submit(URLS[:1])
+    assert lease_coordinator.lease("w1")["deadline"] is None
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""DNS应答解析和存活判定"""
+
+import asyncio
+import struct
+
+import pytest
+
+import dns_resolver
+from dns_resolver import (
+    HOST_ALIVE,
+    HOST_DEAD,
+    HOST_UNKNOWN,
+    DnsResolver,
+    _build_query,
+    is_routable,
+    parse_response,
+)
+
+QUESTION_POINTER = b"\xc0\x0c"  # 指向问题中的域名（偏移12）
+
+
+def answer(rtype, ttl, rdata):
+    return QUESTION_POINTER + struct.pack("!HHIH", rtype, 1, ttl, len(rdata)) + rdata
+
+
+def encode_name(host):
+    return b"".join(bytes([len(label)]) + label.encode() for label in host.split(".")) + b"\x00"
+
+
+def response(host, rcode=0, answers=(), authority=()):
+    """按应答的查询报文拼出应答：问题 + 回答 + 授权"""
+    query = _build_query(0x1234, host)
+    header = struct.pack("!HHHHHH", 0x1234, 0x8180 | rcode, 1, len(answers), len(authority), 0)
+    return header + query[12:] + b"".join(answers) + b"".join(authority)
+
+
+def soa(ttl, minimum):
+    rdata = encode_name("ns.example.com") + encode_name("admin.example.com")
+    rdata += struct.pack("!IIIII", 2024010101, 7200, 3600, 1209600, minimum)
+    return answer(6, ttl, rdata)
+
+
+def test_parse_a_records_with_cname_ttl():
+    data = response(
+        "www.example.com",
+        answers=[
+            answer(5, 300, encode_name("edge.example.net")),
+            answer(1, 120, bytes([93, 184, 216, 34])),
+            answer(1, 600, bytes([93, 184, 216, 35])),
+        ],
+    )
+    assert parse_response(data) == (0, ["93.184.216.34", "93.184.216.35"], 120)
+
+
+def test_parse_nxdomain_uses_soa_negative_ttl():
+    data = response("gone.example.com", rcode=3, authority=[soa(900, 300)])
+    assert parse_response(data) == (3, [], 300)
+
+
+def test_parse_query_without_answers():
+    assert parse_response(_build_query(1, "example.com")) == (0, [], None)
+
+
+@pytest.mark.parametrize(
+    "addresses, routable",
+    [
+        (["93.184.216.34"], True),
+        (["0.0.0.0"], False),
+        (["127.0.0.1"], False),
+        (["169.254.1.1", "::1"], False),
+        # 内网地址可能是分区解析，不判定为失效
+        (["10.1.2.3", "192.168.0.1"], True),
+        (["127.0.0.1", "172.16.0.5"], True),
+        ([], False),
+    ],
+)
+def test_is_routable(addresses, routable):
+    assert is_routable(addresses) is routable
+
+
+def make_resolver(monkeypatch, reply, system=HOST_UNKNOWN):
+    resolver = DnsResolver(nameservers=["192.0.2.53"])
+    resolver.hosts_file = set()
+    calls = []
+
+    async def fake_query(host, nameserver):
+        calls.append(host)
+        return reply
+
+    async def fake_system(host):
+        return resolver._store(host, system, 60)
+
+    monkeypatch.setattr(resolver, "_query", fake_query)
+    monkeypatch.setattr(resolver, "_system_resolve", fake_system)
+    return resolver, calls
+
+
+@pytest.mark.parametrize(
+    "reply, expected",
+    [
+        ((0, ["93.184.216.34"], 300), HOST_ALIVE),
+        ((0, ["0.0.0.0"], 300), HOST_DEAD),
+        ((0, ["127.0.0.1", "169.254.0.1"], 300), HOST_DEAD),
+        ((0, ["10.0.0.1"], 300), HOST_ALIVE),
+        ((3, [], 900), HOST_DEAD),
+    ],
+)
+def test_resolve_verdicts_are_cached(monkeypatch, reply, expected):
+    resolver, calls = make_resolver(monkeypatch, reply)
+    assert asyncio.run(resolver.resolve("parked.example")) == expected
+    assert asyncio.run(resolver.resolve("parked.example")) == expected
+    assert calls == ["parked.example"]
+    assert resolver.stats["cache_hits"] == 1
+
+
+def test_servfail_falls_back_to_system_resolver(monkeypatch):
+    resolver, calls = make_resolver(monkeypatch, (2, [], None), system=HOST_ALIVE)
+    assert asyncio.run(resolver.resolve("flaky.example")) == HOST_ALIVE
+    assert calls == ["flaky.example"]
+
+
+def test_find_dead_urls(monkeypatch):
+    resolver, _ = make_resolver(monkeypatch, (3, [], 900))
+    urls = ["https://gone.example/a", "gone.example/b", "http://127.0.0.1/"]
+    assert asyncio.run(resolver.find_dead_urls(urls)) == set(urls[:2])
+
+
+def test_negative_ttl_is_clamped(monkeypatch):
+    resolver, _ = make_resolver(monkeypatch, (3, [], 5))
+    now = dns_resolver.time.monotonic()
+    asyncio.run(resolver.resolve("gone.example"))
+    _, expires_at = resolver._cache["gone.example"]
+    assert expires_at - now >= dns_resolver.DEFAULT_DNS_MIN_TTL
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""自适应单URL时限：滚动p95在有固定比例超时时保持稳定"""
+
+import random
+
+from form_checker import (
+    DEFAULT_TAIL_MIN_DEADLINE,
+    DEFAULT_TAIL_MIN_SAMPLES,
+    DEFAULT_URL_DEADLINE,
+    LatencyTracker,
+)
+
+HARD = DEFAULT_URL_DEADLINE / 1000
+FLOOR = DEFAULT_TAIL_MIN_DEADLINE / 1000
+
+
+def run_checks(tracker, latencies):
+    """按check_url_with_deadline的记录方式检查一批URL，返回每次检查的时限"""
+    deadlines = []
+    for latency in latencies:
+        deadline = tracker.deadline()
+        deadlines.append(deadline)
+        if latency > deadline:
+            tracker.add_timeout(deadline)
+        else:
+            tracker.add(latency)
+    return deadlines
+
+
+def mixed_latencies(count, slow_share, seed=0):
+    rng = random.Random(seed)
+    return [
+        HARD * 2 if rng.random() < slow_share else rng.uniform(2.0, 10.0) for _ in range(count)
+    ]
+
+
+def test_hard_deadline_until_enough_samples():
+    tracker = LatencyTracker()
+    for _ in range(DEFAULT_TAIL_MIN_SAMPLES - 1):
+        tracker.add(1.0)
+    assert tracker.percentile() is None
+    assert tracker.deadline() == HARD
+
+
+def test_deadline_is_clamped():
+    tracker = LatencyTracker()
+    for _ in range(DEFAULT_TAIL_MIN_SAMPLES):
+        tracker.add(0.5)
+    assert tracker.deadline() == FLOOR
+    for _ in range(DEFAULT_TAIL_MIN_SAMPLES * 2):
+        tracker.add(HARD * 3)
+    assert tracker.deadline() == HARD
+
+
+def test_deadline_stable_when_share_of_checks_time_out():
+    # 10%的检查始终超时，超过p95的余量：时限停在硬时限而不是逐步下降
+    tracker = LatencyTracker(window=200)
+    deadlines = run_checks(tracker, mixed_latencies(3000, slow_share=0.10))
+    assert min(deadlines[-1000:]) == HARD
+
+
+def test_deadline_tracks_p95_without_ratcheting_to_floor():
+    # 2%的检查超时：时限大多停在快速检查的p95附近（约9.6秒），不会下降到下限
+    tracker = LatencyTracker(window=200)
+    deadlines = run_checks(tracker, mixed_latencies(3000, slow_share=0.02))
+    tail = deadlines[-1000:]
+    assert min(tail) > FLOOR + 0.5
+    assert 9.0 < sorted(tail)[len(tail) // 2] < 10.5
+
+
+def test_deadline_recovers_when_sites_get_slower():
+    tracker = LatencyTracker(window=200)
+    run_checks(tracker, [3.0] * 500)
+    assert tracker.deadline() == FLOOR
+    deadlines = run_checks(tracker, [15.0] * 500)
+    assert deadlines[-1] == 15.0
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""网络录制/回放：重定向逐跳录制，网络错误中止请求并按相同原因回放"""
+
+import asyncio
+from types import SimpleNamespace
+
+from network_archive import CaptureArchive, ReplayArchive, abort_reason
+
+CHECKED = "https://site.com/"
+
+
+class FakeResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+
+class FakeRoute:
+    def __init__(self, url, response=None, error=None):
+        self.request = SimpleNamespace(method="GET", url=url)
+        self._response = response
+        self._error = error
+        self.fetch_kwargs = None
+        self.result = None
+
+    async def fetch(self, **kwargs):
+        self.fetch_kwargs = kwargs
+        if self._error:
+            raise self._error
+        return self._response
+
+    async def fulfill(self, **kwargs):
+        self.result = ("fulfill", kwargs.get("status", getattr(kwargs.get("response"), "status", None)))
+
+    async def abort(self, reason="failed"):
+        self.result = ("abort", reason)
+
+
+def capture(tmp_path, routes):
+    archive = CaptureArchive(str(tmp_path))
+    archive.start(CHECKED)
+    for route in routes:
+        asyncio.run(archive.handle(route, CHECKED))
+    archive.finish(CHECKED, "no_form")
+    return archive
+
+
+def test_capture_records_redirect_hops_and_errors(tmp_path):
+    redirect = FakeRoute(
+        CHECKED, FakeResponse(301, {"location": "https://www.site.com/"}, b"")
+    )
+    page = FakeRoute("https://www.site.com/", FakeResponse(200, {}, b"<html></html>"))
+    broken = FakeRoute(
+        "https://cdn.gone.com/app.js", error=Exception("net::ERR_NAME_NOT_RESOLVED at ...")
+    )
+    capture(tmp_path, [redirect, page, broken])
+
+    assert redirect.fetch_kwargs == {"max_redirects": 0}
+    assert redirect.result == ("fulfill", 301)
+    assert broken.result == ("abort", "namenotresolved")
+
+    replay = ReplayArchive(str(tmp_path))
+    routes = [
+        FakeRoute(CHECKED),
+        FakeRoute("https://www.site.com/"),
+        FakeRoute("https://cdn.gone.com/app.js"),
+        FakeRoute("https://unknown.com/"),
+    ]
+    for route in routes:
+        asyncio.run(replay.handle(route, CHECKED))
+    assert [route.result for route in routes] == [
+        ("fulfill", 301),
+        ("fulfill", 200),
+        ("abort", "namenotresolved"),
+        ("abort", "internetdisconnected"),
+    ]
+    assert (replay.hits, replay.misses) == (3, 1)
+
+
+def test_failed_body_read_aborts(tmp_path):
+    class BrokenBody(FakeResponse):
+        async def body(self):
+            raise Exception("Response body is unavailable for redirect responses")
+
+    route = FakeRoute(CHECKED, BrokenBody(200, {}, b""))
+    capture(tmp_path, [route])
+    assert route.result == ("abort", "failed")
+
+
+def test_abort_reason():
+    assert abort_reason("net::ERR_CONNECTION_REFUSED") == "connectionrefused"
+    assert abort_reason("something else") == "failed"
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""浏览器内拦截：只安装URL模式，不暂停请求交给Python处理"""
+
+import asyncio
+import re
+
+from request_blocker import build_blocked_patterns, install_browser_blocking
+
+
+def matches(pattern, url):
+    """CDP URL模式：只有 '*' 是通配符"""
+    return re.fullmatch(".*".join(map(re.escape, pattern.split("*"))), url) is not None
+
+
+def blocked(url, **kwargs):
+    return any(matches(pattern, url) for pattern in build_blocked_patterns(**kwargs))
+
+
+def test_extension_and_asset_urls_are_blocked():
+    assert blocked("https://cdn.site.com/logo.png")
+    assert blocked("https://cdn.site.com/app.css?v=3")
+    assert blocked("https://fonts.googleapis.com/css2?family=Inter")
+    assert blocked("https://fonts.gstatic.com/s/inter/v12/a")
+    assert not blocked("https://site.com/contact")
+    assert not blocked("https://site.com/styles.css.php")
+
+
+def test_domain_patterns_are_anchored():
+    assert blocked("https://www.google-analytics.com/collect?v=1")
+    assert blocked("https://hotjar.com/x")
+    assert not blocked("https://hotjar.company.com/x")
+    assert blocked("https://www.facebook.com/tr?id=1")
+    assert not blocked("https://www.facebook.com/travel")
+
+
+def test_install_only_sets_blocked_urls():
+    class Session:
+        def __init__(self):
+            self.sent = []
+            self.handlers = []
+
+        async def send(self, method, params=None):
+            self.sent.append(method)
+
+        def on(self, event, handler):
+            self.handlers.append(event)
+
+    session = Session()
+    assert asyncio.run(install_browser_blocking(session))
+    assert session.sent == ["Network.setBlockedURLs"]
+    assert session.handlers == []
+    assert not asyncio.run(install_browser_blocking(None))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""机器人消息的长度切分和发送重试"""
+
+import pytest
+
+import robot
+from robot import ERRCODE_RATE_LIMITED, MAX_CONTENT_BYTES, Dispatcher, split_content
+
+
+def test_short_message_is_not_split():
+    assert split_content("hello") == ["hello"]
+    assert split_content("") == [""]
+
+
+def test_split_prefers_line_breaks():
+    lines = [f"line {i} " + "x" * 100 for i in range(40)]
+    parts = split_content("\n".join(lines))
+    assert len(parts) > 1
+    assert all(len(part.encode("utf-8")) <= MAX_CONTENT_BYTES for part in parts)
+    assert "\n".join(parts) == "\n".join(lines)
+
+
+def test_split_keeps_multibyte_characters_whole():
+    content = "中" * 1000  # 3000字节，没有换行
+    parts = split_content(content)
+    assert all(len(part.encode("utf-8")) <= MAX_CONTENT_BYTES for part in parts)
+    assert "".join(parts) == content
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """记录post_message调用，按脚本返回结果"""
+    calls = []
+    results = []
+
+    def fake_post(url, headers, data):
+        calls.append(data["text"]["content"])
+        return results.pop(0) if results else True
+
+    monkeypatch.setattr(robot, "post_message", fake_post)
+    monkeypatch.setattr(robot, "DEFAULT_RETRY_BACKOFF", 0)
+    return calls, results
+
+
+def make_dispatcher():
+    return Dispatcher("https://robot", {}, coalesce_seconds=0, rate_per_minute=6000)
+
+
+def test_oversized_message_is_sent_in_parts(sent):
+    calls, _ = sent
+    dispatcher = make_dispatcher()
+    dispatcher.put("中" * 1000)
+    assert dispatcher.flush(5)
+    assert "".join(calls) == "中" * 1000
+    assert all(len(content.encode("utf-8")) <= MAX_CONTENT_BYTES for content in calls)
+    assert dispatcher.stats["failed"] == 0
+
+
+def test_rejected_message_is_not_retried(sent):
+    calls, results = sent
+    results.append(93000)  # webhook key无效
+    dispatcher = make_dispatcher()
+    dispatcher.put("hello")
+    assert dispatcher.flush(5)
+    assert calls == ["hello"]
+    assert dispatcher.stats["failed"] == 1
+    assert dispatcher.stats["retried"] == 0
+
+
+def test_rate_limit_and_transport_errors_are_retried(sent):
+    calls, results = sent
+    results.extend([ERRCODE_RATE_LIMITED, False])
+    dispatcher = make_dispatcher()
+    dispatcher.bucket.drain = lambda: None  # 不按补充速率等待
+    dispatcher.put("hello")
+    assert dispatcher.flush(5)
+    assert calls == ["hello"] * 3
+    assert dispatcher.stats["sent"] == 1
+    assert dispatcher.stats["retried"] == 2
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""规划器的页面分配：各工作表同时占用的页面数之和不超过共享页面数"""
+
+import datetime
+import threading
+import time
+
+import pytest
+
+from run_planner import RunPlanner, layout_pages, parse_deadline
+
+WORKSHEETS = ["00", "01", "02", "03"]
+
+
+def make_planner(total_pages=24, targets=None, stop_in=3600):
+    planner = RunPlanner(time.time() + stop_in, total_pages)
+    for name in WORKSHEETS:
+        planner.register(name, (targets or {}).get(name, 50))
+    return planner
+
+
+def held(planner):
+    return sum(p.pages for p in planner.worksheets.values())
+
+
+def test_first_round_splits_budget_evenly():
+    planner = make_planner()
+    pages = [planner.allocate(name) for name in WORKSHEETS]
+    assert pages == [6, 6, 6, 6]
+    assert held(planner) == 24
+
+
+def test_reallocation_is_capped_by_pages_held_elsewhere():
+    planner = make_planner()
+    for name in WORKSHEETS:
+        planner.allocate(name)
+    # 其他工作表都不太需要页面，按比例"00"应分到大部分页面
+    for name in WORKSHEETS[1:]:
+        planner.worksheets[name].found = 49
+    assert planner.allocate("00") == 6
+    assert held(planner) <= planner.total_pages
+
+
+def test_released_pages_go_to_the_worksheet_behind():
+    planner = make_planner()
+    for name in WORKSHEETS:
+        planner.allocate(name)
+    for name in WORKSHEETS[1:]:
+        planner.worksheets[name].found = 49
+        planner.record_batch(name, 10, 0, 5.0, 6)
+    assert planner.allocate("00") > 6
+    assert held(planner) <= planner.total_pages
+
+
+def test_held_pages_never_exceed_budget():
+    planner = make_planner(total_pages=10, targets={"00": 200, "01": 5, "02": 80, "03": 20})
+    for step in range(40):
+        name = WORKSHEETS[step % len(WORKSHEETS)]
+        if step % 3 == 0:
+            planner.record_batch(name, 20, step % 4, 30.0, planner.worksheets[name].pages)
+        planner.allocate(name)
+        assert held(planner) <= planner.total_pages
+
+
+def test_finished_worksheet_frees_its_pages():
+    planner = make_planner()
+    for name in WORKSHEETS:
+        planner.allocate(name)
+    planner.worksheets["01"].found = 50
+    planner.finish("01")
+    assert planner.worksheets["01"].status == "done"
+    assert planner.worksheets["01"].pages == 0
+    assert held(planner) == 18
+
+
+def test_allocate_waits_for_released_pages():
+    planner = make_planner(total_pages=12)
+    planner.register("04", 50)
+    for name in WORKSHEETS:
+        planner.allocate(name)
+    assert held(planner) == 12
+
+    allocated = []
+    waiter = threading.Thread(target=lambda: allocated.append(planner.allocate("04")))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+
+    planner.release("00")
+    waiter.join(2)
+    assert not waiter.is_alive()
+    assert 1 <= allocated[0] <= 3
+    assert held(planner) <= planner.total_pages
+
+
+def test_allocate_does_not_wait_past_deadline():
+    planner = make_planner(total_pages=6, stop_in=-1)
+    planner.allocate("00")
+    assert planner.allocate("01") >= 1
+
+
+def test_parallelism_holds_only_pages_used():
+    planner = make_planner()
+    layouts = planner.parallelism("00", urls=4, processes=1)
+    assert layouts == [(1, 4)]
+    assert planner.worksheets["00"].pages == 4
+
+
+def test_parallelism_gives_leftover_pages_to_some_processes():
+    planner = make_planner(total_pages=24)
+    layouts = planner.parallelism("00", urls=100, processes=4)  # 分到6个页面
+    assert layouts == [(1, 2), (1, 2), (1, 1), (1, 1)]
+    assert planner.worksheets["00"].pages == 6
+
+
+@pytest.mark.parametrize("processes", [1, 2, 3, 4, 8])
+def test_parallelism_never_exceeds_allocation(processes):
+    planner = make_planner(total_pages=8)
+    planner.allocate("01")
+    planner.allocate("02")
+    layouts = planner.parallelism("00", urls=100, processes=processes)  # 只剩2个页面
+    assert len(layouts) == min(processes, 2)
+    assert layout_pages(layouts) == planner.worksheets["00"].pages == 2
+    assert held(planner) <= planner.total_pages
+
+
+@pytest.mark.parametrize(
+    "deadline, budget, expected",
+    [
+        ("09:30", None, datetime.datetime(2026, 3, 10, 9, 30)),
+        ("07:00", None, datetime.datetime(2026, 3, 11, 7, 0)),
+        ("09:30", 30, datetime.datetime(2026, 3, 10, 8, 31)),
+        (None, None, None),
+    ],
+)
+def test_parse_deadline(deadline, budget, expected):
+    now = datetime.datetime(2026, 3, 10, 8, 1)
+    stop_at = parse_deadline(deadline, budget, now=now)
+    assert stop_at == (expected.timestamp() if expected else None)
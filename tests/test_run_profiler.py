@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""剖析结束后恢复事件循环策略"""
+
+import asyncio
+
+import pytest
+
+from run_profiler import RunProfiler, _ProfilingPolicy
+
+
+@pytest.fixture
+def policy():
+    previous = asyncio.get_event_loop_policy()
+    policy = asyncio.DefaultEventLoopPolicy()
+    asyncio.set_event_loop_policy(policy)
+    yield policy
+    asyncio.set_event_loop_policy(previous)
+
+
+def test_profiler_restores_previous_policy(policy, tmp_path):
+    with RunProfiler("a", str(tmp_path)) as profiler:
+        assert isinstance(asyncio.get_event_loop_policy(), _ProfilingPolicy)
+        asyncio.run(asyncio.sleep(0.01))
+    assert asyncio.get_event_loop_policy() is policy
+    assert profiler.coroutines
+
+
+def test_overlapping_profilers_restore_after_the_last(policy, tmp_path):
+    first = RunProfiler("a", str(tmp_path)).__enter__()
+    second = RunProfiler("b", str(tmp_path)).__enter__()
+    first.__exit__(None, None, None)
+    assert isinstance(asyncio.get_event_loop_policy(), _ProfilingPolicy)
+    second.__exit__(None, None, None)
+    assert asyncio.get_event_loop_policy() is policy
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""调度器的到期收集与补跑策略"""
+
+import datetime
+import json
+
+import pytest
+
+import scheduler
+from scheduler import DEFAULT_MAX_CATCH_UP, Scheduler
+
+NOW = datetime.datetime(2026, 3, 10, 8, 1)
+
+
+def make_scheduler(tmp_path, catch_up, state=None):
+    state_path = tmp_path / "state.json"
+    if state is not None:
+        state_path.write_text(json.dumps(state), encoding="utf-8")
+    sched = Scheduler(
+        max_workers=1,
+        catch_up=catch_up,
+        state_path=str(state_path),
+        runs_log_path=str(tmp_path / "runs.jsonl"),
+    )
+    submitted = []
+    sched._submit = lambda job, runs: submitted.append((job.name, runs))
+    sched.add_job("daily", "08:00", lambda: None)
+    return sched, submitted
+
+
+def last_due(days_ago, at="08:00"):
+    day = NOW.date() - datetime.timedelta(days=days_ago)
+    return f"{day.isoformat()}T{at}:00"
+
+
+def kinds(runs):
+    return [(due.date().day, kind) for due, kind in runs]
+
+
+def test_first_run_starts_clock_without_catch_up(tmp_path):
+    sched, submitted = make_scheduler(tmp_path, "all")
+    sched._collect_due(NOW)
+    assert submitted == []
+    state = json.loads((tmp_path / "state.json").read_text(encoding="utf-8"))
+    assert state["daily@08:00"]["last_due"] == NOW.isoformat(timespec="seconds")
+
+
+def test_on_time_run_is_scheduled(tmp_path):
+    sched, submitted = make_scheduler(
+        tmp_path, "once", {"daily@08:00": {"last_due": last_due(1)}}
+    )
+    sched._collect_due(NOW)
+    assert [kinds(runs) for _, runs in submitted] == [[(10, "scheduled")]]
+
+
+def test_not_due_yet_submits_nothing(tmp_path):
+    sched, submitted = make_scheduler(
+        tmp_path, "once", {"daily@08:00": {"last_due": last_due(0)}}
+    )
+    sched._collect_due(NOW)
+    assert submitted == []
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        ("skip", [(10, "scheduled")]),
+        ("once", [(9, "catch_up"), (10, "scheduled")]),
+        ("all", [(8, "catch_up"), (9, "catch_up"), (10, "scheduled")]),
+    ],
+)
+def test_missed_runs_follow_policy(tmp_path, policy, expected):
+    # 最后一次到期是3天前（7日），8日、9日错过，10日正常到期
+    sched, submitted = make_scheduler(
+        tmp_path, policy, {"daily@08:00": {"last_due": last_due(3)}}
+    )
+    sched._collect_due(NOW)
+    assert [kinds(runs) for _, runs in submitted] == [expected]
+
+
+def test_all_policy_is_capped(tmp_path):
+    sched, submitted = make_scheduler(
+        tmp_path, "all", {"daily@08:00": {"last_due": last_due(10)}}
+    )
+    sched._collect_due(NOW)
+    runs = submitted[0][1]
+    assert [kind for _, kind in runs].count("catch_up") == DEFAULT_MAX_CATCH_UP
+    assert runs[-1] == (datetime.datetime(2026, 3, 10, 8, 0), "scheduled")
+
+
+def test_late_wakeup_treats_current_due_as_missed(tmp_path):
+    # 醒来时距今天的到期已超过5分钟：今天的运行也按错过处理
+    sched, submitted = make_scheduler(
+        tmp_path, "skip", {"daily@08:00": {"last_due": last_due(1)}}
+    )
+    sched._collect_due(NOW.replace(hour=9))
+    assert submitted == []
+
+
+def test_interrupted_run_is_caught_up(tmp_path):
+    sched, submitted = make_scheduler(
+        tmp_path,
+        "once",
+        {"daily@08:00": {"last_due": last_due(0), "running": last_due(0)}},
+    )
+    sched._collect_due(NOW)
+    assert [kinds(runs) for _, runs in submitted] == [[(10, "scheduled")]]
+    state = json.loads((tmp_path / "state.json").read_text(encoding="utf-8"))
+    assert "running" not in state["daily@08:00"]
+
+
+def test_last_due_advances(tmp_path):
+    sched, submitted = make_scheduler(
+        tmp_path, "once", {"daily@08:00": {"last_due": last_due(2)}}
+    )
+    sched._collect_due(NOW)
+    sched._collect_due(NOW + datetime.timedelta(minutes=1))
+    assert len(submitted) == 1
+
+
+def test_next_run_time_picks_earliest_job(tmp_path):
+    sched, _ = make_scheduler(tmp_path, "once")
+    sched.add_job("early", "07:30", lambda: None)
+    assert sched.next_run_time(NOW) == datetime.datetime(2026, 3, 11, 7, 30)
+    assert sched.seconds_until_next(datetime.datetime(2026, 3, 10, 7, 0)) == 1800
+
+
+def test_parse_schedule():
+    assert scheduler.parse_schedule("00+p0=07:00,p1=08:30", "08:00") == [
+        ("00+p0", ["00", "p0"], "07:00"),
+        ("p1", ["p1"], "08:30"),
+    ]
+    with pytest.raises(ValueError):
+        scheduler.parse_schedule("zz=07:00", "08:00")
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""工作表镜像的变更检查和增量同步（本地伪Sheets后端）"""
+
+import time
+
+import pytest
+
+import google_sheets
+import sheet_mirror
+from bench.fake_sheets import FakeSheetsBackend
+from sheet_mirror import (
+    HEADER,
+    SYNC_FULL,
+    SYNC_INCREMENTAL,
+    SYNC_UNCHANGED,
+    SheetMirror,
+    remote_modified_time,
+)
+
+SHEET_NAME = "TSTASK"
+WORKSHEET_NAME = "00"
+
+
+@pytest.fixture
+def backend():
+    backend = FakeSheetsBackend()
+    spreadsheet_id = backend.create_spreadsheet(SHEET_NAME)
+    backend.add_sheet(
+        spreadsheet_id,
+        WORKSHEET_NAME,
+        [HEADER] + [[f"https://site{i}.com/", f"p{i}", "2025-09-26", "", ""] for i in range(5)],
+    )
+    google_sheets.set_client_factory(lambda _: backend.client())
+    yield backend
+    google_sheets.set_client_factory(None)
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    mirror = SheetMirror(str(tmp_path / "mirror.db"))
+    yield mirror
+    mirror.close()
+
+
+def open_sheet(mirror):
+    """重新打开表格（Drive列表返回当前的modifiedTime）"""
+    manager = google_sheets.GoogleSheetsManager("fake-credentials.json", SHEET_NAME, mirror=mirror)
+    return manager, manager.get_or_create_worksheet(WORKSHEET_NAME)
+
+
+def edit_remotely(backend, edit):
+    """模拟他人在表格上的修改"""
+    time.sleep(0.01)  # modifiedTime精确到毫秒
+    edit(backend.rows("fake-1", WORKSHEET_NAME))
+    backend.touch("fake-1")
+
+
+def mirrored(mirror):
+    return [cells for _, cells in mirror.rows("fake-1", WORKSHEET_NAME)]
+
+
+def test_unchanged_sheet_needs_no_pull(backend, mirror):
+    manager, worksheet = open_sheet(mirror)
+    assert mirror.sync(manager.spreadsheet, worksheet) == SYNC_FULL
+    manager, worksheet = open_sheet(mirror)
+    backend.reset_stats()
+    assert mirror.sync(manager.spreadsheet, worksheet) == SYNC_UNCHANGED
+    assert not backend.stats["calls"]
+
+
+def test_local_clock_ahead_does_not_hide_edits(backend, mirror, monkeypatch):
+    # 本机时钟快一小时：比较的是服务器时间，他人的修改照常发现
+    local_time = time.time
+    monkeypatch.setattr(sheet_mirror.time, "time", lambda: local_time() + 3600)
+    manager, worksheet = open_sheet(mirror)
+    mirror.sync(manager.spreadsheet, worksheet)
+    edit_remotely(backend, lambda rows: rows[1].__setitem__(4, "done"))
+    manager, worksheet = open_sheet(mirror)
+    assert mirror.sync(manager.spreadsheet, worksheet) == SYNC_INCREMENTAL
+    assert mirrored(mirror) == backend.rows("fake-1", WORKSHEET_NAME)
+
+
+def test_modified_time_falls_back_to_drive(backend):
+    manager = google_sheets.GoogleSheetsManager("fake-credentials.json", SHEET_NAME)
+
+    class Spreadsheet:
+        """没有lastUpdateTime属性的表格对象（只能经Drive读取）"""
+
+        def get_lastUpdateTime(self):
+            return manager.spreadsheet.get_lastUpdateTime()
+
+    backend.reset_stats()
+    expected = remote_modified_time(manager.spreadsheet)
+    assert not backend.stats["calls"]
+    assert remote_modified_time(Spreadsheet()) == expected
+    assert backend.stats["calls"]
+
+
+def test_incremental_sync_pulls_edits_and_appends(backend, mirror):
+    manager, worksheet = open_sheet(mirror)
+    mirror.sync(manager.spreadsheet, worksheet)
+
+    def edit(rows):
+        rows[2][3:5] = ["alice", "done"]
+        rows.append(["https://other.com/", "x", "2025-09-27", "", ""])
+
+    edit_remotely(backend, edit)
+    manager, worksheet = open_sheet(mirror)
+    assert mirror.sync(manager.spreadsheet, worksheet) == SYNC_INCREMENTAL
+    assert mirrored(mirror) == backend.rows("fake-1", WORKSHEET_NAME)
+
+
+def test_deleted_row_falls_back_to_full_sync(backend, mirror):
+    manager, worksheet = open_sheet(mirror)
+    mirror.sync(manager.spreadsheet, worksheet)
+    edit_remotely(backend, lambda rows: rows.pop(2))
+    manager, worksheet = open_sheet(mirror)
+    assert mirror.sync(manager.spreadsheet, worksheet) == SYNC_FULL
+    assert mirrored(mirror) == backend.rows("fake-1", WORKSHEET_NAME)
+
+
+def test_own_append_does_not_hide_earlier_edit(backend, mirror):
+    manager, worksheet = open_sheet(mirror)
+    mirror.sync(manager.spreadsheet, worksheet)
+    edit_remotely(backend, lambda rows: rows[1].__setitem__(4, "done"))
+
+    # 同一次打开中追加：打开时的modifiedTime早于他人的修改，本次不拉取
+    manager.append_data(worksheet, [["https://new.com/", "n", "2025-09-28", "", ""]])
+    assert mirrored(mirror)[-1][0] == "https://new.com/"
+
+    manager, worksheet = open_sheet(mirror)
+    assert mirror.sync(manager.spreadsheet, worksheet) == SYNC_INCREMENTAL
+    assert mirrored(mirror) == backend.rows("fake-1", WORKSHEET_NAME)
+
+
+def test_failed_append_raises_for_retry(backend, mirror):
+    manager, worksheet = open_sheet(mirror)
+    backend.fail_next(1, kind="values.append")
+    with pytest.raises(Exception):
+        manager.append_data(worksheet, [["https://new.com/", "n", "2025-09-28", "", ""]])
+    assert mirrored(mirror)[-1][0] != "https://new.com/"
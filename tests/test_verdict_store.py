@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""结论库的命中率统计、压缩和写入失败重试"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from verdict_store import VerdictStore, day_of, days_ago
+
+OLD = time.time() - 200 * 86400
+RECENT = time.time() - 86400
+
+
+def record(url, verdict, at, cached=False, error_class=None, total=1.0):
+    return {
+        "url": url,
+        "verdict": verdict,
+        "ended_at": at,
+        "cached": cached,
+        "error_class": error_class,
+        "total": total,
+        "worksheet": "00",
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = VerdictStore(str(tmp_path / "verdicts.db"), flush_rows=1000)
+    for at in (OLD, RECENT):
+        store.add(record("https://a.com/", "form", at, total=2.0))
+        store.add(record("https://a.com/x", "no_form", at, total=4.0))
+        store.add(record("https://b.com/", "timeout", at, error_class="timeout", total=8.0))
+        # 不计入命中率：缓存命中和崩溃重试
+        store.add(record("https://a.com/", "form", at, cached=True))
+        store.add(record("https://b.com/", "crashed", at, error_class="crash"))
+    yield store
+    store.close()
+
+
+def rates(store, group_by="host"):
+    return {row[0]: row[1:] for row in store.hit_rates(days_ago(365), group_by)}
+
+
+def test_hit_rates_skip_cached_and_crashed(store):
+    by_host = rates(store)
+    assert by_host["a.com"][:3] == (4, 2, 0)
+    assert by_host["b.com"][:3] == (2, 0, 2)
+    assert "crashed" not in rates(store, "verdict")
+
+
+def test_compaction_preserves_hit_rates(store):
+    before = rates(store)
+    removed = store.compact(keep_days=90)
+    assert removed == 5
+    assert rates(store) == before
+    assert store.conn.execute("SELECT MIN(day) FROM checks").fetchone()[0] == day_of(RECENT)
+
+
+def test_compaction_is_idempotent(store):
+    store.compact(keep_days=90)
+    after_first = rates(store)
+    assert store.compact(keep_days=90) == 0
+    assert rates(store) == after_first
+
+
+def test_recompacting_the_same_day_accumulates(store):
+    store.compact(keep_days=90)
+    store.add(record("https://a.com/late", "form", OLD))
+    store.compact(keep_days=90)
+    assert rates(store)["a.com"][:2] == (5, 3)
+
+
+def test_failed_flush_keeps_rows(store, tmp_path):
+    store.flush()
+    blocker = sqlite3.connect(str(tmp_path / "verdicts.db"))
+    blocker.execute("BEGIN IMMEDIATE")
+    store.conn.execute("PRAGMA busy_timeout = 0")
+    store.add(record("https://c.com/", "form", RECENT))
+    assert store.flush() == 0
+    blocker.rollback()
+    blocker.close()
+    assert store.flush() == 1
+    assert rates(store)["c.com"][:2] == (1, 1)
+
+
+def test_queries_while_other_threads_write(store):
+    errors = []
+
+    def worker(index):
+        try:
+            for step in range(50):
+                store.add(record(f"https://t{index}.com/{step}", "form", RECENT))
+                store.flush()
+                store.hit_rates(days_ago(365))
+                store.url_history(f"https://t{index}.com/{step}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert all(rates(store)[f"t{index}.com"][:2] == (50, 50) for index in range(4))
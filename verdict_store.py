@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""
+历史检查结论库（SQLite）：每次检查的URL、域名、param、工作表、结论、错误类别、耗时和日期，
+按域名/日期建索引，支持按时间段查询命中率，旧数据压缩为按天汇总
+
+    python verdict_store.py report --days 30 --by host --top 20
+    python verdict_store.py host example.com --days 30
+    python verdict_store.py url https://example.com/contact
+    python verdict_store.py import form_check_results.json log/url_metrics_*.jsonl log/res_data_*.json
+    python verdict_store.py compact --keep-days 90 --vacuum
+
+- 检查记录由指标日志（metrics.MetricsJournal.write）写入，先缓存在内存中，
+  每 DEFAULT_FLUSH_ROWS 条或进程退出时用一个事务批量插入（WAL模式，每天数万行开销很小）
+- compact 把超过保留天数的明细汇总到 daily_stats（日期 × 域名 × 工作表 × 结论 × 错误类别）后删除，
+  查询命中率时明细和汇总合并计算
+- 命中率只统计实际访问得出的结论（form/no_form/timeout）：缓存命中（cached=1）和
+  崩溃后重新入队的尝试（crashed）不计入，也不压缩进 daily_stats
+"""
+
+import argparse
+import atexit
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+# ===== 默认配置参数 =====
+DEFAULT_VERDICT_DB = "log/verdicts.db"  # 结论库路径
+DEFAULT_FLUSH_ROWS = 500  # 累积多少条记录批量写入一次
+DEFAULT_KEEP_DAYS = 90  # 明细保留天数，更早的压缩为按天汇总
+DEFAULT_REPORT_DAYS = 30  # 报告默认统计的天数
+DEFAULT_REPORT_TOP = 20  # 报告默认展示的行数
+DEFAULT_MAX_PENDING_ROWS = 50000  # 写入失败时内存中最多保留的待写入行数
+
+VERDICT_FORM = "form"
+
+# 计入命中率的检查：实际访问得出的最终结论
+COUNTED_CHECKS = "cached = 0 AND verdict IN ('form', 'no_form', 'timeout')"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checks (
+    id INTEGER PRIMARY KEY,
+    checked_at REAL NOT NULL,
+    day INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    param TEXT,
+    worksheet TEXT,
+    verdict TEXT,
+    error_class TEXT,
+    cached INTEGER NOT NULL DEFAULT 0,
+    total REAL,
+    phases TEXT,
+    bytes INTEGER,
+    network_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_checks_host_day ON checks(host, day);
+CREATE INDEX IF NOT EXISTS idx_checks_day ON checks(day);
+CREATE INDEX IF NOT EXISTS idx_checks_url ON checks(url);
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day INTEGER NOT NULL,
+    host TEXT NOT NULL,
+    worksheet TEXT NOT NULL DEFAULT '',
+    verdict TEXT NOT NULL DEFAULT '',
+    error_class TEXT NOT NULL DEFAULT '',
+    checks INTEGER NOT NULL,
+    total_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, host, worksheet, verdict, error_class)
+);
+"""
+
+_INSERT = (
+    "INSERT INTO checks (checked_at, day, url, host, param, worksheet, verdict, error_class,"
+    " cached, total, phases, bytes, network_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# 报告可分组的维度
+GROUP_COLUMNS = {
+    "host": "host",
+    "worksheet": "worksheet",
+    "day": "day",
+    "error_class": "error_class",
+    "verdict": "verdict",
+}
+
+
+def day_of(timestamp):
+    """时间戳对应的日期整数 YYYYMMDD"""
+    return int(datetime.fromtimestamp(timestamp).strftime("%Y%m%d"))
+
+
+def days_ago(days):
+    return day_of(time.time() - days * 86400)
+
+
+def _host_of(url):
+    if not url.startswith(("http://", "https://")):
+        url = f"https://{url}"
+    return urlparse(url).netloc
+
+
+def _timestamp(value):
+    """记录中的时间（时间戳或ISO字符串）转换为时间戳"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+def record_row(record):
+    """指标记录（metrics.new_record）转换为一行"""
+    checked_at = _timestamp(record.get("ended_at") or record.get("started_at"))
+    url = record.get("url") or ""
+    return (
+        checked_at,
+        day_of(checked_at),
+        url,
+        record.get("host") or _host_of(url),
+        record.get("param"),
+        record.get("worksheet"),
+        record.get("verdict"),
+        record.get("error_class"),
+        1 if record.get("cached") else 0,
+        record.get("total"),
+        json.dumps(record["phases"]) if record.get("phases") else None,
+        record.get("bytes"),
+        record.get("network_bytes"),
+    )
+
+
+class VerdictStore:
+    """SQLite结论库，add()只追加到内存缓冲，攒够一批后在一个事务中写入"""
+
+    def __init__(self, path=DEFAULT_VERDICT_DB, flush_rows=DEFAULT_FLUSH_ROWS):
+        self.path = path
+        self.flush_rows = flush_rows
+        self._pending = []
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def add(self, record):
+        row = record_row(record)
+        with self._lock:
+            self._pending.append(row)
+            full = len(self._pending) >= self.flush_rows
+        if full:
+            self.flush()
+
+    def add_rows(self, rows):
+        """直接批量写入多行（导入历史数据用）"""
+        with self._lock, self.conn:
+            self.conn.executemany(_INSERT, rows)
+
+    def flush(self):
+        """写入缓冲中的记录；失败时（如其他进程锁住数据库）记录放回缓冲，下次flush重试"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+            try:
+                with self.conn:
+                    self.conn.executemany(_INSERT, pending)
+            except sqlite3.Error as e:
+                self._pending = pending + self._pending
+                dropped = len(self._pending) - DEFAULT_MAX_PENDING_ROWS
+                if dropped > 0:
+                    del self._pending[:dropped]
+                print(
+                    f"⚠️ 写入结论库失败（{len(pending)} 条，稍后重试）: {e}"
+                    + (f"，丢弃最早的 {dropped} 条" if dropped > 0 else "")
+                )
+                return 0
+        return len(pending)
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def annotate(self, worksheet, params, since):
+        """
+        为since之后写入、尚未标注的检查记录补充工作表和param（分片子进程中的检查也在此补充）
+        :param params: 标准化URL -> param
+        """
+        self.flush()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE checks SET worksheet = ?, param = ?"
+                " WHERE url = ? AND checked_at >= ? AND worksheet IS NULL",
+                [(worksheet, param, url, since) for url, param in params.items()],
+            )
+
+    # ----- 查询 -----
+    def hit_rates(self, since_day, group_by="host", host=None, top=DEFAULT_REPORT_TOP):
+        """
+        按维度统计命中率（明细 + 已压缩的按天汇总），只计入实际访问得出的结论
+        :return: [(分组值, 检查数, 含表单数, 错误数, 平均耗时)]
+        """
+        column = GROUP_COLUMNS[group_by]
+        where, args = "day >= ?", [since_day]
+        if host:
+            where += " AND host = ?"
+            args.append(host)
+        query = f"""
+            SELECT g, SUM(n), SUM(forms), SUM(errors), SUM(total_sum) / NULLIF(SUM(timed), 0)
+            FROM (
+                SELECT {column} AS g, COUNT(*) AS n,
+                       SUM(verdict = '{VERDICT_FORM}') AS forms,
+                       SUM(error_class IS NOT NULL) AS errors,
+                       SUM(COALESCE(total, 0)) AS total_sum, SUM(total IS NOT NULL) AS timed
+                FROM checks WHERE {where} AND {COUNTED_CHECKS} GROUP BY g
+                UNION ALL
+                SELECT NULLIF({column}, '') AS g, SUM(checks),
+                       SUM(CASE WHEN verdict = '{VERDICT_FORM}' THEN checks ELSE 0 END),
+                       SUM(CASE WHEN error_class != '' THEN checks ELSE 0 END),
+                       SUM(total_sum), SUM(checks)
+                FROM daily_stats WHERE {where} GROUP BY g
+            )
+            GROUP BY g ORDER BY SUM(n) DESC LIMIT ?
+        """
+        self.flush()
+        # 连接在线程之间共享，查询也持锁，不与其他线程的写入事务交错
+        with self._lock:
+            return self.conn.execute(query, args + args + [top]).fetchall()
+
+    def url_history(self, url, limit=DEFAULT_REPORT_TOP):
+        """URL最近的检查记录"""
+        self.flush()
+        candidates = [url] if url.startswith(("http://", "https://")) else [url, f"https://{url}"]
+        placeholders = ",".join("?" * len(candidates))
+        with self._lock:
+            return self.conn.execute(
+                f"SELECT checked_at, worksheet, param, verdict, error_class, total, cached"
+                f" FROM checks WHERE url IN ({placeholders}) ORDER BY checked_at DESC LIMIT ?",
+                candidates + [limit],
+            ).fetchall()
+
+    # ----- 压缩 -----
+    def compact(self, keep_days=DEFAULT_KEEP_DAYS, vacuum=False):
+        """
+        把早于保留天数的明细汇总到daily_stats后删除，返回删除的行数
+        （只汇总计入命中率的检查，缓存命中和崩溃重试的记录直接删除）
+        """
+        self.flush()
+        cutoff = days_ago(keep_days)
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"""
+                INSERT INTO daily_stats (day, host, worksheet, verdict, error_class, checks, total_sum)
+                SELECT day, host, COALESCE(worksheet, ''), COALESCE(verdict, ''),
+                       COALESCE(error_class, ''), COUNT(*), SUM(COALESCE(total, 0))
+                FROM checks WHERE day < ? AND {COUNTED_CHECKS}
+                GROUP BY day, host, COALESCE(worksheet, ''), COALESCE(verdict, ''),
+                         COALESCE(error_class, '')
+                ON CONFLICT (day, host, worksheet, verdict, error_class) DO UPDATE SET
+                    checks = checks + excluded.checks,
+                    total_sum = total_sum + excluded.total_sum
+                """,
+                (cutoff,),
+            )
+            removed = self.conn.execute("DELETE FROM checks WHERE day < ?", (cutoff,)).rowcount
+        if vacuum:
+            with self._lock:
+                self.conn.execute("VACUUM")
+        return removed
+
+
+_store = None
+
+
+def get_store():
+    """进程内共享的结论库，退出时写入缓冲中的记录"""
+    global _store
+    if _store is None:
+        _store = VerdictStore()
+        atexit.register(_store.close)
+    return _store
+
+
+def store_record(record):
+    """登记一条检查记录（metrics.MetricsJournal.write 调用）"""
+    get_store().add(record)
+
+
+# ----- 导入历史数据 -----
+def _import_file(store, path):
+    """导入一个历史文件，返回 (导入的检查数, 补充param的行数)"""
+    if path.endswith(".jsonl"):
+        rows = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("url"):
+                    rows.append(record_row(record))
+        store.add_rows(rows)
+        return len(rows), 0
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        return 0, 0
+    if os.path.basename(path).startswith("res_data_"):
+        # 接口返回的原始数据没有结论，只用来补充已有检查记录的param和工作表
+        worksheet = os.path.basename(path)[len("res_data_") :].rsplit("_", 1)[0]
+        updates = []
+        for item in data:
+            href = isinstance(item, dict) and item.get("href")
+            if href:
+                param = (item.get("param") or "").split(",")[0]
+                for url in {href, f"https://{href}"}:
+                    updates.append((param, worksheet, url))
+        with store._lock, store.conn:
+            before = store.conn.total_changes
+            store.conn.executemany(
+                "UPDATE checks SET param = COALESCE(param, ?), worksheet = COALESCE(worksheet, ?)"
+                " WHERE url = ? AND (param IS NULL OR worksheet IS NULL)",
+                updates,
+            )
+            return 0, store.conn.total_changes - before
+
+    # form_check_results.json: [{"url", "has_forms", "checked_at"}]
+    rows = []
+    for item in data:
+        if isinstance(item, dict) and item.get("url"):
+            checked_at = _timestamp(item.get("checked_at"))
+            rows.append(
+                record_row(
+                    {
+                        "url": item["url"],
+                        "ended_at": checked_at,
+                        "verdict": VERDICT_FORM if item.get("has_forms") else "no_form",
+                    }
+                )
+            )
+    store.add_rows(rows)
+    return len(rows), 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="历史检查结论库：查询、报告、导入和压缩")
+    parser.add_argument("--db", default=DEFAULT_VERDICT_DB, help=f"结论库路径（默认: {DEFAULT_VERDICT_DB}）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    report = sub.add_parser("report", help="按维度统计命中率")
+    report.add_argument("--days", type=int, default=DEFAULT_REPORT_DAYS, help="统计最近几天")
+    report.add_argument("--by", choices=sorted(GROUP_COLUMNS), default="host", help="分组维度")
+    report.add_argument("--top", type=int, default=DEFAULT_REPORT_TOP, help="展示行数")
+
+    host = sub.add_parser("host", help="某个域名按天的命中率")
+    host.add_argument("host")
+    host.add_argument("--days", type=int, default=DEFAULT_REPORT_DAYS, help="统计最近几天")
+
+    url = sub.add_parser("url", help="某个URL的检查历史")
+    url.add_argument("url")
+    url.add_argument("--limit", type=int, default=DEFAULT_REPORT_TOP)
+
+    importer = sub.add_parser(
+        "import", help="导入 form_check_results.json、url_metrics_*.jsonl、res_data_*.json"
+    )
+    importer.add_argument("paths", nargs="+")
+
+    compact = sub.add_parser("compact", help="把旧明细压缩为按天汇总")
+    compact.add_argument("--keep-days", type=int, default=DEFAULT_KEEP_DAYS, help="明细保留天数")
+    compact.add_argument("--vacuum", action="store_true", help="压缩后回收磁盘空间")
+
+    args = parser.parse_args()
+    store = VerdictStore(args.db)
+
+    if args.command in ("report", "host"):
+        group_by = "day" if args.command == "host" else args.by
+        rows = store.hit_rates(
+            days_ago(args.days),
+            group_by,
+            host=getattr(args, "host", None),
+            top=getattr(args, "top", args.days + 1),
+        )
+        if args.command == "host":
+            rows.sort(key=lambda row: row[0] or 0)
+        title = args.host if args.command == "host" else f"按 {group_by}"
+        print(f"📊 {title}（最近 {args.days} 天）")
+        print(f"{group_by:<40}{'检查':>8}{'表单':>8}{'命中率':>8}{'错误':>8}{'平均s':>8}")
+        total_checks = total_forms = 0
+        for group, checks, forms, errors, avg_total in rows:
+            total_checks += checks
+            total_forms += forms
+            avg = "-" if avg_total is None else f"{avg_total:.2f}"
+            print(
+                f"{str(group if group is not None else '-'):<40}{checks:>8}{forms:>8}"
+                f"{forms / checks:>8.1%}{errors:>8}{avg:>8}"
+            )
+        if total_checks:
+            print(f"合计: {total_checks} 次检查，命中率 {total_forms / total_checks:.1%}")
+    elif args.command == "url":
+        for checked_at, worksheet, param, verdict, error_class, total, cached in store.url_history(
+            args.url, args.limit
+        ):
+            when = datetime.fromtimestamp(checked_at).strftime("%Y-%m-%d %H:%M:%S")
+            print(
+                f"{when}  {verdict or '-':<8} {error_class or '':<11} {worksheet or '-':<4}"
+                f" {param or '-':<12} {'-' if total is None else f'{total:.2f}s'}{' (缓存)' if cached else ''}"
+            )
+    elif args.command == "import":
+        for pattern in args.paths:
+            for path in sorted(glob.glob(pattern)) or [pattern]:
+                imported, updated = _import_file(store, path)
+                print(f"📥 {path}: 导入 {imported} 条，补充param {updated} 条")
+    elif args.command == "compact":
+        removed = store.compact(args.keep_days, args.vacuum)
+        print(f"🗜 已压缩 {removed} 条早于 {args.keep_days} 天的明细")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()